@@ -1,28 +1,43 @@
 # app.py
+import functools
 import os
 import re
-import json
-from datetime import datetime
 
 import numpy as np
 import pandas as pd
 import streamlit as st
 import altair as alt
 
-# ==================== НАСТРОЙКИ ====================
-
-DEFAULT_SNAP_DIR = os.getenv(
-    "YT_RADAR_DATA_DIR",
-    "snapshots_raw",  # папка внутри проекта, рядом с app.py
+from yt_radar import (
+    DEFAULT_FRESH_HOURS,
+    DEFAULT_SNAP_DIR,
+    PROFILE,
+    SNAPSHOT_COLUMNS,
+    SnapshotDataset,
+    SnapshotIngestState,
+    SnapshotStore,
+    TagMetricsCube,
+    explode_tags_for_growth,
+    open_snapshot_store,
+    profiling,
 )
-# сколько часов считаем видео "свежим" по умолчанию
-DEFAULT_FRESH_HOURS = 72.0
 
 st.set_page_config(
     page_title="YouTube Category Radar",
     layout="wide",
 )
 
+# Замеры стадий перезапуска: включаются переменной YT_RADAR_PROFILE или
+# переключателем в боковой панели (сам переключатель — в конце скрипта).
+profile_reruns = st.session_state.get("profile_reruns", PROFILE)
+if profile_reruns:
+    profiling.configure_logging()
+    profiling.start_rerun(
+        "перезапуск", cprofile=st.session_state.get("profile_cprofile", False)
+    )
+else:
+    profiling.discard_rerun()
+
 st.title("YouTube Radar")
 
 st.markdown(
@@ -479,490 +494,145 @@ with st.expander("Быстрая шпаргалка: как читать мет
 """
     )
 
-# ==================== ОЧИСТКА ТЕГОВ ====================
-
-STOP_TAGS = {
-    # общие англ.
-    "short", "shorts", "youtubeshorts",
-    "viral", "trend", "trending",
-    "fyp", "foryou", "reels",
-    "subscribe", "subscribenow", "sub",
-    "like", "likes", "likethis",
-    "follow", "followme",
-    "new", "news", "newvideo", "video", "videos",
-    "live", "stream",
-    "channel", "official", "tv",
-
-    # русские служебные
-    "шорт", "шортс", "шортсы",
-    "тренд", "тренды", "втренде",
-    "подписка", "подпишись", "подписаться",
-    "лайк", "лайки", "ставьлайк",
-    "рекомендации", "рекомендацииютуба",
-    "новое", "новинка", "новинкавидео", "видео",
-    "стрим", "прямойэфир",
-    "канал", "официальный",
-}
-
-EXTRA_STOP_SUBSTR = (
-    "official", "офишл", "офишлканал",
-    "channel", "канал",
-)
+# ==================== ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ ====================
 
 
-def clean_tag(raw_tag: str):
+@st.cache_resource(show_spinner=False)
+def get_snapshot_store(directory: str) -> SnapshotStore:
     """
-    Чистим один тег.
+    Одно хранилище на папку на весь процесс.
 
-    Возвращаем:
-      - нормализованный тег (str), если он годится как тема;
-      - None, если это мусор, который не хотим видеть как тему.
+    CSV разбираем в этом же процессе: Streamlit исполняет скрипт как
+    __main__, и воркеры пула (spawn / forkserver) запускали бы его заново.
     """
-    if not isinstance(raw_tag, str):
-        return None
-
-    tag = raw_tag.strip().lower()
-
-    # убираем служебные символы по краям
-    while tag and tag[0] in "#@!*_•.- ":
-        tag = tag[1:]
-    while tag and tag[-1] in "#@!*_•.- ":
-        tag = tag[:-1]
-
-    if not tag:
-        return None
-
-    # очень короткий тег не берём
-    if len(tag) < 2:
-        return None
-
-    # чисто цифры не берём
-    if tag.isdigit():
-        return None
-
-    # если почти одни неалфанум, тоже не берём
-    alnum_count = sum(ch.isalnum() for ch in tag)
-    if alnum_count == 0:
-        return None
-    if alnum_count / len(tag) < 0.4:
-        return None
-
-    # стоп-слова
-    if tag in STOP_TAGS:
-        return None
-
-    # стоп-подстроки
-    for sub in EXTRA_STOP_SUBSTR:
-        if sub in tag:
-            return None
-
-    return tag
+    return open_snapshot_store(directory, workers=1)
 
 
-# ==================== ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ ====================
-
-FNAME_RE = re.compile(r"ytcat_(?P<cat>\d+)_(?P<date>\d{8})_(?P<time>\d{6})\.csv")
-
-TAG_COLS = [
-    "tags_api_raw",
-    "hashtags_extracted",
-    "tags_common",
-    "tags_only_api",
-    "tags_only_hash",
-]
-
-
-def parse_snapshot_ts_from_name(filename: str):
+@st.cache_resource(show_spinner=False)
+def get_snapshot_ingest_state(directory: str, columns=None) -> SnapshotIngestState:
     """
-    Имя файла вида ytcat_{catid}_{YYYYMMDD}_{HHMMSS}.csv
-    Превращаем дату+время в datetime.
+    Одно состояние загрузки на папку (и набор колонок) на весь процесс,
+    чтобы при следующих запусках скрипта догружать только новые файлы.
     """
-    m = FNAME_RE.match(filename)
-    if not m:
-        return None
-    date_str = m.group("date")
-    time_str = m.group("time")
-    dt = datetime.strptime(date_str + time_str, "%Y%m%d%H%M%S")
-    return dt
+    return SnapshotIngestState(
+        directory, columns=columns, store=get_snapshot_store(directory)
+    )
 
 
-def parse_tag_json(s):
-    """
-    Аккуратно парсим строку с тегами.
+def load_snapshot_dataset(
+    directory: str,
+    incremental: bool = True,
+    columns=None,
+) -> SnapshotDataset:
     """
-    if not isinstance(s, str) or not s.strip():
-        return []
-    try:
-        val = json.loads(s)
-        if isinstance(val, list):
-            return [str(x).strip().lower() for x in val if str(x).strip()]
-        return [str(val).strip().lower()]
-    except Exception:
-        return [s.strip().lower()]
-
-
-def build_all_tags_uniq(df: pd.DataFrame) -> pd.DataFrame:
-    """
-    Собираем все теги и хэштеги в одну колонку all_tags_uniq (JSON-строка),
-    сразу с очисткой.
-    """
-
-    def merge_row(row):
-        tags_set = set()
-
-        for col in TAG_COLS:
-            if col not in row:
-                continue
-            raw_list = parse_tag_json(row[col])
-            for raw_tag in raw_list:
-                cleaned = clean_tag(raw_tag)
-                if cleaned:
-                    tags_set.add(cleaned)
-
-        return json.dumps(sorted(tags_set), ensure_ascii=False)
-
-    df = df.copy()
-    df["all_tags_uniq"] = df.apply(merge_row, axis=1)
-    return df
+    Читаем все CSV-файлы вида ytcat_*.csv из указанной папки
+    и отдаём их как SnapshotDataset (отсортированный, с индексом партиций).
 
+    Файлы проходят через колоночное хранилище, поэтому уже разобранные
+    снапшоты повторно не парсятся. columns — какие колонки нужны странице
+    (None — все). В инкрементальном режиме (по умолчанию) строки файлов,
+    которые не менялись, повторно не читаются.
 
-@st.cache_data(show_spinner=True)
-def load_snapshots_from_directory(directory: str) -> pd.DataFrame:
+    incremental=False — полная перезагрузка: все CSV разбираются заново
+    в хранилище в памяти, без манифеста, кэша тегов и сохранённого датасета.
     """
-    Читаем все CSV-файлы вида ytcat_*.csv из указанной папки.
-    """
-    if not os.path.isdir(directory):
-        raise FileNotFoundError(f"Папка '{directory}' не найдена")
-
-    dfs = []
-    for fname in os.listdir(directory):
-        if not fname.endswith(".csv"):
-            continue
-
-        snap_ts = parse_snapshot_ts_from_name(fname)
-        if snap_ts is None:
-            continue
-
-        fpath = os.path.join(directory, fname)
-        try:
-            df = pd.read_csv(fpath)
-        except Exception as e:
-            print(f"Не удалось прочитать {fpath}: {e}")
-            continue
-
-        df["snapshot_file"] = fname
-        df["snapshot_ts"] = snap_ts
-
-        if "category_id" not in df.columns:
-            m = FNAME_RE.match(fname)
-            if m:
-                df["category_id"] = m.group("cat")
-
-        dfs.append(df)
-
-    if not dfs:
-        return pd.DataFrame()
-
-    full = pd.concat(dfs, ignore_index=True)
-    full["snapshot_ts"] = pd.to_datetime(full["snapshot_ts"])
-    full["snapshot_date"] = full["snapshot_ts"].dt.date
-    full["snapshot_time"] = full["snapshot_ts"].dt.time
-
-    if "category_id" in full.columns:
-        full["category_id"] = full["category_id"].astype(str)
-
-    # собрать и почистить теги
-    full = build_all_tags_uniq(full)
-
-    return full
+    if columns is not None:
+        columns = tuple(columns)
+    if incremental:
+        state = get_snapshot_ingest_state(os.path.abspath(directory), columns)
+    else:
+        state = SnapshotIngestState(
+            directory, columns=columns, store=SnapshotStore(directory, workers=1), warm_start=False
+        )
+    state.refresh()
+    return state.dataset
 
 
-def compute_growth_between_snapshots(
-    df: pd.DataFrame,
-    ts1: datetime,
-    ts2: datetime,
+def load_category_metrics(
+    directory: str,
+    fresh_hours: float = DEFAULT_FRESH_HOURS,
+    columns=None,
 ) -> pd.DataFrame:
     """
-    Сравнение двух снапшотов по video_id.
+    Метрики по категориям для всех снапшотов папки
+    (после load_snapshot_dataset с теми же columns).
     """
-    df1 = df[df["snapshot_ts"] == ts1].copy()
-    df2 = df[df["snapshot_ts"] == ts2].copy()
-
-    if df1.empty or df2.empty:
-        return pd.DataFrame()
-
-    base_cols = [
-        "video_id",
-        "title",
-        "channel_title",
-        "category_id",
-        "category_name",
-        "views",
-        "views_per_hour",
-        "from_shorts",
-        "duration_sec",
-        "all_tags_uniq",
-        "published_at",
-    ]
-
-    for c in base_cols:
-        if c not in df1.columns:
-            df1[c] = None
-        if c not in df2.columns:
-            df2[c] = None
-
-    df1 = df1[base_cols].rename(
-        columns={c: f"{c}_t1" for c in base_cols if c != "video_id"}
-    )
-    df2 = df2[base_cols].rename(
-        columns={c: f"{c}_t2" for c in base_cols if c != "video_id"}
-    )
-
-    merged = df1.merge(df2, on="video_id", how="inner")
-    if merged.empty:
-        return merged
-
-    hours_diff = (ts2 - ts1).total_seconds() / 3600.0
-    if hours_diff <= 0:
-        hours_diff = 1e-6
-
-    merged["hours_between_snaps"] = hours_diff
-    merged["views_delta"] = merged["views_t2"] - merged["views_t1"]
-    merged["views_per_hour_between"] = merged["views_delta"] / hours_diff
+    if columns is not None:
+        columns = tuple(columns)
+    state = get_snapshot_ingest_state(os.path.abspath(directory), columns)
+    return state.category_metrics(fresh_hours)
 
-    merged = merged.sort_values("views_per_hour_between", ascending=False)
-    return merged
 
-
-def compute_category_metrics_for_snapshot(
-    df: pd.DataFrame,
-    snapshot_ts: datetime,
+def load_tag_metrics_cube(
+    directory: str,
     fresh_hours: float = DEFAULT_FRESH_HOURS,
-) -> pd.DataFrame:
+    columns=None,
+) -> "TagMetricsCube":
     """
-    Метрики по категориям для одного снапшота.
+    Куб метрик по тегам для папки (после load_snapshot_dataset с теми же columns).
     """
-    df2 = df[df["snapshot_ts"] == snapshot_ts].copy()
-    if df2.empty:
-        return pd.DataFrame()
-
-    df2["views"] = pd.to_numeric(df2.get("views", 0), errors="coerce").fillna(0)
-    df2["views_per_hour"] = pd.to_numeric(
-        df2.get("views_per_hour", 0.0), errors="coerce"
-    ).fillna(0.0)
-
-    if "published_at" in df2.columns:
-        df2["published_at_dt"] = pd.to_datetime(
-            df2["published_at"], errors="coerce", utc=True
-        ).dt.tz_convert(None)
-        df2["age_hours"] = (
-            df2["snapshot_ts"] - df2["published_at_dt"]
-        ).dt.total_seconds() / 3600.0
-    else:
-        df2["age_hours"] = np.nan
-
-    df2["is_fresh"] = df2["age_hours"] <= fresh_hours
-
-    if "category_name" not in df2.columns:
-        df2["category_name"] = df2["category_id"].astype(str)
-    df2["category_label"] = df2["category_name"].fillna(df2["category_id"].astype(str))
-
-    rows = []
-    for (cat_id, cat_name), g in df2.groupby(["category_id", "category_label"]):
-        volume = g["views"].sum()
-        velocity_total = g["views_per_hour"].sum()
-        fresh_velocity = g.loc[g["is_fresh"], "views_per_hour"].sum()
-        videos_cnt = g["video_id"].nunique()
-        fresh_videos = int(g["is_fresh"].sum())
-        freshness = fresh_videos / videos_cnt if videos_cnt > 0 else 0.0
-
-        rows.append(
-            {
-                "category_id": str(cat_id),
-                "category_name": cat_name,
-                "volume": volume,
-                "velocity_total": velocity_total,
-                "fresh_velocity": fresh_velocity,
-                "videos_cnt": videos_cnt,
-                "fresh_videos": fresh_videos,
-                "freshness": freshness,
-            }
-        )
-
-    cat_df = pd.DataFrame(rows)
-    if cat_df.empty:
-        return cat_df
-
-    total_volume = cat_df["volume"].sum() or 1e-6
-    total_velocity = cat_df["velocity_total"].sum() or 1e-6
-    total_fresh_velocity = cat_df["fresh_velocity"].sum() or 1e-6
+    if columns is not None:
+        columns = tuple(columns)
+    state = get_snapshot_ingest_state(os.path.abspath(directory), columns)
+    return state.tag_metrics_cube(fresh_hours)
 
-    cat_df["volume_share"] = cat_df["volume"] / total_volume
-    cat_df["velocity_share"] = cat_df["velocity_total"] / total_velocity
-    cat_df["fresh_velocity_share"] = cat_df["fresh_velocity"] / total_fresh_velocity
 
-    return cat_df
-
-
-def compute_tag_metrics_for_df_slice(
-    df_slice: pd.DataFrame,
-    fresh_hours: float = DEFAULT_FRESH_HOURS,
-    min_videos_per_tag: int = 1,
+def load_snapshots_from_directory(
+    directory: str,
+    incremental: bool = True,
+    columns=None,
 ) -> pd.DataFrame:
     """
-    Метрики по тегам для одного снапшота и одной категории.
+    Читаем все CSV-файлы вида ytcat_*.csv из указанной папки.
+    Строки отсортированы по (snapshot_ts, category_id).
     """
-    df2 = df_slice.copy()
-    if df2.empty:
-        return pd.DataFrame()
-
-    df2["views"] = pd.to_numeric(df2.get("views", 0), errors="coerce").fillna(0)
-    df2["views_per_hour"] = pd.to_numeric(
-        df2.get("views_per_hour", 0.0), errors="coerce"
-    ).fillna(0.0)
-
-    if "published_at" in df2.columns:
-        df2["published_at_dt"] = pd.to_datetime(
-            df2["published_at"], errors="coerce", utc=True
-        ).dt.tz_convert(None)
-        if "snapshot_ts" in df2.columns:
-            snap_ts = df2["snapshot_ts"].iloc[0]
-        else:
-            snap_ts = datetime.now()
-        df2["age_hours"] = (
-            pd.to_datetime(snap_ts) - df2["published_at_dt"]
-        ).dt.total_seconds() / 3600.0
-    else:
-        df2["age_hours"] = np.nan
-
-    df2["is_fresh"] = df2["age_hours"] <= fresh_hours
-
-    tag_rows = []
-    for _, row in df2.iterrows():
-        tags = parse_tag_json(row.get("all_tags_uniq", "[]"))
-        if not tags:
-            continue
-        v_views = row["views"]
-        v_vel = row["views_per_hour"]
-        v_fresh = bool(row["is_fresh"])
-        vid = row["video_id"]
-        for t in tags:
-            tag_rows.append(
-                {
-                    "tag": t,
-                    "video_id": vid,
-                    "views": v_views,
-                    "velocity_total": v_vel,
-                    "velocity_fresh": v_vel if v_fresh else 0.0,
-                    "is_fresh": v_fresh,
-                }
-            )
+    dataset = load_snapshot_dataset(directory, incremental, columns)
+    return dataset.with_tags(dataset.with_text(dataset.df))
 
-    if not tag_rows:
-        return pd.DataFrame()
 
-    tag_df = pd.DataFrame(tag_rows)
-
-    tag_agg = (
-        tag_df.groupby("tag")
-        .agg(
-            volume=("views", "sum"),
-            velocity_total=("velocity_total", "sum"),
-            velocity=("velocity_fresh", "sum"),
-            videos_cnt=("video_id", "nunique"),
-            fresh_videos=("is_fresh", "sum"),
-        )
-        .reset_index()
-    )
+PROFILE_HISTORY_MAX = 20
 
-    tag_agg["freshness"] = tag_agg["fresh_videos"] / tag_agg["videos_cnt"]
 
-    tag_agg = tag_agg[tag_agg["videos_cnt"] >= min_videos_per_tag].copy()
-    if tag_agg.empty:
-        return tag_agg
-
-    # перцентили и медианы для статусов
-    p75_velocity = float(tag_agg["velocity"].quantile(0.75))
-    p90_velocity = float(tag_agg["velocity"].quantile(0.90))
-    p75_volume = float(tag_agg["volume"].quantile(0.75))
-    median_volume = float(tag_agg["volume"].median())
-    median_velocity = float(tag_agg["velocity"].median())
-
-    lower_mature_vel = 0.8 * p75_velocity
-    upper_mature_vel = 1.2 * p75_velocity
-
-    tag_agg["status"] = "Other"
-
-    # Trending: очень высокая скорость, много свежих
-    trending_mask = (tag_agg["velocity"] >= p90_velocity) & (
-        tag_agg["freshness"] > 0.5
-    )
-    tag_agg.loc[trending_mask, "status"] = "Trending"
-
-    # Emerging: скорость выше 75 перцентиля, но объём ещё не огромный
-    emerging_mask = (
-        (tag_agg["status"] == "Other")
-        & (tag_agg["velocity"] >= p75_velocity)
-        & (tag_agg["volume"] < median_volume)
-        & (tag_agg["freshness"] > 0.5)
-    )
-    tag_agg.loc[emerging_mask, "status"] = "Emerging"
-
-    # Declining: был большой объём, но скорость и свежесть низкие
-    declining_mask = (
-        (tag_agg["status"] == "Other")
-        & (tag_agg["volume"] >= p75_volume)
-        & (tag_agg["velocity"] < median_velocity)
-        & (tag_agg["freshness"] < 0.3)
-    )
-    tag_agg.loc[declining_mask, "status"] = "Declining"
-
-    # Mature: устойчиво большая тема с нормальной скоростью
-    mature_mask = (
-        (tag_agg["status"] == "Other")
-        & (tag_agg["volume"] >= p75_volume)
-        & (tag_agg["velocity"] >= lower_mature_vel)
-        & (tag_agg["velocity"] <= upper_mature_vel)
-    )
-    tag_agg.loc[mature_mask, "status"] = "Mature"
+def remember_rerun_profile(summary):
+    """
+    Итоги последних перезапусков (и фрагментов) храним в сессии для панели.
+    """
+    if summary is None:
+        return
+    history = st.session_state.setdefault("profile_history", [])
+    history.append(summary)
+    del history[:-PROFILE_HISTORY_MAX]
 
-    # Frozen: и объём не очень, и скорости/свежести нет
-    frozen_mask = (
-        (tag_agg["status"] == "Other")
-        & (tag_agg["volume"] < median_volume)
-        & (tag_agg["velocity"] < median_velocity)
-    )
-    tag_agg.loc[frozen_mask, "status"] = "Frozen"
 
-    return tag_agg
+def profiled_tab(func):
+    """
+    Тело вкладки — стадия перезапуска. Если вкладка перезапускается
+    одна (как фрагмент), её замер — отдельный перезапуск в истории.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if profiling.active_profiler() is not None:
+            with profiling.stage(f"вкладка: {func.__name__}"):
+                return func(*args, **kwargs)
+        if not st.session_state.get("profile_reruns", PROFILE):
+            return func(*args, **kwargs)
+        profiling.start_rerun(
+            f"фрагмент {func.__name__}",
+            cprofile=st.session_state.get("profile_cprofile", False),
+        )
+        try:
+            return func(*args, **kwargs)
+        finally:
+            remember_rerun_profile(profiling.finish_rerun())
+    return wrapper
 
 
-def explode_tags_for_growth(df_growth: pd.DataFrame) -> pd.DataFrame:
+def altair_chart(chart, name: str):
     """
-    Берём таблицу с ростом видео между снапшотами и смотрим,
-    какие теги набрали больше всего дополнительных просмотров.
+    st.altair_chart с замером: спецификация графика собирается именно здесь.
     """
-    if df_growth.empty:
-        return pd.DataFrame()
-
-    rows = []
-    for _, row in df_growth.iterrows():
-        tags = parse_tag_json(row.get("all_tags_uniq_t2", "[]"))
-        delta = row.get("views_delta", 0)
-        for t in tags:
-            if t:
-                rows.append({"tag": t, "views_delta": delta})
-
-    if not rows:
-        return pd.DataFrame()
-
-    tag_df = pd.DataFrame(rows)
-    agg = (
-        tag_df.groupby("tag", as_index=False)["views_delta"]
-        .sum()
-        .sort_values("views_delta", ascending=False)
-    )
-    return agg
+    with profiling.stage(f"altair: {name}"):
+        st.altair_chart(chart, use_container_width=True)
 
 
 # ==================== ЗАГРУЗКА ДАННЫХ ====================
@@ -979,17 +649,51 @@ if not snap_dir_input:
     st.stop()
 
 try:
-    full_df = load_snapshots_from_directory(snap_dir_input)
+    with st.spinner("Читаем снапшоты..."), profiling.stage("загрузка снапшотов"):
+        snapshot_dataset = load_snapshot_dataset(
+            snap_dir_input, columns=SNAPSHOT_COLUMNS
+        )
 except FileNotFoundError as e:
     st.error(str(e))
     st.stop()
 
-if full_df.empty:
+if snapshot_dataset.empty:
     st.error("В папке нет валидных снапшотов (ytcat_*.csv).")
     st.stop()
 
-if "category_name" not in full_df.columns:
-    full_df["category_name"] = full_df["category_id"].astype(str)
+full_df = snapshot_dataset.df
+
+ingest_state = get_snapshot_ingest_state(
+    os.path.abspath(snap_dir_input), SNAPSHOT_COLUMNS
+)
+ingest_stats = ingest_state.last_stats
+if ingest_stats["added"] or ingest_stats["changed"] or ingest_stats["removed"]:
+    st.sidebar.caption(
+        f"Догружено файлов: новых {ingest_stats['added']}, "
+        f"изменённых {ingest_stats['changed']}, "
+        f"удалённых {ingest_stats['removed']}."
+    )
+if ingest_stats["failed"]:
+    st.sidebar.warning(
+        "Не удалось прочитать файлы (их строки убраны из данных): "
+        + ", ".join(ingest_stats["failed"])
+    )
+if ingest_stats.get("warm_start"):
+    st.sidebar.caption("Датасет поднят из сохранённой копии: файлы не менялись.")
+tag_lookups = ingest_stats["tag_hits"] + ingest_stats["tag_misses"]
+if tag_lookups:
+    st.sidebar.caption(
+        f"Кэш очистки тегов: {ingest_stats['tag_hits'] / tag_lookups:.0%} попаданий, "
+        f"новых тегов {ingest_stats['tag_misses']}."
+    )
+result_cache = ingest_state.results
+if result_cache.hits + result_cache.misses:
+    st.sidebar.caption(
+        f"Кэш расчётов: {result_cache.hit_rate():.0%} попаданий "
+        f"({result_cache.hits} / {result_cache.hits + result_cache.misses}), "
+        f"записей {len(result_cache)}, ~{result_cache.nbytes / 1024 / 1024:.1f} МБ, "
+        f"вытеснено {result_cache.evictions}."
+    )
 
 st.success(
     f"Считано {len(full_df)} строк, "
@@ -999,7 +703,7 @@ st.success(
 
 with st.expander("Список снапшотов по датам"):
     snap_summary = (
-        full_df.groupby("snapshot_ts")
+        full_df.groupby("snapshot_ts", observed=True)
         .agg(
             videos=("video_id", "nunique"),
             categories=("category_id", "nunique"),
@@ -1011,7 +715,38 @@ with st.expander("Список снапшотов по датам"):
     )
     st.table(snap_summary)
 
-snapshots = sorted(full_df["snapshot_ts"].dropna().unique())
+with st.expander("Память датасета"):
+    memory_now = snapshot_dataset.memory_usage()
+    memory_parts = dict(zip(memory_now["column"], memory_now["mb"]))
+    st.caption(
+        f"Сейчас в памяти ~{memory_now['mb'].sum():.1f} МБ "
+        f"(из них теги ~{memory_parts['tags']:.1f} МБ, "
+        f"тексты ~{memory_parts['text']:.1f} МБ: {len(snapshot_dataset.text)} версий "
+        f"на {len(snapshot_dataset)} строк)."
+    )
+    compaction = snapshot_dataset.memory_compaction
+    if compaction is not None:
+        mb_before, mb_after = compaction["mb_before"].sum(), compaction["mb_after"].sum()
+        st.caption(
+            f"Ужатие типов при загрузке: строки {mb_before:.1f} МБ → {mb_after:.1f} МБ "
+            f"(−{1 - mb_after / max(mb_before, 1e-9):.0%})."
+        )
+        st.dataframe(
+            compaction.assign(
+                mb_before=compaction["mb_before"].round(3),
+                mb_after=compaction["mb_after"].round(3),
+            ).sort_values("mb_before", ascending=False),
+            hide_index=True,
+            use_container_width=True,
+        )
+    else:
+        st.dataframe(
+            memory_now.assign(mb=memory_now["mb"].round(3)),
+            hide_index=True,
+            use_container_width=True,
+        )
+
+snapshots = snapshot_dataset.snapshots
 if len(snapshots) < 1:
     st.error("Нет ни одного снапшота.")
     st.stop()
@@ -1042,12 +777,19 @@ page = st.sidebar.radio(
 if page == "Аналитика одного снапшота":
     st.subheader("Аналитика одного снапшота")
 
+    # Вкладки ленивые: считается только открытая (tab.open), а тело каждой
+    # вкладки — фрагмент, поэтому виджет внутри вкладки перезапускает
+    # только её, а не весь скрипт. Так же устроены остальные страницы.
     tab_cat, tab_tags, tab_videos = st.tabs(
-        ["Обзор категорий", "Темы внутри категории", "Видео внутри категории"]
+        ["Обзор категорий", "Темы внутри категории", "Видео внутри категории"],
+        key="one_tabs",
+        on_change="rerun",
     )
 
     # ------------------ Вкладка: Обзор категорий ------------------
-    with tab_cat:
+    @st.fragment
+    @profiled_tab
+    def render_tab_cat():
         st.markdown(
             """
 Здесь мы смотрим на картину по категориям в один момент времени.
@@ -1076,9 +818,7 @@ if page == "Аналитика одного снапшота":
                 key="one_fresh_cat",
             )
 
-        cat_metrics = compute_category_metrics_for_snapshot(
-            full_df, snapshot_ts=ts_one, fresh_hours=fresh_hours_one
-        )
+        cat_metrics = ingest_state.category_metrics_at(ts_one, fresh_hours_one)
 
         if cat_metrics.empty:
             st.warning("Для выбранного снапшота нет данных по категориям.")
@@ -1107,7 +847,7 @@ if page == "Аналитика одного снапшота":
                 key="one_metric_share",
             )
 
-            plot_df = cat_metrics.copy().sort_values(
+            plot_df = cat_metrics.sort_values(
                 metric_for_share, ascending=False
             )
 
@@ -1145,7 +885,41 @@ if page == "Аналитика одного снапшота":
                 .properties(height=500)
             )
 
-            st.altair_chart(chart, use_container_width=True)
+            altair_chart(chart, "chart")
+
+            with st.expander("Чувствительность к fresh_hours (все пороги от 1 до 168 ч)"):
+                curve = snapshot_dataset.fresh_stats(np.arange(1.0, 169.0))
+                with profiling.stage("merge: кривая fresh_hours"):
+                    curve = curve[curve["snapshot_ts"] == ts_one].merge(
+                        snapshot_dataset.categories(ts_one), on="category_id", how="left"
+                    )
+                curve_metric = st.selectbox(
+                    "Метрика",
+                    options=["fresh_velocity", "fresh_videos"],
+                    key="one_fresh_curve_metric",
+                )
+                chart_curve = (
+                    alt.Chart(curve)
+                    .mark_line()
+                    .encode(
+                        x=alt.X("fresh_hours:Q", title="fresh_hours, ч"),
+                        y=alt.Y(f"{curve_metric}:Q", title=curve_metric),
+                        color=alt.Color("category_label:N", title="Категория"),
+                        tooltip=[
+                            "category_label:N",
+                            "fresh_hours:Q",
+                            "fresh_videos:Q",
+                            "fresh_velocity:Q",
+                        ],
+                    )
+                    .properties(height=400)
+                )
+                altair_chart(chart_curve, "chart_curve")
+                st.caption(
+                    "Каждая точка — метрика новых видео при своём пороге fresh_hours. "
+                    "Резкий скачок кривой показывает, на каком возрасте в категории "
+                    "сидит основной объём свежих просмотров."
+                )
 
             with st.expander("Таблица по категориям и объяснение колонок"):
                 st.dataframe(cat_metrics, use_container_width=True)
@@ -1232,8 +1006,14 @@ if page == "Аналитика одного снапшота":
                     r"\frac{fresh_{\text{velocity}}}{total_{\text{fresh\_velocity}}}"
                 )
 
+    with tab_cat:
+        if tab_cat.open:
+            render_tab_cat()
+
     # ------------------ Вкладка: Темы внутри категории ------------------
-    with tab_tags:
+    @st.fragment
+    @profiled_tab
+    def render_tab_tags():
         st.markdown(
             """
 Здесь мы смотрим на темы (теги) внутри одной категории в один момент времени.
@@ -1252,16 +1032,7 @@ if page == "Аналитика одного снапшота":
                 key="one_ts_tags",
             )
 
-        df_for_ts = full_df[full_df["snapshot_ts"] == ts_tags].copy()
-        df_for_ts["category_label"] = df_for_ts["category_name"].fillna(
-            df_for_ts["category_id"].astype(str)
-        )
-
-        available_categories = (
-            df_for_ts[["category_id", "category_label"]]
-            .drop_duplicates()
-            .sort_values("category_label")
-        )
+        available_categories = snapshot_dataset.categories(ts_tags)
 
         if available_categories.empty:
             st.warning("Для выбранного снапшота нет категорий.")
@@ -1306,11 +1077,8 @@ if page == "Аналитика одного снапшота":
                 key="one_min_videos_tag",
             )
 
-            df_slice = df_for_ts[df_for_ts["category_id"] == str(selected_cat_id)].copy()
-            tag_metrics = compute_tag_metrics_for_df_slice(
-                df_slice,
-                fresh_hours=fresh_hours_tags,
-                min_videos_per_tag=min_videos_per_tag,
+            tag_metrics = ingest_state.tag_metrics(
+                ts_tags, selected_cat_id, fresh_hours_tags, min_videos_per_tag
             )
 
             if tag_metrics.empty:
@@ -1337,8 +1105,9 @@ if page == "Аналитика одного снапшота":
 
                 st.subheader("Карта тем: объём против скорости новых видео")
 
-                scatter_df = tag_metrics.copy()
-                scatter_df["status_cat"] = scatter_df["status"].astype("category")
+                scatter_df = tag_metrics.assign(
+                    status_cat=tag_metrics["status"].astype("category")
+                )
 
                 chart_tags = (
                     alt.Chart(scatter_df)
@@ -1375,7 +1144,7 @@ if page == "Аналитика одного снапшота":
                     .interactive()
                 )
 
-                st.altair_chart(chart_tags, use_container_width=True)
+                altair_chart(chart_tags, "chart_tags")
 
                 st.subheader("Топ тем по скорости новых видео")
                 top_tags_by_vel = tag_metrics.sort_values(
@@ -1466,8 +1235,14 @@ if page == "Аналитика одного снапшота":
                 with st.expander("Сырые данные по тегам"):
                     st.dataframe(tag_metrics, use_container_width=True)
 
+    with tab_tags:
+        if tab_tags.open:
+            render_tab_tags()
+
     # ------------------ Вкладка: Видео внутри категории ------------------
-    with tab_videos:
+    @st.fragment
+    @profiled_tab
+    def render_tab_videos():
         st.markdown(
             """
 Здесь мы смотрим на отдельные видео внутри категории в один момент (без динамики).
@@ -1484,15 +1259,7 @@ if page == "Аналитика одного снапшота":
                 key="one_ts_videos",
             )
 
-        df_ts = full_df[full_df["snapshot_ts"] == ts_vid].copy()
-        df_ts["category_label"] = df_ts["category_name"].fillna(
-            df_ts["category_id"].astype(str)
-        )
-        available_categories_v = (
-            df_ts[["category_id", "category_label"]]
-            .drop_duplicates()
-            .sort_values("category_label")
-        )
+        available_categories_v = snapshot_dataset.categories(ts_vid)
 
         if available_categories_v.empty:
             st.warning("Для выбранного снапшота нет категорий.")
@@ -1518,7 +1285,7 @@ if page == "Аналитика одного снапшота":
                 )
             selected_cat_id_v, selected_cat_label_v = cat_map_v[selected_cat_option_v]
 
-            df_cat_vid = df_ts[df_ts["category_id"] == str(selected_cat_id_v)].copy()
+            df_cat_vid = snapshot_dataset.rows(ts_vid, selected_cat_id_v)
             if df_cat_vid.empty:
                 st.warning("В этой категории нет видео для выбранного снапшота.")
             else:
@@ -1543,13 +1310,6 @@ if page == "Аналитика одного снапшота":
                 if df_cat_vid.empty:
                     st.warning("После фильтрации видео не осталось.")
                 else:
-                    df_cat_vid["views"] = pd.to_numeric(
-                        df_cat_vid.get("views", 0), errors="coerce"
-                    ).fillna(0)
-                    df_cat_vid["views_per_hour"] = pd.to_numeric(
-                        df_cat_vid.get("views_per_hour", 0.0), errors="coerce"
-                    ).fillna(0.0)
-
                     top_n_local = st.slider(
                         "Сколько видео показать",
                         min_value=10,
@@ -1563,11 +1323,14 @@ if page == "Аналитика одного снапшота":
                         s = str(s)
                         return s if len(s) <= max_len else s[: max_len - 3] + "..."
 
-                    top_videos_cat = df_cat_vid.sort_values(
-                        "views_per_hour", ascending=False
-                    ).head(top_n_local)
-                    top_videos_cat["title_short"] = top_videos_cat["title"].apply(
-                        short_title
+                    # тексты подставляем только для показанных видео
+                    top_videos_cat = snapshot_dataset.with_text(
+                        df_cat_vid.sort_values("views_per_hour", ascending=False).head(
+                            top_n_local
+                        )
+                    )
+                    top_videos_cat = top_videos_cat.assign(
+                        title_short=top_videos_cat["title"].apply(short_title)
                     )
 
                     st.bar_chart(
@@ -1627,6 +1390,10 @@ if page == "Аналитика одного снапшота":
                             "- **published_at** — дата и время публикации видео."
                         )
 
+    with tab_videos:
+        if tab_videos.open:
+            render_tab_videos()
+
 # ===================================================================
 #                 СТРАНИЦА 2. ДИНАМИКА МЕЖДУ СНАПШОТАМИ
 # ===================================================================
@@ -1635,11 +1402,15 @@ elif page == "Динамика между снапшотами":
     st.subheader("Динамика между снапшотами")
 
     tab_cat_dyn, tab_tags_dyn, tab_videos_dyn = st.tabs(
-        ["Категории", "Темы внутри категории", "Видео"]
+        ["Категории", "Темы внутри категории", "Видео"],
+        key="dyn_tabs",
+        on_change="rerun",
     )
 
     # ------------------ ДИНАМИКА КАТЕГОРИЙ ------------------
-    with tab_cat_dyn:
+    @st.fragment
+    @profiled_tab
+    def render_tab_cat_dyn():
         st.markdown(
             """
 Здесь мы сравниваем две точки во времени и смотрим, где вырос интерес к новым видео.
@@ -1678,12 +1449,11 @@ elif page == "Динамика между снапшотами":
         if ts2_cat <= ts1_cat:
             st.warning("Поздний снапшот должен быть позже раннего.")
         else:
-            cat1 = compute_category_metrics_for_snapshot(
-                full_df, ts1_cat, fresh_hours=fresh_hours_dyn_cat
-            )
-            cat2 = compute_category_metrics_for_snapshot(
-                full_df, ts2_cat, fresh_hours=fresh_hours_dyn_cat
+            cat_all = load_category_metrics(
+                snap_dir_input, fresh_hours_dyn_cat, SNAPSHOT_COLUMNS
             )
+            cat1 = ingest_state.category_metrics_at(ts1_cat, fresh_hours_dyn_cat)
+            cat2 = ingest_state.category_metrics_at(ts2_cat, fresh_hours_dyn_cat)
 
             if cat1.empty or cat2.empty:
                 st.warning("Не удалось посчитать метрики для одного из снапшотов.")
@@ -1691,12 +1461,13 @@ elif page == "Динамика между снапшотами":
                 c1 = cat1.add_suffix("_t1")
                 c2 = cat2.add_suffix("_t2")
 
-                merged_cat = c1.merge(
-                    c2,
-                    left_on="category_id_t1",
-                    right_on="category_id_t2",
-                    how="outer",
-                )
+                with profiling.stage("merge: категории t1/t2"):
+                    merged_cat = c1.merge(
+                        c2,
+                        left_on="category_id_t1",
+                        right_on="category_id_t2",
+                        how="outer",
+                    )
 
                 merged_cat["category_id"] = merged_cat["category_id_t1"].fillna(
                     merged_cat["category_id_t2"]
@@ -1784,7 +1555,42 @@ elif page == "Динамика между снапшотами":
                     .properties(height=500)
                 )
 
-                st.altair_chart(chart_cat, use_container_width=True)
+                altair_chart(chart_cat, "chart_cat")
+
+                with st.expander("Категории во времени (все снапшоты)"):
+                    share_metric = st.selectbox(
+                        "Метрика",
+                        options=[
+                            "fresh_velocity_share",
+                            "velocity_share",
+                            "volume_share",
+                            "fresh_velocity",
+                            "freshness",
+                        ],
+                        index=0,
+                        key="dyn_cat_series_metric",
+                    )
+                    series_cats = top_cat["category_id"].head(10).tolist()
+                    cat_series = cat_all[cat_all["category_id"].isin(series_cats)]
+                    chart_series = (
+                        alt.Chart(cat_series)
+                        .mark_line(point=True)
+                        .encode(
+                            x=alt.X("snapshot_ts:T", title="Снапшот"),
+                            y=alt.Y(f"{share_metric}:Q", title=share_metric),
+                            color=alt.Color("category_name:N", title="Категория"),
+                            tooltip=[
+                                "snapshot_ts:T",
+                                "category_name:N",
+                                f"{share_metric}:Q",
+                            ],
+                        )
+                        .properties(
+                            height=350,
+                            title="Топ-10 категорий по росту Fresh Velocity",
+                        )
+                    )
+                    altair_chart(chart_series, "chart_series")
 
                 with st.expander(
                     "Таблица по категориям (динамика) и пояснение колонок"
@@ -1846,8 +1652,14 @@ elif page == "Динамика между снапшотами":
                         r"freshness_{t2} - freshness_{t1}"
                     )
 
+    with tab_cat_dyn:
+        if tab_cat_dyn.open:
+            render_tab_cat_dyn()
+
     # ------------------ ДИНАМИКА ТЕМ ВНУТРИ КАТЕГОРИИ ------------------
-    with tab_tags_dyn:
+    @st.fragment
+    @profiled_tab
+    def render_tab_tags_dyn():
         st.markdown(
             """
 Здесь мы смотрим, как меняются темы (теги) внутри одной категории между двумя снапшотами.
@@ -1874,15 +1686,7 @@ elif page == "Динамика между снапшотами":
                 key="dyn_tags_ts2",
             )
 
-        df_all_cat = full_df.copy()
-        df_all_cat["category_label"] = df_all_cat["category_name"].fillna(
-            df_all_cat["category_id"].astype(str)
-        )
-        available_categories_all = (
-            df_all_cat[["category_id", "category_label"]]
-            .drop_duplicates()
-            .sort_values("category_label")
-        )
+        available_categories_all = snapshot_dataset.categories()
         if available_categories_all.empty:
             st.warning("В данных нет категорий.")
         else:
@@ -1931,24 +1735,17 @@ elif page == "Динамика между снапшотами":
             if ts2_tags <= ts1_tags:
                 st.warning("Поздний снапшот должен быть позже раннего.")
             else:
-                df_ts1_cat = full_df[
-                    (full_df["snapshot_ts"] == ts1_tags)
-                    & (full_df["category_id"] == str(selected_cat_id_dyn))
-                ].copy()
-                df_ts2_cat = full_df[
-                    (full_df["snapshot_ts"] == ts2_tags)
-                    & (full_df["category_id"] == str(selected_cat_id_dyn))
-                ].copy()
-
-                tags_t1 = compute_tag_metrics_for_df_slice(
-                    df_ts1_cat,
-                    fresh_hours=fresh_hours_dyn_tags,
-                    min_videos_per_tag=min_videos_per_tag_dyn,
+                tags_t1 = ingest_state.tag_metrics(
+                    ts1_tags,
+                    selected_cat_id_dyn,
+                    fresh_hours_dyn_tags,
+                    min_videos_per_tag_dyn,
                 )
-                tags_t2 = compute_tag_metrics_for_df_slice(
-                    df_ts2_cat,
-                    fresh_hours=fresh_hours_dyn_tags,
-                    min_videos_per_tag=min_videos_per_tag_dyn,
+                tags_t2 = ingest_state.tag_metrics(
+                    ts2_tags,
+                    selected_cat_id_dyn,
+                    fresh_hours_dyn_tags,
+                    min_videos_per_tag_dyn,
                 )
 
                 if tags_t1.empty or tags_t2.empty:
@@ -1959,12 +1756,13 @@ elif page == "Динамика между снапшотами":
                     t1 = tags_t1.add_suffix("_t1")
                     t2 = tags_t2.add_suffix("_t2")
 
-                    merged_tags = t1.merge(
-                        t2,
-                        left_on="tag_t1",
-                        right_on="tag_t2",
-                        how="inner",
-                    )
+                    with profiling.stage("merge: теги t1/t2"):
+                        merged_tags = t1.merge(
+                            t2,
+                            left_on="tag_t1",
+                            right_on="tag_t2",
+                            how="inner",
+                        )
 
                     merged_tags["tag"] = merged_tags["tag_t1"]
 
@@ -2109,8 +1907,14 @@ elif page == "Динамика между снапшотами":
                             "в начале и в конце периода."
                         )
 
+    with tab_tags_dyn:
+        if tab_tags_dyn.open:
+            render_tab_tags_dyn()
+
     # ------------------ ДИНАМИКА ВИДЕО ------------------
-    with tab_videos_dyn:
+    @st.fragment
+    @profiled_tab
+    def render_tab_videos_dyn():
         st.markdown(
             """
 Здесь мы смотрим, как растут отдельные видео между двумя снапшотами.
@@ -2148,7 +1952,13 @@ elif page == "Динамика между снапшотами":
         if ts2_vid <= ts1_vid:
             st.warning("Поздний снапшот должен быть позже раннего.")
         else:
-            growth_df = compute_growth_between_snapshots(full_df, ts1_vid, ts2_vid)
+            # рост, теги и траектории — из одного датасета: фрагмент
+            # перезапускается без всего скрипта, а общее состояние могла
+            # обновить другая сессия
+            dataset_v, dataset_version_v = ingest_state.current()
+            growth_df = ingest_state.growth(
+                ts1_vid, ts2_vid, (dataset_v, dataset_version_v)
+            )
             if growth_df.empty:
                 st.warning("Нет пересечения video_id между выбранными снапшотами.")
             else:
@@ -2194,7 +2004,7 @@ elif page == "Динамика между снапшотами":
                     key="dyn_vid_top_n",
                 )
 
-                filtered_v = growth_df.copy()
+                filtered_v = growth_df
                 if selected_cats_v:
                     filtered_v = filtered_v[filtered_v[cat_col_v].isin(selected_cats_v)]
 
@@ -2245,10 +2055,9 @@ elif page == "Динамика между снапшотами":
                     top_videos = filtered_v.sort_values(
                         "views_per_hour_between", ascending=False
                     ).head(top_n_v)
-                    top_videos_display = top_videos.copy()
-                    top_videos_display["title_short"] = top_videos_display[
-                        "title_t2"
-                    ].apply(short_title_dyn)
+                    top_videos_display = top_videos.assign(
+                        title_short=top_videos["title_t2"].apply(short_title_dyn)
+                    )
 
                     st.bar_chart(
                         data=top_videos_display.set_index("title_short")[
@@ -2314,7 +2123,29 @@ elif page == "Динамика между снапшотами":
 
                     st.subheader("Теги по росту просмотров в этом окне")
 
-                    tag_growth_v = explode_tags_for_growth(filtered_v)
+                    tag_weighting_v = st.radio(
+                        "Как засчитывать прирост видео тегам",
+                        options=["full", "split"],
+                        format_func=lambda w: {
+                            "full": "Каждому тегу весь прирост",
+                            "split": "Делить прирост поровну между тегами видео",
+                        }[w],
+                        index=0,
+                        horizontal=True,
+                        key="dyn_vid_tag_weighting",
+                    )
+                    tag_growth_v = ingest_state.results.get(
+                        (
+                            "tag_growth", dataset_version_v, ts1_vid, ts2_vid,
+                            tuple(selected_cats_v), shorts_filter_v,
+                            min_views_delta_v, tag_weighting_v,
+                        ),
+                        lambda: explode_tags_for_growth(
+                            filtered_v,
+                            tag_index=dataset_v.tags,
+                            weighting=tag_weighting_v,
+                        ),
+                    )
                     if tag_growth_v.empty:
                         st.info("Не удалось собрать теги для выбранного набора видео.")
                     else:
@@ -2327,6 +2158,33 @@ elif page == "Динамика между снапшотами":
                     with st.expander("Сырые строки по видео"):
                         st.dataframe(filtered_v, use_container_width=True)
 
+                    with st.expander("Траектория видео по всем снапшотам"):
+                        traj_titles = dict(
+                            zip(
+                                top_videos_display["video_id"],
+                                top_videos_display["title_short"],
+                            )
+                        )
+                        traj_video = st.selectbox(
+                            "Видео (из топа выше)",
+                            options=list(traj_titles),
+                            format_func=lambda v: f"{traj_titles[v]} ({v})",
+                            key="dyn_vid_trajectory",
+                        )
+                        traj_df = dataset_v.trajectories.trajectory(traj_video)
+                        if traj_df.empty:
+                            st.info("Для этого видео нет истории.")
+                        else:
+                            st.line_chart(traj_df.set_index("snapshot_ts")["views"])
+                            st.dataframe(
+                                traj_df.drop(columns=["row"]),
+                                use_container_width=True,
+                            )
+
+    with tab_videos_dyn:
+        if tab_videos_dyn.open:
+            render_tab_videos_dyn()
+
 # ===================================================================
 #                 СТРАНИЦА 3. ПЕСОЧНИЦА ДАННЫХ
 # ===================================================================
@@ -2358,11 +2216,15 @@ elif page == "Песочница":
     ]
 
     tab_tag_radar, tab_snap, tab_upload = st.tabs(
-        ["Радар по тегам", "Фильтр сырых строк", "Загрузить CSV"]
+        ["Радар по тегам", "Фильтр сырых строк", "Загрузить CSV"],
+        key="sandbox_tabs",
+        on_change="rerun",
     )
 
     # ---------- Вкладка 1: радар по тегам ----------
-    with tab_tag_radar:
+    @st.fragment
+    @profiled_tab
+    def render_tab_tag_radar():
         st.markdown(
             """
 Здесь можно посмотреть, как **одна тема (тег)** живёт во времени:
@@ -2433,70 +2295,60 @@ elif page == "Песочница":
             if not search_tag.strip():
                 st.warning("Сначала введи тег или часть тега.")
             else:
-                df_base = full_df.copy()
-
                 # фильтр по категории
+                cat_id_radar = None
                 if cat_option_tag != "Все категории":
                     m_cat = re.search(r"id=(\d+)", cat_option_tag)
                     if m_cat:
-                        cat_id_selected = m_cat.group(1)
-                        df_base = df_base[df_base["category_id"] == str(cat_id_selected)]
+                        cat_id_radar = m_cat.group(1)
 
-                if df_base.empty:
+                if (
+                    cat_id_radar is not None
+                    and cat_id_radar not in snapshot_dataset.category_ids
+                ):
                     st.warning("По выбранной категории данных нет.")
                 else:
-                    time_rows = []
-                    per_tag_rows = []
                     pattern = search_tag.strip().lower()
+                    tag_cube = load_tag_metrics_cube(
+                        snap_dir_input, fresh_hours_tag_radar, SNAPSHOT_COLUMNS
+                    )
 
-                    # проходим по всем снапшотам
-                    for ts in snapshots:
-                        df_ts = df_base[df_base["snapshot_ts"] == ts].copy()
-                        if df_ts.empty:
-                            continue
-
-                        tag_metrics_ts = compute_tag_metrics_for_df_slice(
-                            df_ts,
-                            fresh_hours=fresh_hours_tag_radar,
-                            min_videos_per_tag=min_videos_per_tag_radar,
-                        )
-                        if tag_metrics_ts.empty:
-                            continue
+                    # ищем подходящие теги один раз по индексу словаря куба
+                    radar_tag_ids = tag_cube.search(
+                        pattern, exact=match_mode == "Точное совпадение"
+                    )
 
-                        # фильтруем метрики по тегу / подстроке
-                        if match_mode == "Точное совпадение":
-                            mask = tag_metrics_ts["tag"].str.lower() == pattern
-                        else:
-                            mask = tag_metrics_ts["tag"].str.lower().str.contains(
-                                pattern
-                            )
+                    # и одним срезом берём их историю по всем снапшотам
+                    tag_history = ingest_state.tag_history(
+                        pattern,
+                        match_mode == "Точное совпадение",
+                        cat_id_radar,
+                        fresh_hours_tag_radar,
+                        min_videos_per_tag_radar,
+                    )
 
-                        tag_sel = tag_metrics_ts[mask].copy()
-                        if tag_sel.empty:
-                            continue
-
-                        # агрегат по снапшоту
-                        time_rows.append(
-                            {
-                                "snapshot_ts": ts,
-                                "volume": float(tag_sel["volume"].sum()),
-                                "velocity": float(tag_sel["velocity"].sum()),
-                                "freshness": float(tag_sel["freshness"].mean()),
-                                "tags_cnt": int(len(tag_sel)),
-                            }
+                    # агрегат по снапшоту
+                    time_rows = (
+                        tag_history.groupby("snapshot_ts", observed=True)
+                        .agg(
+                            volume=("volume", "sum"),
+                            velocity=("velocity", "sum"),
+                            freshness=("freshness", "mean"),
+                            tags_cnt=("tag", "size"),
                         )
+                        .reset_index()
+                        .astype({"volume": float, "velocity": float})
+                        .to_dict("records")
+                    )
 
-                        # построчно для тепловой карты
-                        for _, row in tag_sel.iterrows():
-                            per_tag_rows.append(
-                                {
-                                    "snapshot_ts": ts,
-                                    "tag": row["tag"],
-                                    "volume": float(row["volume"]),
-                                    "velocity": float(row["velocity"]),
-                                    "freshness": float(row["freshness"]),
-                                }
-                            )
+                    # построчно для тепловой карты
+                    per_tag_rows = (
+                        tag_history[
+                            ["snapshot_ts", "tag", "volume", "velocity", "freshness"]
+                        ]
+                        .astype({"volume": float, "velocity": float, "freshness": float})
+                        .to_dict("records")
+                    )
 
                     if not time_rows:
                         st.warning(
@@ -2574,9 +2426,9 @@ elif page == "Песочница":
                             )
                         )
 
-                        st.altair_chart(chart_vel, use_container_width=True)
-                        st.altair_chart(chart_vol, use_container_width=True)
-                        st.altair_chart(chart_fresh, use_container_width=True)
+                        altair_chart(chart_vel, "chart_vel")
+                        altair_chart(chart_vol, "chart_vol")
+                        altair_chart(chart_fresh, "chart_fresh")
 
                         st.markdown("### 2. Тепловая карта: тег × снапшот")
 
@@ -2585,7 +2437,7 @@ elif page == "Песочница":
 
                             # топ-20 тегов по суммарному объёму
                             top_tags = (
-                                df_per_tag.groupby("tag")["volume"]
+                                df_per_tag.groupby("tag", observed=True)["volume"]
                                 .sum()
                                 .sort_values(ascending=False)
                                 .head(20)
@@ -2629,7 +2481,7 @@ elif page == "Песочница":
                                 )
                             )
 
-                            st.altair_chart(heat_chart, use_container_width=True)
+                            altair_chart(heat_chart, "heat_chart")
                         else:
                             st.info(
                                 "Недостаточно данных для тепловой карты по тегам."
@@ -2638,25 +2490,18 @@ elif page == "Песочница":
                         st.markdown("### 3. Срез по тегам в последнем снапшоте")
 
                         last_ts = snapshots[-1]
-                        df_last = df_base[df_base["snapshot_ts"] == last_ts].copy()
-                        tag_metrics_last = compute_tag_metrics_for_df_slice(
-                            df_last,
-                            fresh_hours=fresh_hours_tag_radar,
-                            min_videos_per_tag=min_videos_per_tag_radar,
+                        tag_metrics_last = ingest_state.tag_metrics(
+                            last_ts,
+                            cat_id_radar,
+                            fresh_hours_tag_radar,
+                            min_videos_per_tag_radar,
                         )
                         if not tag_metrics_last.empty:
-                            if match_mode == "Точное совпадение":
-                                mask_last = (
-                                    tag_metrics_last["tag"].str.lower() == pattern
-                                )
-                            else:
-                                mask_last = (
-                                    tag_metrics_last["tag"]
-                                    .str.lower()
-                                    .str.contains(pattern)
-                                )
+                            mask_last = tag_metrics_last["tag"].isin(
+                                tag_cube.vocab[radar_tag_ids]
+                            )
 
-                            tag_last_sel = tag_metrics_last[mask_last].copy()
+                            tag_last_sel = tag_metrics_last[mask_last]
                             if tag_last_sel.empty:
                                 st.info(
                                     "В последнем снапшоте для этого тега нет совпадений."
@@ -2676,8 +2521,14 @@ elif page == "Песочница":
                                 "В последнем снапшоте не удалось посчитать метрики по тегам."
                             )
 
+    with tab_tag_radar:
+        if tab_tag_radar.open:
+            render_tab_tag_radar()
+
     # ---------- Вкладка 2: фильтр сырых строк ----------
-    with tab_snap:
+    @st.fragment
+    @profiled_tab
+    def render_tab_snap():
         st.markdown("#### Фильтры для данных из папки со снапшотами")
 
         col_filters_top = st.columns(3)
@@ -2732,24 +2583,40 @@ elif page == "Песочница":
                 key="sandbox_max_rows",
             )
 
-        df_view = full_df.copy()
+        load_all_columns = st.checkbox(
+            "Показать все колонки (описания, сырые теги)",
+            value=False,
+            help="Эти колонки не держим в памяти, а дочитываем из хранилища "
+            "только для выбранных снапшотов и категорий.",
+            key="sandbox_all_columns",
+        )
 
         # фильтр по снапшоту
+        ts_selected = None
         if snap_option != "Все снапшоты":
-            ts_selected = None
             for ts, label in snap_labels.items():
                 if label == snap_option:
                     ts_selected = ts
                     break
-            if ts_selected is not None:
-                df_view = df_view[df_view["snapshot_ts"] == ts_selected]
 
         # фильтр по категории
+        cat_id_selected = None
         if cat_option_sandbox != "Все категории":
             m = re.search(r"id=(\d+)", cat_option_sandbox)
             if m:
                 cat_id_selected = m.group(1)
+
+        df_view = snapshot_dataset.rows(ts_selected, cat_id_selected)
+
+        if load_all_columns and not df_view.empty:
+            df_view = get_snapshot_store(os.path.abspath(snap_dir_input)).read(
+                sorted(df_view["snapshot_file"].unique())
+            )
+            # файл целиком может содержать и другие категории
+            if cat_id_selected is not None:
                 df_view = df_view[df_view["category_id"] == str(cat_id_selected)]
+        else:
+            df_view = snapshot_dataset.with_tags(snapshot_dataset.with_text(df_view))
 
         # фильтр по shorts
         if "from_shorts" in df_view.columns:
@@ -2760,16 +2627,14 @@ elif page == "Песочница":
 
         # фильтр по views / views_per_hour
         if "views" in df_view.columns:
-            df_view["views"] = pd.to_numeric(
-                df_view["views"], errors="coerce"
-            ).fillna(0)
-            df_view = df_view[df_view["views"] >= min_views]
+            views_num = pd.to_numeric(df_view["views"], errors="coerce").fillna(0)
+            df_view = df_view[views_num >= min_views]
 
         if "views_per_hour" in df_view.columns:
-            df_view["views_per_hour"] = pd.to_numeric(
+            vph_num = pd.to_numeric(
                 df_view["views_per_hour"], errors="coerce"
             ).fillna(0.0)
-            df_view = df_view[df_view["views_per_hour"] >= min_vph]
+            df_view = df_view[vph_num >= min_vph]
 
         if df_view.empty:
             st.warning("По этим фильтрам данных нет.")
@@ -2795,8 +2660,14 @@ elif page == "Песочница":
                 numeric_desc = df_view.describe(include="number")
                 st.dataframe(numeric_desc, use_container_width=True)
 
+    with tab_snap:
+        if tab_snap.open:
+            render_tab_snap()
+
     # ---------- Вкладка 3: загрузка CSV вручную ----------
-    with tab_upload:
+    @st.fragment
+    @profiled_tab
+    def render_tab_upload():
         st.markdown(
             """
 Можно загрузить любой CSV-файл (например, свежий снапшот) и посмотреть его содержимое.
@@ -2840,3 +2711,64 @@ elif page == "Песочница":
             st.info(
                 "Файл ещё не загружен. Выбери CSV выше, чтобы посмотреть его в песочнице."
             )
+
+    with tab_upload:
+        if tab_upload.open:
+            render_tab_upload()
+
+# ==================== ПРОФИЛИРОВАНИЕ ====================
+
+st.sidebar.header("Профилирование")
+st.sidebar.toggle(
+    "Замерять стадии перезапуска",
+    value=PROFILE,
+    key="profile_reruns",
+    help="Время загрузки, расчётов, merge и графиков для каждого перезапуска; "
+    "строки пишутся и в лог yt_radar.profile.",
+)
+if profile_reruns:
+    st.sidebar.checkbox(
+        "cProfile самого медленного перезапуска",
+        key="profile_cprofile",
+        help="Весь перезапуск идёт под cProfile; самый медленный сохраняется в файл .prof.",
+    )
+    remember_rerun_profile(profiling.finish_rerun())
+    with st.sidebar.expander("Стадии перезапуска", expanded=True):
+        profile_history = st.session_state.get("profile_history", [])
+        last_rerun = next(
+            (p for p in reversed(profile_history) if p["label"] == "перезапуск"), None
+        )
+        if last_rerun is not None:
+            st.caption(f"Последний перезапуск: {last_rerun['total_ms']:.0f} мс")
+            stages_view = last_rerun["stages"].assign(
+                stage=lambda d: [
+                    "\u2003" * depth + name for depth, name in zip(d["depth"], d["stage"])
+                ],
+                ms=lambda d: d["ms"].round(1),
+                share=lambda d: (d["share"] * 100).round(1),
+            )
+            st.dataframe(
+                stages_view[["stage", "ms", "share"]].rename(
+                    columns={"stage": "стадия", "ms": "мс", "share": "%"}
+                ),
+                hide_index=True,
+                use_container_width=True,
+            )
+        st.caption("Последние перезапуски и фрагменты:")
+        st.dataframe(
+            pd.DataFrame(
+                {
+                    "время": [p["started_at"].strftime("%H:%M:%S") for p in profile_history],
+                    "что": [p["label"] for p in profile_history],
+                    "мс": [round(p["total_ms"], 1) for p in profile_history],
+                }
+            ).iloc[::-1],
+            hide_index=True,
+            use_container_width=True,
+        )
+        slowest = profiling.slowest_rerun()
+        if slowest["path"]:
+            st.caption(
+                f"cProfile самого медленного ({slowest['label']}, "
+                f"{slowest['seconds']:.2f} с): {slowest['path']}"
+            )
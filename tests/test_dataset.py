@@ -0,0 +1,183 @@
+import numpy as np
+import pandas as pd
+
+from yt_radar import (
+    SnapshotDataset,
+    SnapshotStore,
+    compute_category_metrics_all,
+    compute_tag_metrics_for_df_slice,
+    generate_snapshots,
+)
+
+
+def repeated_video_snapshots() -> pd.DataFrame:
+    rows = [
+        # (часы от начала, видео, категория, просмотры)
+        # "a" в первом снапшоте в двух категориях, в третьем его нет
+        (0, "a", "2", 90),
+        (0, "a", "1", 100),
+        (0, "b", "1", 10),
+        (6, "a", "2", 150),
+        (6, "b", "1", 20),
+        (12, "b", "1", 40),
+        (12, "c", "2", 5),
+        (24, "a", "3", 310),
+        (24, "a", "1", 300),
+        (24, "b", "1", 80),
+    ]
+    df = pd.DataFrame(rows, columns=["hours", "video_id", "category_id", "views"])
+    df["snapshot_ts"] = pd.Timestamp("2025-01-01") + pd.to_timedelta(df.pop("hours"), unit="h")
+    df["published_at"] = "2024-12-31T00:00:00Z"
+    df["title"] = "T " + df["video_id"]
+    return df
+
+
+def reference_observations(dataset: SnapshotDataset) -> pd.DataFrame:
+    # то же через pandas: одна строка на (видео, снапшот) — первая
+    # по category_id, затем разности внутри видео
+    df = dataset.df.assign(row=np.arange(len(dataset.df)))
+    df["category_id"] = df["category_id"].astype(str)
+    obs = (
+        df.sort_values(["snapshot_ts", "category_id"], kind="stable")
+        .drop_duplicates(["video_id", "snapshot_ts"])
+        .sort_values(["video_id", "snapshot_ts"])
+        .reset_index(drop=True)
+    )
+    obs["views"] = obs["views"].astype(float)
+    obs["hours"] = (obs["snapshot_ts"] - obs["snapshot_ts"].min()).dt.total_seconds() / 3600
+    return obs[["video_id", "snapshot_ts", "row", "views", "hours"]]
+
+
+def test_trajectory_steps_pair_neighbouring_observations():
+    dataset = SnapshotDataset(repeated_video_snapshots())
+    traj = dataset.trajectories
+    assert len(traj) == 8
+
+    steps = traj.steps().sort_values(["video_id", "snapshot_ts"]).reset_index(drop=True)
+    ts = [pd.Timestamp("2025-01-01") + pd.Timedelta(hours=h) for h in (0, 6, 12, 24)]
+    expected = pd.DataFrame(
+        {
+            "video_id": ["a", "a", "b", "b", "b"],
+            "snapshot_ts_prev": [ts[0], ts[1], ts[0], ts[1], ts[2]],
+            "snapshot_ts": [ts[1], ts[3], ts[1], ts[2], ts[3]],
+            # у "a" берётся строка категории "1", пропуск снапшота — один шаг
+            "views_prev": [100.0, 150.0, 10.0, 20.0, 40.0],
+            "views": [150.0, 300.0, 20.0, 40.0, 80.0],
+            "views_delta": [50.0, 150.0, 10.0, 20.0, 40.0],
+            "hours_between_snaps": [6.0, 18.0, 6.0, 6.0, 12.0],
+        }
+    )
+    expected["views_per_hour_between"] = (
+        expected["views_delta"] / expected["hours_between_snaps"]
+    )
+    pd.testing.assert_frame_equal(steps, expected, check_dtype=False)
+
+    # траектория одного видео — те же шаги
+    a = traj.trajectory("a")
+    assert a["views"].tolist() == [100.0, 150.0, 300.0]
+    assert dataset.df.loc[a["row"], "category_id"].astype(str).tolist() == ["1", "2", "1"]
+    assert a["views_delta"].tolist()[1:] == [50.0, 150.0]
+    assert traj.trajectory("c")["views_delta"].isna().all()
+    assert traj.trajectory("nope").empty
+
+
+def test_rolling_velocity_matches_groupby_diff():
+    dataset = SnapshotDataset(repeated_video_snapshots())
+    traj = dataset.trajectories
+    ref = reference_observations(dataset)
+    got = pd.DataFrame(
+        {
+            "video_id": traj.video_ids[traj.video],
+            "snapshot_ts": np.array(traj.snapshots, dtype="datetime64[ns]")[traj.snap],
+            "row": traj.rows,
+        }
+    )
+    pd.testing.assert_frame_equal(
+        got.sort_values(["video_id", "snapshot_ts"]).reset_index(drop=True),
+        ref[["video_id", "snapshot_ts", "row"]],
+        check_dtype=False,
+    )
+
+    order = np.lexsort((got["snapshot_ts"], got["video_id"]))
+    for window in (1, 2, 3):
+        by_video = ref.groupby("video_id")
+        expected = (by_video["views"].diff(window) / by_video["hours"].diff(window)).to_numpy()
+        np.testing.assert_allclose(traj.rolling_velocity(window)[order], expected)
+
+    # "a": 100 -> 300 за сутки, "b": 10 -> 40 и 20 -> 80 за два шага
+    velocity = traj.rolling_velocity(2)[order]
+    assert velocity[2] == 200 / 24
+    assert velocity[5:7].tolist() == [30 / 12, 60 / 18]
+    assert np.isnan(traj.rolling_velocity(4)).all()
+
+
+def uncompacted(dataset: SnapshotDataset) -> pd.DataFrame:
+    # те же строки с типами до compact_snapshot_columns
+    report = dataset.memory_compaction
+    changed = report[report["dtype_before"] != report["dtype_after"]]
+    return dataset.df.astype(dict(zip(changed["column"], changed["dtype_before"])))
+
+
+def grouped(df: pd.DataFrame, keys: list) -> pd.DataFrame:
+    out = (
+        df.groupby(keys, observed=True)
+        .agg(
+            volume=("views", "sum"),
+            velocity_total=("views_per_hour", "sum"),
+            shorts=("from_shorts", "sum"),
+            duration=("duration_sec", "max"),
+            videos_cnt=("video_id", "nunique"),
+        )
+        .reset_index()
+    )
+    return out.astype({key: str for key in keys if key != "snapshot_ts"})
+
+
+def test_compacted_columns_give_the_same_groupby_and_metrics(tmp_path):
+    generate_snapshots(
+        str(tmp_path), snapshots=3, categories=3, videos_per_category=40,
+        vocab_size=200, seed=1,
+    )
+    store = SnapshotStore(str(tmp_path), workers=1)
+    store.compact()
+    dataset = SnapshotDataset(store.read(sorted(store.manifest)))
+    df, wide = dataset.df, uncompacted(dataset)
+    assert isinstance(df["category_id"].dtype, pd.CategoricalDtype)
+    assert isinstance(df["channel_title"].dtype, pd.CategoricalDtype)
+    assert df["views"].dtype == np.int32 and df["from_shorts"].dtype == np.int8
+    assert wide["views"].dtype == np.int64 and wide["category_id"].dtype.kind in "OT"
+
+    key_sets = (
+        ["snapshot_ts", "category_id"],
+        ["category_label", "snapshot_file"],
+        ["channel_title"],
+    )
+    for keys in key_sets:
+        pd.testing.assert_frame_equal(grouped(df, keys), grouped(wide, keys), check_dtype=False)
+
+    # срез одной категории: у category остальные значения пустые,
+    # observed=True их не показывает — как и без category
+    ts, cat = dataset.snapshots[1], dataset.categories_at(dataset.snapshots[1])[0]
+    part = dataset.rows(ts, cat)
+    assert len(part["category_id"].cat.categories) > 1
+    assert len(part.groupby(["category_id", "snapshot_file"], observed=False).size()) > 1
+    for keys in key_sets:
+        got = grouped(part, keys)
+        pd.testing.assert_frame_equal(got, grouped(wide.loc[part.index], keys), check_dtype=False)
+    assert grouped(part, ["category_id"])["category_id"].tolist() == [str(cat)]
+
+    keys = ["snapshot_ts", "category_id"]
+    frame, wide_frame = dataset.with_text(df), dataset.with_text(wide)
+    for fresh_hours in (1.0, 48.0):
+        got = compute_category_metrics_all(frame, fresh_hours)
+        expected = compute_category_metrics_all(wide_frame, fresh_hours)
+        pd.testing.assert_frame_equal(
+            got.astype({"category_id": str}).sort_values(keys).reset_index(drop=True),
+            expected.astype({"category_id": str}).sort_values(keys).reset_index(drop=True),
+            check_dtype=False,
+        )
+        pd.testing.assert_frame_equal(
+            compute_tag_metrics_for_df_slice(part, fresh_hours, 2, dataset.tags),
+            compute_tag_metrics_for_df_slice(wide.loc[part.index], fresh_hours, 2, dataset.tags),
+            check_dtype=False,
+        )
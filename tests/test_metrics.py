@@ -0,0 +1,222 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from yt_radar import (
+    SnapshotDataset,
+    SnapshotIngestState,
+    SnapshotStore,
+    TagMetricsCube,
+    compute_category_metrics_all,
+    compute_growth_between_snapshots,
+    compute_tag_metrics_for_df_slice,
+    explode_tags_for_growth,
+    generate_snapshots,
+    parse_tag_json,
+)
+
+
+def two_snapshots() -> pd.DataFrame:
+    rows = [
+        # (снапшот, видео, категория, просмотры)
+        ("2025-01-01 00:00", "a", "1", 100),
+        ("2025-01-01 00:00", "a", "2", 100),
+        ("2025-01-01 00:00", "b", "1", 50),
+        ("2025-01-01 00:00", "d", "2", 10),
+        ("2025-01-01 06:00", "a", "1", 160),
+        ("2025-01-01 06:00", "a", "2", 160),
+        ("2025-01-01 06:00", "a", "3", 160),
+        ("2025-01-01 06:00", "b", "2", 80),
+        ("2025-01-01 06:00", "c", "1", 5),
+    ]
+    df = pd.DataFrame(rows, columns=["snapshot_ts", "video_id", "category_id", "views"])
+    df["snapshot_ts"] = pd.to_datetime(df["snapshot_ts"])
+    df["published_at"] = "2024-12-31T00:00:00Z"
+    df["title"] = "T " + df["video_id"]
+    return df
+
+
+def growth_pairs(growth: pd.DataFrame) -> list:
+    cols = ["video_id", "category_id_t1", "category_id_t2", "views_delta"]
+    return sorted(map(tuple, growth[cols].astype(str).to_numpy().tolist()))
+
+
+def test_growth_pairs_every_category_row_like_merge():
+    df = two_snapshots()
+    ts1, ts2 = sorted(df["snapshot_ts"].unique())
+    dataset = SnapshotDataset(df)
+
+    expected = compute_growth_between_snapshots(df, ts1, ts2)
+    growth = compute_growth_between_snapshots(dataset, ts1, ts2)
+
+    # "a" есть в 2 категориях раньше и в 3 позже — 6 пар, "b" — одна
+    assert len(growth) == len(expected) == 7
+    assert growth_pairs(growth) == growth_pairs(expected)
+    assert growth["views_per_hour_between"].is_monotonic_decreasing
+    # индекс — строки позднего снапшота
+    later = dataset.df.loc[growth.index, "video_id"]
+    assert later.tolist() == growth["video_id"].tolist()
+    assert set(growth["title_t1"]) == {"T a", "T b"}
+
+
+def synthetic_dataset(tmp_path) -> SnapshotDataset:
+    generate_snapshots(
+        str(tmp_path), snapshots=4, categories=3, videos_per_category=40,
+        vocab_size=200, seed=1,
+    )
+    store = SnapshotStore(str(tmp_path), workers=1)
+    store.compact()
+    return SnapshotDataset(store.read(sorted(store.manifest)))
+
+
+def test_category_metrics_prefix_sums_match_groupby(tmp_path):
+    dataset = synthetic_dataset(tmp_path)
+    frame = dataset.with_text(dataset.df)
+    keys = ["snapshot_ts", "category_id"]
+    fresh_total = []
+    for fresh_hours in (1.0, 48.0, 200.0):
+        fast = compute_category_metrics_all(dataset, fresh_hours)
+        slow = compute_category_metrics_all(frame, fresh_hours)
+        fast = fast.sort_values(keys).reset_index(drop=True)
+        slow = slow.sort_values(keys).reset_index(drop=True)
+        pd.testing.assert_frame_equal(fast, slow, check_dtype=False)
+        fresh_total.append(fast["fresh_videos"].sum())
+    # пороги режут партиции посередине, а не целиком
+    assert 0 == fresh_total[0] < fresh_total[1] < fresh_total[2] < len(dataset)
+
+
+def test_tag_cube_matches_per_slice_metrics(tmp_path):
+    dataset = synthetic_dataset(tmp_path)
+    frame = dataset.with_tags(dataset.df)
+    versions = {ts: 1 for ts in dataset.snapshots}
+    cube = TagMetricsCube(48.0)
+    assert cube.update(dataset, versions) == len(versions)
+    assert cube.update(dataset, versions) == 0
+    other = cube.with_fresh_hours(dataset, 150.0)
+
+    compared = 0
+    for ts in dataset.snapshots:
+        for cat in dataset.categories_at(ts) + [None]:
+            rows = dataset.rows(ts, cat)
+            for fresh_hours, source in ((48.0, cube), (150.0, other)):
+                expected = compute_tag_metrics_for_df_slice(rows, fresh_hours, 2, dataset.tags)
+                # тот же срез без индекса тегов — через all_tags_uniq
+                from_json = compute_tag_metrics_for_df_slice(frame.loc[rows.index], fresh_hours, 2)
+                got = source.metrics(ts, cat, min_videos_per_tag=2)
+                for other_way in (from_json, got):
+                    pd.testing.assert_frame_equal(
+                        other_way.reset_index(drop=True),
+                        expected.reset_index(drop=True),
+                        check_dtype=False,
+                    )
+                compared += len(got)
+    assert compared > 0
+
+
+def test_tag_cube_update_and_history(tmp_path):
+    dataset = synthetic_dataset(tmp_path)
+    first, last = dataset.snapshots[0], dataset.snapshots[-1]
+    cube = TagMetricsCube()
+    cube.update(dataset, {ts: 1 for ts in dataset.snapshots})
+
+    # пропал последний снапшот и поменялся первый
+    versions = {ts: 2 if ts == first else 1 for ts in dataset.snapshots[:-1]}
+    assert cube.update(dataset, versions) == 2
+    assert cube.raw(last).empty
+    assert set(cube.table["snapshot_ts"]) == set(dataset.snapshots[:-1])
+
+    tag_ids = cube.search("")[:5]
+    history = cube.history(tag_ids)
+    assert set(history["tag_id"]) <= set(tag_ids.tolist())
+    for ts, rows in history.groupby("snapshot_ts"):
+        raw = cube.raw(ts)
+        expected = raw[raw["tag_id"].isin(tag_ids)]
+        assert rows["tag"].tolist() == expected["tag"].tolist()
+        assert rows["volume"].tolist() == expected["volume"].tolist()
+    assert (history["freshness"] == history["fresh_videos"] / history["videos_cnt"]).all()
+
+
+def test_refresh_updates_a_copy_of_published_cubes(tmp_path):
+    src = tmp_path / "src"
+    generate_snapshots(
+        str(src), snapshots=3, categories=2, videos_per_category=30,
+        vocab_size=200, seed=2,
+    )
+    state = SnapshotIngestState(
+        str(src), store=SnapshotStore(str(src), workers=1), warm_start=False
+    )
+    state.refresh()
+    old = state.tag_metrics_cube(48.0)
+    old_table = old.table.copy()
+    old_ranges = dict(old._part_ranges)
+
+    files = sorted(os.listdir(src))
+    os.remove(src / files[0])
+    state.refresh()
+    new = state.tag_metrics_cube(48.0)
+
+    # другая сессия дочитывает старый куб — он не поменялся
+    assert new is not old
+    pd.testing.assert_frame_equal(old.table, old_table)
+    assert old._part_ranges == old_ranges
+    assert len(new.table) < len(old.table)
+
+    fresh = TagMetricsCube(48.0)
+    fresh.update(state.dataset, state._snapshot_versions())
+    pd.testing.assert_frame_equal(new.table, fresh.table)
+    assert new._part_ranges == fresh._part_ranges
+
+
+def baseline_tag_growth(df_growth: pd.DataFrame) -> pd.DataFrame:
+    # прежняя реализация: iterrows и groupby по тегу
+    rows = []
+    for _, row in df_growth.iterrows():
+        for t in parse_tag_json(row.get("all_tags_uniq_t2", "[]")):
+            if t:
+                rows.append({"tag": t, "views_delta": row.get("views_delta", 0)})
+    return pd.DataFrame(rows).groupby("tag", as_index=False)["views_delta"].sum()
+
+
+def by_tag(agg: pd.DataFrame) -> pd.DataFrame:
+    return agg.sort_values("tag").reset_index(drop=True)
+
+
+def test_explode_tags_for_growth_full_matches_baseline_and_split_sums_to_delta(tmp_path):
+    dataset = synthetic_dataset(tmp_path)
+    ts1, ts2 = dataset.snapshots[0], dataset.snapshots[-1]
+    growth = compute_growth_between_snapshots(dataset, ts1, ts2)
+    from_json = growth.assign(
+        all_tags_uniq_t2=dataset.with_tags(dataset.df.loc[growth.index])["all_tags_uniq"]
+    )
+    expected = by_tag(baseline_tag_growth(from_json))
+
+    for agg in (
+        explode_tags_for_growth(growth, dataset.tags),
+        explode_tags_for_growth(from_json),
+    ):
+        assert agg["views_delta"].is_monotonic_decreasing
+        pd.testing.assert_frame_equal(
+            by_tag(agg)[["tag", "views_delta"]], expected, check_dtype=False
+        )
+
+    # split: у каждого видео веса тегов в сумме 1 — тегам достаётся
+    # ровно его прирост
+    for pos in range(0, len(growth), max(len(growth) // 20, 1)):
+        one = growth.iloc[[pos]]
+        n_tags = len(dataset.tags.explode(one.index.to_numpy())[1])
+        split = explode_tags_for_growth(one, dataset.tags, weighting="split")
+        if n_tags == 0:
+            assert split.empty
+            continue
+        delta = one["views_delta"].iloc[0]
+        assert split["views_delta"].sum() == pytest.approx(delta)
+        assert np.allclose(split["views_delta"], delta / n_tags)
+
+    split = explode_tags_for_growth(growth, dataset.tags, weighting="split")
+    tagged = dataset.tags.lengths(growth.index.to_numpy()) > 0
+    assert split["views_delta"].sum() == pytest.approx(growth["views_delta"][tagged].sum())
+    assert by_tag(split)["videos_cnt"].tolist() == by_tag(
+        explode_tags_for_growth(growth, dataset.tags)
+    )["videos_cnt"].tolist()
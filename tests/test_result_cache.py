@@ -0,0 +1,92 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from yt_radar import (
+    ResultCache,
+    SnapshotIngestState,
+    SnapshotStore,
+    compute_growth_between_snapshots,
+    generate_snapshots,
+)
+
+
+def frame(n_rows: int, text: str = "x") -> pd.DataFrame:
+    return pd.DataFrame({"tag": [text * 50] * n_rows, "value": np.arange(n_rows)})
+
+
+def test_evicts_least_recently_used_past_max_entries():
+    cache = ResultCache(max_entries=2, max_mb=1024)
+    cache.get("a", lambda: frame(1))
+    cache.get("b", lambda: frame(1))
+    cache.get("a", lambda: frame(1))  # "a" снова самый свежий
+    cache.get("c", lambda: frame(1))
+
+    assert len(cache) == 2
+    assert cache.evictions == 1
+    assert cache.hits == 1 and cache.misses == 3
+    # выкинут "b": при повторном запросе он считается заново
+    calls = []
+    cache.get("b", lambda: calls.append(1) or frame(1))
+    assert calls == [1]
+
+
+def test_evicts_past_max_bytes_and_keeps_nbytes_consistent():
+    one = frame(1000)
+    size = ResultCache._size(one)
+    cache = ResultCache(max_entries=100, max_mb=2.5 * size / 1024 / 1024)
+    for key in range(5):
+        cache.get(key, lambda: frame(1000))
+
+    assert len(cache) == 2
+    assert cache.evictions == 3
+    assert cache.nbytes == sum(s for _, s in cache._entries.values())
+    assert cache.nbytes <= cache.max_bytes
+    assert list(cache._entries) == [3, 4]
+
+
+def test_size_counts_string_payload():
+    short = ResultCache._size(frame(100, "x"))
+    long = ResultCache._size(frame(100, "x" * 100))
+    assert long > short * 10
+    assert ResultCache._size(pd.Series(["abc"] * 10)) > 0
+
+
+def test_invalidate_drops_entries_and_ignores_stale_results():
+    cache = ResultCache(max_entries=10, max_mb=1024)
+
+    def compute():
+        cache.invalidate()  # данные обновились, пока считали
+        return frame(10)
+
+    cache.get("a", compute)
+    assert len(cache) == 0 and cache.nbytes == 0
+
+
+def test_growth_stays_with_the_dataset_it_was_asked_for(tmp_path):
+    generate_snapshots(
+        str(tmp_path), snapshots=3, categories=2, videos_per_category=30,
+        vocab_size=200, seed=3,
+    )
+    state = SnapshotIngestState(
+        str(tmp_path), store=SnapshotStore(str(tmp_path), workers=1), warm_start=False
+    )
+    state.refresh()
+    old = state.current()
+    ts1, ts2 = old[0].snapshots[-2:]
+    state.growth(ts1, ts2)
+
+    # другая сессия обновила состояние: первый снапшот пропал,
+    # строки датасета сдвинулись
+    os.remove(tmp_path / sorted(os.listdir(tmp_path))[0])
+    state.refresh()
+    new = state.current()
+    assert new[1] == old[1] + 1
+
+    cases = ((old, state.growth(ts1, ts2, old)), (new, state.growth(ts1, ts2)))
+    for (dataset, _), growth in cases:
+        expected = compute_growth_between_snapshots(dataset, ts1, ts2)
+        pd.testing.assert_frame_equal(growth, expected)
+        # теги по индексу результата берутся из того же датасета
+        assert (dataset.df.loc[growth.index, "video_id"] == growth["video_id"]).all()
@@ -0,0 +1,211 @@
+import json
+import os
+import shutil
+
+import pandas as pd
+
+from yt_radar import (
+    SnapshotDataset,
+    SnapshotIngestState,
+    SnapshotStore,
+    TagCleanCache,
+    generate_snapshots,
+)
+from yt_radar.store import parse_snapshot_files
+
+
+def make_snapshots(directory, snapshots=3, seed=0) -> list:
+    generate_snapshots(
+        str(directory), snapshots=snapshots, categories=3,
+        videos_per_category=30, vocab_size=300, seed=seed,
+    )
+    return sorted(os.listdir(directory))
+
+
+def open_store(directory, store_dir) -> SnapshotStore:
+    return SnapshotStore(str(directory), str(store_dir), workers=1)
+
+
+def drop_last_row(path):
+    df = pd.read_csv(path, dtype=str)
+    df.iloc[:-1].to_csv(path, index=False)
+
+
+def test_compact_touches_only_changed_files(tmp_path):
+    src, store_dir = tmp_path / "src", tmp_path / "store"
+    files = make_snapshots(src)
+
+    store = open_store(src, store_dir)
+    stats = store.compact()
+    assert (stats["added"], stats["changed"], stats["removed"]) == (len(files), 0, 0)
+    rows = len(store.read(files))
+
+    # новый процесс: всё берётся из манифеста, CSV не разбираются
+    store = open_store(src, store_dir)
+    assert store.compact() == {
+        "added": 0, "changed": 0, "removed": 0, "unchanged": len(files),
+        "failed": [], "tag_hits": 0, "tag_misses": 0,
+    }
+
+    # перезаписали тем же содержимым — только обновили mtime в манифесте
+    path = src / files[0]
+    os.utime(path, ns=(0, 0))
+    stats = store.compact()
+    assert stats["unchanged"] == len(files) and stats["changed"] == 0
+    assert store.manifest[files[0]]["mtime"] == 0
+
+    drop_last_row(src / files[1])
+    os.remove(src / files[2])
+    stats = store.compact()
+    assert (stats["added"], stats["changed"], stats["removed"]) == (0, 1, 1)
+    assert stats["tag_misses"] == 0  # теги изменённого файла уже в кэше
+    assert files[2] not in store.manifest
+    assert not os.path.exists(store._part_path(files[2]))
+    assert len(store.read(files[:2] + files[3:])) == rows - 1 - 30
+
+    # манифест на диске совпадает с тем, что в памяти
+    assert open_store(src, store_dir).manifest == store.manifest
+
+
+def test_compact_forgets_files_that_no_longer_parse(tmp_path):
+    src, store_dir = tmp_path / "src", tmp_path / "store"
+    files = make_snapshots(src, snapshots=1)
+    state = SnapshotIngestState(str(src), store=open_store(src, store_dir), warm_start=False)
+    state.refresh()
+
+    # файл поменялся и больше не читается: старые строки не отдаём
+    (src / files[0]).write_text("")
+    stats = state.refresh()
+    assert stats["failed"] == [files[0]]
+    assert stats["changed"] == 0
+    assert files[0] not in state.store.manifest
+    assert not os.path.exists(state.store._part_path(files[0]))
+    assert files[0] not in set(state.dataset.df["snapshot_file"])
+    assert len(state.dataset) == 60
+    assert files[0] not in open_store(src, store_dir).manifest
+
+    # файл починили — он снова добавляется
+    make_snapshots(src, snapshots=1)
+    stats = state.refresh()
+    assert stats["added"] == 1 and stats["failed"] == []
+    assert len(state.dataset) == 90
+
+
+def test_read_returns_requested_and_key_columns(tmp_path):
+    src = tmp_path / "src"
+    files = make_snapshots(src, snapshots=1)
+    for store in (open_store(src, tmp_path / "store"), SnapshotStore(str(src), workers=1)):
+        store.compact()
+        df = store.read(files, columns=["views", "no_such_column"])
+        assert list(df.columns) == [
+            "snapshot_file", "snapshot_ts", "category_id", "views",
+            "snapshot_date", "snapshot_time",
+        ]
+        assert len(df) == 90
+
+
+def test_parallel_parse_matches_serial(tmp_path):
+    src = tmp_path / "src"
+    paths = [str(src / fname) for fname in make_snapshots(src)]
+    paths.append(str(src / "ytcat_1_not_a_snapshot.csv"))
+
+    serial_cache, pool_cache = TagCleanCache(), TagCleanCache()
+    serial = parse_snapshot_files(paths, workers=1, tag_cache=serial_cache)
+    parallel = parse_snapshot_files(paths, workers=3, tag_cache=pool_cache)
+    assert parallel[-1] is None and serial[-1] is None
+    for a, b in zip(serial[:-1], parallel[:-1]):
+        pd.testing.assert_frame_equal(a, b)
+    # воркеры учат теги каждый сам, но итоговый кэш тот же
+    assert pool_cache.tags == serial_cache.tags
+    assert pool_cache.take_new() == serial_cache.take_new()
+
+    stores = [SnapshotStore(str(src), workers=w) for w in (1, 3)]
+    for store in stores:
+        store.compact()
+    files = sorted(stores[0].manifest)
+    pd.testing.assert_frame_equal(stores[0].read(files), stores[1].read(files))
+
+def dataset_frame(state: SnapshotIngestState) -> pd.DataFrame:
+    dataset = state.dataset
+    df = dataset.with_tags(dataset.with_text(dataset.df))
+    return df.sort_values(["snapshot_file", "video_id"], kind="stable").reset_index(drop=True)
+
+
+def test_incremental_refresh_matches_full_rebuild(tmp_path):
+    src, extra = tmp_path / "src", tmp_path / "extra"
+    files = make_snapshots(src)
+    later = make_snapshots(extra, snapshots=4)
+
+    state = SnapshotIngestState(
+        str(src), store=open_store(src, tmp_path / "store"), warm_start=False
+    )
+    state.refresh()
+
+    # добавился снапшот, один файл поменялся, один пропал
+    for fname in set(later) - set(files):
+        shutil.copy(extra / fname, src / fname)
+    drop_last_row(src / files[0])
+    os.remove(src / files[-1])
+    stats = state.refresh()
+    assert (stats["added"], stats["changed"], stats["removed"]) == (3, 1, 1)
+
+    # полная перезагрузка (load_snapshot_dataset(incremental=False)):
+    # хранилище в памяти, все CSV разбираются заново
+    full = SnapshotIngestState(
+        str(src), store=SnapshotStore(str(src), workers=1), warm_start=False
+    )
+    full.refresh()
+    assert sorted(state.loaded) == sorted(full.loaded)
+    pd.testing.assert_frame_equal(dataset_frame(state), dataset_frame(full))
+    assert len(state.text) == len(full.text)
+
+
+def warm_state(src, store_dir) -> SnapshotIngestState:
+    return SnapshotIngestState(str(src), store=open_store(src, store_dir), warm_start=True)
+
+
+def rebuilt_frame(src) -> pd.DataFrame:
+    full = SnapshotIngestState(
+        str(src), store=SnapshotStore(str(src), workers=1), warm_start=False
+    )
+    full.refresh()
+    return dataset_frame(full)
+
+
+def test_warm_start_round_trip_and_stale_file(tmp_path):
+    src, store_dir = tmp_path / "src", tmp_path / "store"
+    files = make_snapshots(src)
+    first = warm_state(src, store_dir)
+    assert first.refresh()["warm_start"] is False
+    path = first._warm_path()
+    assert SnapshotDataset.saved_meta(path)["rows"] == len(first.dataset)
+
+    # перезапуск: датасет отображается с диска и совпадает со свежесобранным
+    state = warm_state(src, store_dir)
+    stats = state.refresh()
+    assert stats["warm_start"] is True
+    assert stats["unchanged"] == len(files) and stats["tag_misses"] == 0
+    assert state.loaded == first.loaded
+    assert state.dataset.snapshots == first.dataset.snapshots
+    pd.testing.assert_frame_equal(dataset_frame(state), rebuilt_frame(src))
+    # пока ничего не менялось, второй refresh датасет не трогает
+    dataset = state.dataset
+    assert state.refresh()["warm_start"] is False and state.dataset is dataset
+
+    # файл поменялся — сохранённый датасет устарел и не берётся
+    drop_last_row(src / files[1])
+    state = warm_state(src, store_dir)
+    stats = state.refresh()
+    assert stats["warm_start"] is False and stats["changed"] == 1
+    pd.testing.assert_frame_equal(dataset_frame(state), rebuilt_frame(src))
+
+    # сохранённый датасет другого формата тоже не читается
+    meta_path = os.path.join(path, "meta.json")
+    with open(meta_path, encoding="utf-8") as f:
+        meta = json.load(f)
+    meta["version"] = -1
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    state = warm_state(src, store_dir)
+    assert state.refresh()["warm_start"] is False
+    pd.testing.assert_frame_equal(dataset_frame(state), rebuilt_frame(src))
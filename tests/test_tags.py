@@ -0,0 +1,192 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+import yt_radar.ingest as ingest_module
+import yt_radar.store as store_module
+import yt_radar.tags as tags_module
+from yt_radar import (
+    SnapshotStore,
+    TagCleanCache,
+    TagSearchIndex,
+    build_all_tags_uniq,
+    clean_tag,
+    clean_tags,
+)
+from yt_radar.tags import TAG_COLS, parse_tag_json
+
+
+def reference_all_tags_uniq(df: pd.DataFrame) -> pd.Series:
+    # исходная построчная реализация (до пакетной очистки)
+    def merge_row(row):
+        tags_set = set()
+        for col in TAG_COLS:
+            if col not in row:
+                continue
+            for raw_tag in parse_tag_json(row[col]):
+                cleaned = clean_tag(raw_tag)
+                if cleaned:
+                    tags_set.add(cleaned)
+        return json.dumps(sorted(tags_set), ensure_ascii=False)
+
+    return df.apply(merge_row, axis=1)
+
+
+ODD_TAGS = [
+    "Music", "  #Shorts  ", "##top__", "• news •", "a", "42", "2024 год",
+    "!!!", "a-b-c-d-e", "a!!!!", "official video", "Канал Пети", "ПРИКОЛЫ",
+    "ΟΔΟΣ", "ΣΟΦΙΑ Σ", "İstanbul", 'say "hi"', "back\\slash", "tab\there",
+    "line\nbreak", "\tpadded\t", "x_y", "café", "naïve", "١٢٣", "日本語",
+    "", "   ", "рек", "fyp", "Футбол",
+]
+
+
+def odd_frame() -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    cells = [
+        json.dumps(list(rng.choice(ODD_TAGS, size=rng.integers(0, 6))), ensure_ascii=False)
+        for _ in range(60)
+    ]
+    cells += [
+        None, "", "   ", "not json", '"Single"', "5", "[1, 2.5, true, null]",
+        '[["nested"], {"k": 1}]', "[\"Music\", 1, \"1\"]", "[]",
+    ]
+    data = {}
+    for i, col in enumerate(TAG_COLS):
+        data[col] = [cells[(j * (i + 3)) % len(cells)] for j in range(len(cells))]
+    return pd.DataFrame(data)
+
+
+def test_clean_tags_matches_clean_tag():
+    # без переводов строк внутри тегов регистр меняется у склеенного текста,
+    # с ними и с не-строками — по одному тегу
+    plain = [t for t in ODD_TAGS if "\n" not in t] + ["ab", "a.", ".a.", "a b", "ab!!!"]
+    for raw in (plain, plain + ["line\nbreak"], plain + [None, 5]):
+        assert clean_tags(raw).tolist() == [clean_tag(t) for t in raw]
+    assert clean_tags([]).tolist() == []
+
+
+def test_build_all_tags_uniq_matches_row_wise_reference():
+    df = odd_frame()
+    expected = reference_all_tags_uniq(df)
+    assert build_all_tags_uniq(df)["all_tags_uniq"].tolist() == expected.tolist()
+
+
+def test_build_all_tags_uniq_with_cache_matches_reference():
+    df = odd_frame()
+    expected = reference_all_tags_uniq(df).tolist()
+    cache = TagCleanCache()
+    first = build_all_tags_uniq(df.iloc[:40], cache)["all_tags_uniq"].tolist()
+    second = build_all_tags_uniq(df, cache)["all_tags_uniq"].tolist()
+    assert first == expected[:40]
+    assert second == expected
+    # во втором вызове первые 40 строк берутся из кэша готовыми
+    assert cache.hits > 0
+    assert len(cache.tag_sets) == len(df.drop_duplicates())
+
+
+def test_build_all_tags_uniq_keeps_frame_and_handles_missing_columns():
+    df = pd.DataFrame({"video_id": ["a", "b"], "tags_api_raw": ['["Music"]', None]})
+    out = build_all_tags_uniq(df)
+    assert out["all_tags_uniq"].tolist() == ['["music"]', "[]"]
+    assert "all_tags_uniq" not in df.columns
+    empty = build_all_tags_uniq(pd.DataFrame({"video_id": ["a"]}))
+    assert empty["all_tags_uniq"].tolist() == ["[]"]
+
+
+def brute_search(vocab, pattern, exact=False):
+    pattern = pattern.strip().lower()
+    tags = [str(t).lower() for t in vocab]
+    if exact:
+        return [i for i, tag in enumerate(tags) if tag == pattern]
+    return [i for i, tag in enumerate(tags) if pattern in tag]
+
+
+SEARCH_VOCAB = [
+    "a", "ab", "abc", "music", "Music Video", "k-pop", "ñ", "ёж", "ежи",
+    "cat", "cats", "concat", "xyz", "музыка", "Музыка 2024", "24", "aaa", "aaaa",
+]
+
+
+def test_tag_search_matches_substring_scan():
+    index = TagSearchIndex(SEARCH_VOCAB)
+    patterns = [
+        "a", "b", "ab", "aa", "aaa", "aaaa", "aaaaa", "cat", "at", "t",
+        "MUSIC", " music ", "c v", "-p", "ё", "ёж", "муз", "ыка 2", "4",
+        "24", "zz", "xyzw", "ñ", "",
+    ]
+    for pattern in patterns:
+        got = index.search(pattern)
+        assert got.dtype == np.int32
+        assert got.tolist() == brute_search(SEARCH_VOCAB, pattern), pattern
+
+
+def test_tag_search_short_queries_include_short_tags():
+    index = TagSearchIndex(SEARCH_VOCAB)
+    # "a" и "ab" короче триграммы, "ñ" и "24" — тоже
+    assert index.search("ab").tolist() == [1, 2]
+    assert index.search("ñ").tolist() == [6]
+    assert index.search("2").tolist() == [14, 15]
+    assert len(index.search("")) == len(SEARCH_VOCAB)
+
+
+def test_tag_search_exact_and_duplicates():
+    vocab = SEARCH_VOCAB + ["MUSIC"]
+    index = TagSearchIndex(vocab)
+    assert index.search("music", exact=True).tolist() == [3, len(vocab) - 1]
+    assert index.search(" Cat ", exact=True).tolist() == [9]
+    assert index.search("ca", exact=True).tolist() == []
+    assert index.search("music").tolist() == brute_search(vocab, "music")
+    assert len(TagSearchIndex([]).search("abc")) == 0
+    assert len(TagSearchIndex([]).search("a")) == 0
+
+
+def edit_stop_tags(monkeypatch, *extra):
+    # как правка стоп-списка в коде и перезапуск: новый отпечаток правил
+    # виден везде, где его импортировали
+    monkeypatch.setattr(tags_module, "STOP_TAGS", tags_module.STOP_TAGS | set(extra))
+    version = tags_module.tag_rules_version()
+    for module in (tags_module, store_module, ingest_module):
+        monkeypatch.setattr(module, "TAG_RULES_VERSION", version)
+    return version
+
+
+def test_tag_cache_is_dropped_when_rules_change(tmp_path, monkeypatch):
+    path = str(tmp_path / "tag_cache.json")
+    cache = TagCleanCache(path)
+    assert cache.clean(["Music", "Cats"]).tolist() == ["music", "cats"]
+    cache.save()
+    assert TagCleanCache(path).tags == cache.tags
+
+    old_version = tags_module.TAG_RULES_VERSION
+    assert edit_stop_tags(monkeypatch, "music") != old_version
+    cache = TagCleanCache(path)
+    assert cache.tags == {}
+    assert cache.clean(["Music", "Cats"]).tolist() == [None, "cats"]
+    assert cache.misses == 2
+
+
+def test_store_recleans_tags_when_rules_change(tmp_path, monkeypatch):
+    src, store_dir = tmp_path / "src", tmp_path / "store"
+    src.mkdir()
+    pd.DataFrame(
+        {
+            "video_id": ["a", "b"],
+            "views": [10, 20],
+            "tags_api_raw": ['["Music", "Cats"]', '["music video"]'],
+        }
+    ).to_csv(src / "ytcat_10_20250101_000000.csv", index=False)
+
+    store = SnapshotStore(str(src), str(store_dir), workers=1)
+    store.compact()
+    before = store.read(sorted(store.manifest))["all_tags_uniq"].tolist()
+    assert before == ['["cats", "music"]', '["music video"]']
+
+    edit_stop_tags(monkeypatch, "music")
+    store = SnapshotStore(str(src), str(store_dir), workers=1)
+    assert store.manifest == {} and store.tag_cache.tags == {}
+    stats = store.compact()
+    assert stats["added"] == 1 and stats["tag_hits"] == 0
+    after = store.read(sorted(store.manifest))["all_tags_uniq"].tolist()
+    assert after == ['["cats"]', '["music video"]']
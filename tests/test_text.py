@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+
+from yt_radar import SnapshotDataset, TextStore
+
+
+def snapshot(video_ids, titles, descriptions=None) -> pd.DataFrame:
+    data = {"video_id": video_ids, "title": titles, "views": np.arange(len(video_ids))}
+    if descriptions is not None:
+        data["description"] = descriptions
+    return pd.DataFrame(data)
+
+
+def test_extend_reuses_known_versions_and_take_round_trips():
+    first = snapshot(["a", "b", "a"], ["A", "B", "A"], ["da", "db", "da"])
+    store, ids = TextStore.empty().extend(first)
+    assert len(store) == 2
+    assert ids.tolist() == [0, 1, 0]
+
+    # "b" сменил название — новая версия, "a" — прежняя
+    second = snapshot(["b", "a", "c"], ["B2", "A", "C"], ["db", "da", "dc"])
+    store2, ids2 = store.extend(second)
+    assert len(store2) == 4 and len(store) == 2
+    assert ids2.tolist() == [2, 0, 3]
+
+    for rows, row_ids in ((first, ids), (second, ids2)):
+        taken = store2.take(row_ids)
+        assert list(taken) == ["title", "description"]
+        assert taken["title"].tolist() == rows["title"].tolist()
+        assert taken["description"].tolist() == rows["description"].tolist()
+    assert store2.take(np.array([-1, 0]), ["title"])["title"].tolist() == [None, "A"]
+    assert store2.edits().to_dict("records") == [{"video_id": "b", "versions": 2}]
+
+
+def test_extend_keeps_columns_missing_from_new_rows():
+    store, ids = TextStore.empty().extend(snapshot(["a"], ["A"], ["da"]))
+    store, ids2 = store.extend(snapshot(["b"], ["B"]))
+    assert store.columns == ["title", "description"]
+    assert store.take(ids)["description"].tolist() == ["da"]
+    assert pd.isna(store.take(ids2)["description"][0])
+
+    store, ids3 = store.extend(snapshot(["c"], ["C"], ["dc"]))
+    assert store.take(np.concatenate([ids, ids3]))["description"].tolist() == ["da", "dc"]
+
+
+def test_compact_drops_unused_versions_and_remaps_ids():
+    rows = snapshot(["a", "b", "c", "a"], ["A", "B", "C", "A"])
+    store, ids = TextStore.empty().extend(rows)
+    keep = np.array([True, False, True, True])
+    compacted, new_ids = store.compact(np.append(ids[keep], -1))
+    assert len(compacted) == 2
+    assert new_ids.tolist() == [0, 1, 0, -1]
+    assert compacted.take(new_ids)["title"].tolist() == ["A", "C", "A", None]
+    assert compacted.layout == store.layout
+
+    same, same_ids = compacted.compact(new_ids[:3])
+    assert same is compacted and same_ids.tolist() == [0, 1, 0]
+
+
+def test_with_text_restores_column_positions(tmp_path):
+    df = pd.DataFrame(
+        {
+            "video_id": ["a", "b"],
+            "title": ["A", "B"],
+            "views": [10, 20],
+            "description": ["da", "db"],
+            "category_id": ["1", "1"],
+            "snapshot_ts": pd.to_datetime(["2025-01-01", "2025-01-01"]),
+            "published_at": ["2024-12-31T00:00:00Z"] * 2,
+        }
+    )
+    dataset = SnapshotDataset(df)
+    assert "title" not in dataset.df.columns
+
+    out = dataset.with_text(dataset.df)
+    assert list(out.columns[: len(df.columns)]) == list(df.columns)
+    assert out["title"].tolist() == ["A", "B"]
+
+    dataset.save(str(tmp_path / "ds"))
+    loaded = SnapshotDataset.load(str(tmp_path / "ds"))
+    assert list(loaded.with_text(loaded.df).columns) == list(out.columns)
@@ -0,0 +1,101 @@
+"""
+Движок YouTube Radar без интерфейса: загрузка снапшотов, очистка тегов,
+метрики по категориям, тегам и росту видео.
+
+Streamlit-приложение (app.py) и пакетные задания (python -m yt_radar)
+работают на одном и том же коде.
+"""
+
+from .settings import (
+    DEFAULT_FRESH_HOURS,
+    DEFAULT_SNAP_DIR,
+    INGEST_WORKERS,
+    PROFILE,
+    STORE_DIR,
+)
+from .tags import (
+    TagCleanCache,
+    TagIndex,
+    TagSearchIndex,
+    build_all_tags_uniq,
+    clean_tag,
+    clean_tags,
+    parse_tag_json,
+)
+from .text import TEXT_COLUMNS, TextStore
+from .store import (
+    SNAPSHOT_COLUMNS,
+    SnapshotStore,
+    open_snapshot_store,
+    parse_snapshot_ts_from_name,
+    read_snapshot_file,
+)
+from .dataset import (
+    SnapshotDataset,
+    VideoTrajectories,
+    derive_snapshot_columns,
+    snapshot_rows,
+)
+from .metrics import (
+    ALL_CATEGORIES,
+    TagMetricsCube,
+    aggregate_tag_metrics,
+    category_metrics_at,
+    classify_tag_metrics,
+    compute_category_metrics_all,
+    compute_category_metrics_for_snapshot,
+    compute_growth_between_snapshots,
+    compute_tag_metrics_for_df_slice,
+    explode_tags_for_growth,
+)
+from .ingest import ResultCache, SnapshotIngestState
+from .synth import generate_snapshots
+from . import profiling
+
+__all__ = [
+    # settings
+    "DEFAULT_FRESH_HOURS",
+    "DEFAULT_SNAP_DIR",
+    "INGEST_WORKERS",
+    "PROFILE",
+    "STORE_DIR",
+    # tags
+    "TagCleanCache",
+    "TagIndex",
+    "TagSearchIndex",
+    "build_all_tags_uniq",
+    "clean_tag",
+    "clean_tags",
+    "parse_tag_json",
+    # text
+    "TEXT_COLUMNS",
+    "TextStore",
+    # store
+    "SNAPSHOT_COLUMNS",
+    "SnapshotStore",
+    "open_snapshot_store",
+    "parse_snapshot_ts_from_name",
+    "read_snapshot_file",
+    # dataset
+    "SnapshotDataset",
+    "VideoTrajectories",
+    "derive_snapshot_columns",
+    "snapshot_rows",
+    # metrics
+    "ALL_CATEGORIES",
+    "TagMetricsCube",
+    "aggregate_tag_metrics",
+    "category_metrics_at",
+    "classify_tag_metrics",
+    "compute_category_metrics_all",
+    "compute_category_metrics_for_snapshot",
+    "compute_growth_between_snapshots",
+    "compute_tag_metrics_for_df_slice",
+    "explode_tags_for_growth",
+    # ingest
+    "ResultCache",
+    "SnapshotIngestState",
+    # synth
+    "generate_snapshots",
+    "profiling",
+]
@@ -0,0 +1,7 @@
+import sys
+
+from .cli import main
+
+# воркеры пула (spawn / forkserver) импортируют этот модуль заново
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,237 @@
+"""
+Бенчмарки по стадиям аналитики:
+
+    python -m yt_radar bench --sizes 150,1500 --baseline benchmarks/baseline.json
+
+Данные генерируются synth-генератором (по папке на размер, повторно
+не пересоздаются). Для каждой стадии пишем лучшее время из repeat прогонов,
+пик памяти (tracemalloc, отдельным прогоном, чтобы не портить время)
+и строк в секунду. Результат сравнивается с сохранённым baseline:
+стадия считается регрессией, если стала медленнее на tolerance
+(и больше, чем на шум в несколько миллисекунд) или заметно прожорливее.
+"""
+
+import gc
+import json
+import os
+import platform
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from .settings import DEFAULT_FRESH_HOURS
+from .store import SNAPSHOT_COLUMNS, SnapshotStore
+from .tags import build_all_tags_uniq
+from .metrics import (
+    TagMetricsCube,
+    compute_category_metrics_for_snapshot,
+    compute_growth_between_snapshots,
+    compute_tag_metrics_for_df_slice,
+    explode_tags_for_growth,
+)
+from .ingest import SnapshotIngestState
+from .synth import generate_snapshots
+
+BENCH_FORMAT_VERSION = 1
+
+# меньше этого прирост времени считаем шумом
+MIN_REGRESSION_SEC = 0.005
+MIN_REGRESSION_MB = 1.0
+
+
+def _stage_ingest(snap_dir: str):
+    """
+    Холодная загрузка папки: разбор CSV, очистка тегов, сборка датасета.
+    Хранилище в памяти, чтобы каждый прогон читал CSV заново.
+    """
+    def run():
+        state = SnapshotIngestState(
+            snap_dir,
+            columns=SNAPSHOT_COLUMNS,
+            store=SnapshotStore(snap_dir),
+            warm_start=False,
+        )
+        state.refresh()
+        return state
+    return run
+
+
+def build_stages(snap_dir: str, fresh_hours: float = DEFAULT_FRESH_HOURS) -> list:
+    """
+    Стадии бенчмарка: (имя, сколько строк обрабатывает, функция без аргументов).
+    Входные данные для стадий готовятся здесь один раз и в замер не входят.
+    """
+    state = _stage_ingest(snap_dir)()
+    dataset = state.dataset
+    snapshots = dataset.snapshots
+    ts_last = snapshots[-1]
+    last_rows = dataset.rows(ts_last)
+
+    fnames = sorted(f for f in os.listdir(snap_dir) if f.endswith(".csv"))
+    raw = pd.concat(
+        [pd.read_csv(os.path.join(snap_dir, f)) for f in fnames], ignore_index=True
+    )
+
+    stages = [
+        ("ingest", len(dataset), _stage_ingest(snap_dir)),
+        ("build_all_tags_uniq", len(raw), lambda: build_all_tags_uniq(raw)),
+        (
+            "category_metrics_for_snapshot",
+            len(last_rows),
+            lambda: compute_category_metrics_for_snapshot(dataset, ts_last, fresh_hours),
+        ),
+        (
+            "tag_metrics_for_df_slice",
+            len(last_rows),
+            lambda: compute_tag_metrics_for_df_slice(
+                last_rows, fresh_hours, tag_index=dataset.tags
+            ),
+        ),
+    ]
+    if len(snapshots) >= 2:
+        ts_prev = snapshots[-2]
+        growth = compute_growth_between_snapshots(dataset, ts_prev, ts_last)
+        stages += [
+            (
+                "growth_between_snapshots",
+                len(last_rows) + len(dataset.rows(ts_prev)),
+                lambda: compute_growth_between_snapshots(dataset, ts_prev, ts_last),
+            ),
+            (
+                "explode_tags_for_growth",
+                len(growth),
+                lambda: explode_tags_for_growth(growth, tag_index=dataset.tags),
+            ),
+        ]
+
+    def radar_sweep():
+        # куб по всем снапшотам и радар для каждой пары (снапшот, категория)
+        cube = TagMetricsCube(fresh_hours)
+        cube.update(dataset, {ts: 0 for ts in snapshots})
+        for ts in snapshots:
+            for cat in [None] + dataset.categories_at(ts):
+                cube.metrics(ts, cat, min_videos_per_tag=2)
+        return cube
+
+    stages.append(("tag_radar_sweep", len(dataset), radar_sweep))
+    return stages
+
+
+def time_stage(func, repeat: int) -> dict:
+    """
+    Лучшее время из repeat прогонов и пик памяти за отдельный прогон.
+    """
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        t = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - t)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "seconds": min(times),
+        "seconds_median": float(np.median(times)),
+        "peak_mb": peak / 1024 / 1024,
+    }
+
+
+def run_benchmarks(
+    work_dir: str,
+    sizes=(150,),
+    snapshots: int = 12,
+    repeat: int = 3,
+    seed: int = 0,
+    fresh_hours: float = DEFAULT_FRESH_HOURS,
+) -> dict:
+    """
+    Прогоняем все стадии на каждом размере (видео в категории на снапшот).
+    """
+    results = {}
+    for size in sizes:
+        snap_dir = os.path.join(work_dir, f"synth_v{size}_s{snapshots}_seed{seed}")
+        if not os.path.isdir(snap_dir) or not os.listdir(snap_dir):
+            generate_snapshots(
+                snap_dir, snapshots=snapshots, videos_per_category=size, seed=seed
+            )
+        stages = {}
+        for name, rows, func in build_stages(snap_dir, fresh_hours):
+            timing = time_stage(func, repeat)
+            timing["rows"] = rows
+            timing["rows_per_sec"] = rows / timing["seconds"] if timing["seconds"] else 0.0
+            stages[name] = {k: round(v, 4) if isinstance(v, float) else v
+                            for k, v in timing.items()}
+        results[str(size)] = stages
+
+    return {
+        "format_version": BENCH_FORMAT_VERSION,
+        "params": {
+            "sizes": list(sizes),
+            "snapshots": snapshots,
+            "repeat": repeat,
+            "seed": seed,
+            "fresh_hours": fresh_hours,
+        },
+        "env": {
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+        },
+        "results": results,
+    }
+
+
+def compare_with_baseline(current: dict, baseline: dict, tolerance: float = 0.25) -> list:
+    """
+    Регрессии относительно baseline: стадии, которые на том же размере
+    стали медленнее (по лучшему времени) или съели больше памяти
+    больше чем на tolerance. Размеры и стадии, которых нет
+    в baseline, пропускаем.
+    """
+    regressions = []
+    for size, stages in current["results"].items():
+        base_stages = baseline.get("results", {}).get(size, {})
+        for name, cur in stages.items():
+            base = base_stages.get(name)
+            if base is None:
+                continue
+            checks = (
+                ("seconds", MIN_REGRESSION_SEC),
+                ("peak_mb", MIN_REGRESSION_MB),
+            )
+            for metric, min_delta in checks:
+                was, now = base[metric], cur[metric]
+                if now > was * (1 + tolerance) and now - was > min_delta:
+                    regressions.append({
+                        "size": size,
+                        "stage": name,
+                        "metric": metric,
+                        "baseline": was,
+                        "current": now,
+                        "ratio": round(now / was, 2) if was else None,
+                    })
+    return regressions
+
+
+def load_baseline(path: str):
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_results(results: dict, path: str):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+        f.write("\n")
@@ -0,0 +1,254 @@
+"""
+Пакетный запуск без интерфейса:
+
+    python -m yt_radar report snapshots_raw --out reports --format parquet
+    python -m yt_radar synth /tmp/synth --snapshots 48 --videos 1500
+    python -m yt_radar bench --sizes 150,1500 --baseline benchmarks/baseline.json
+
+report читает папку со снапшотами (через то же колоночное хранилище, что
+и приложение) и пишет отчёты по категориям, тегам и росту видео;
+synth генерирует синтетические снапшоты для нагрузочных проверок,
+bench замеряет стадии аналитики и сравнивает их с сохранённым baseline.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from .settings import DEFAULT_FRESH_HOURS, DEFAULT_SNAP_DIR
+from .store import SNAPSHOT_COLUMNS
+from .metrics import explode_tags_for_growth
+from .ingest import SnapshotIngestState
+from .synth import SYNTH_CATEGORIES, generate_snapshots
+from .bench import compare_with_baseline, load_baseline, run_benchmarks, save_results
+
+DEFAULT_BENCH_BASELINE = os.path.join("benchmarks", "baseline.json")
+
+REPORT_FORMATS = ("parquet", "csv", "json")
+
+
+def write_report(df: pd.DataFrame, out_dir: str, name: str, fmt: str) -> str:
+    """
+    Пишем одну таблицу отчёта в out_dir/name.<fmt>, возвращаем путь.
+    """
+    path = os.path.join(out_dir, f"{name}.{fmt}")
+    if fmt == "parquet":
+        df.to_parquet(path, index=False)
+    elif fmt == "csv":
+        df.to_csv(path, index=False)
+    elif fmt == "json":
+        df.to_json(path, orient="records", date_format="iso", force_ascii=False)
+    else:
+        raise ValueError(f"неизвестный формат отчёта: {fmt}")
+    return path
+
+
+def build_tag_report(state: SnapshotIngestState, snapshots, fresh_hours: float,
+                     min_videos_per_tag: int) -> pd.DataFrame:
+    """
+    Метрики по тегам для каждого снапшота: по всем категориям сразу
+    (category_id = "all") и по каждой категории отдельно.
+    """
+    dataset = state.dataset
+    cube = state.tag_metrics_cube(fresh_hours)
+    parts = []
+    for ts in snapshots:
+        for cat in [None] + dataset.categories_at(ts):
+            m = cube.metrics(ts, cat, min_videos_per_tag)
+            if m.empty:
+                continue
+            m.insert(0, "category_id", "all" if cat is None else cat)
+            m.insert(0, "snapshot_ts", ts)
+            parts.append(m)
+    if not parts:
+        return pd.DataFrame()
+    return pd.concat(parts, ignore_index=True)
+
+
+def run_report(args) -> dict:
+    timings = {}
+    t0 = time.perf_counter()
+    columns = None if args.all_columns else SNAPSHOT_COLUMNS
+    state = SnapshotIngestState(os.path.abspath(args.snap_dir), columns=columns)
+    ingest_stats = state.refresh()
+    dataset = state.dataset
+    timings["ingest"] = time.perf_counter() - t0
+    if dataset.empty:
+        raise SystemExit(f"В папке {args.snap_dir} нет валидных снапшотов (ytcat_*.csv).")
+
+    snapshots = dataset.snapshots if args.all_snapshots else dataset.snapshots[-1:]
+    os.makedirs(args.out, exist_ok=True)
+    written = {}
+
+    t = time.perf_counter()
+    cat_all = state.category_metrics(args.fresh_hours)
+    cat_report = cat_all[cat_all["snapshot_ts"].isin(snapshots)]
+    written["categories"] = write_report(cat_report, args.out, "categories", args.format)
+    timings["categories"] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    tag_report = build_tag_report(state, snapshots, args.fresh_hours, args.min_videos)
+    written["tags"] = write_report(tag_report, args.out, "tags", args.format)
+    timings["tags"] = time.perf_counter() - t
+
+    growth_rows = tag_growth_rows = 0
+    if len(dataset.snapshots) >= 2:
+        t = time.perf_counter()
+        ts1 = pd.Timestamp(args.ts_from) if args.ts_from else dataset.snapshots[-2]
+        ts2 = pd.Timestamp(args.ts_to) if args.ts_to else dataset.snapshots[-1]
+        growth = state.growth(ts1, ts2)
+        tag_growth = explode_tags_for_growth(
+            growth, tag_index=dataset.tags, weighting=args.weighting
+        )
+        # теги видео в таблице роста — JSON, как в выгрузке приложения
+        growth_out = growth.assign(all_tags_uniq_t2=dataset.tags.to_json(growth.index))
+        written["growth"] = write_report(growth_out, args.out, "growth", args.format)
+        written["tag_growth"] = write_report(tag_growth, args.out, "tag_growth", args.format)
+        growth_rows, tag_growth_rows = len(growth), len(tag_growth)
+        timings["growth"] = time.perf_counter() - t
+
+    timings["total"] = time.perf_counter() - t0
+    summary = {
+        "snap_dir": os.path.abspath(args.snap_dir),
+        "rows": len(dataset),
+        "snapshots": [ts.isoformat() for ts in snapshots],
+        "fresh_hours": args.fresh_hours,
+        "min_videos": args.min_videos,
+        "ingest": ingest_stats,
+        "rows_written": {
+            "categories": len(cat_report),
+            "tags": len(tag_report),
+            "growth": growth_rows,
+            "tag_growth": tag_growth_rows,
+        },
+        "files": written,
+        "timings_sec": {k: round(v, 3) for k, v in timings.items()},
+    }
+    with open(os.path.join(args.out, "report.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    return summary
+
+
+def run_synth(args) -> dict:
+    return generate_snapshots(
+        args.out_dir,
+        snapshots=args.snapshots,
+        interval_hours=args.interval_hours,
+        categories=args.categories,
+        videos_per_category=args.videos,
+        vocab_size=args.vocab,
+        zipf_exponent=args.zipf,
+        persistence=args.persistence,
+        shorts_share=args.shorts_share,
+        start=args.start,
+        seed=args.seed,
+    )
+
+
+def run_bench(args) -> dict:
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    results = run_benchmarks(
+        args.work_dir,
+        sizes=sizes,
+        snapshots=args.snapshots,
+        repeat=args.repeat,
+        seed=args.seed,
+    )
+    if args.out:
+        save_results(results, args.out)
+    baseline = None if args.update_baseline else load_baseline(args.baseline)
+    if args.update_baseline:
+        save_results(results, args.baseline)
+    results["baseline"] = args.baseline if baseline is not None or args.update_baseline else None
+    results["regressions"] = (
+        compare_with_baseline(results, baseline, args.tolerance) if baseline else []
+    )
+    return results
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m yt_radar",
+        description="YouTube Radar без интерфейса: отчёты по папке со снапшотами.",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    report = commands.add_parser(
+        "report", help="посчитать отчёты по категориям, тегам и росту видео"
+    )
+    report.add_argument("snap_dir", nargs="?", default=DEFAULT_SNAP_DIR,
+                        help="папка с файлами ytcat_*.csv")
+    report.add_argument("--out", default="reports", help="куда писать отчёты")
+    report.add_argument("--format", choices=REPORT_FORMATS, default="parquet")
+    report.add_argument("--fresh-hours", type=float, default=DEFAULT_FRESH_HOURS)
+    report.add_argument("--min-videos", type=int, default=2,
+                        help="минимум видео у тега для отчёта по тегам")
+    report.add_argument("--all-snapshots", action="store_true",
+                        help="категории и теги по всем снапшотам, а не только по последнему")
+    report.add_argument("--from", dest="ts_from",
+                        help="ранний снапшот для роста (по умолчанию предпоследний)")
+    report.add_argument("--to", dest="ts_to",
+                        help="поздний снапшот для роста (по умолчанию последний)")
+    report.add_argument("--weighting", choices=("full", "split"), default="full",
+                        help="как засчитывать прирост видео его тегам")
+    report.add_argument("--all-columns", action="store_true",
+                        help="читать все колонки снапшотов (описания, сырые теги)")
+    report.set_defaults(func=run_report)
+
+    synth = commands.add_parser(
+        "synth", help="сгенерировать синтетические снапшоты для нагрузочных проверок"
+    )
+    synth.add_argument("out_dir", help="куда писать файлы ytcat_*.csv")
+    synth.add_argument("--snapshots", type=int, default=24, help="сколько снапшотов")
+    synth.add_argument("--interval-hours", type=float, default=1.0,
+                       help="шаг между снапшотами в часах")
+    synth.add_argument("--categories", type=int, default=len(SYNTH_CATEGORIES),
+                       help=f"сколько категорий (до {len(SYNTH_CATEGORIES)})")
+    synth.add_argument("--videos", type=int, default=150,
+                       help="видео в одной категории в одном снапшоте")
+    synth.add_argument("--vocab", type=int, default=20000, help="размер словаря тегов")
+    synth.add_argument("--zipf", type=float, default=1.1,
+                       help="показатель распределения Ципфа для тегов")
+    synth.add_argument("--persistence", type=float, default=0.85,
+                       help="вероятность, что видео останется в трендах к следующему снапшоту")
+    synth.add_argument("--shorts-share", type=float, default=0.68)
+    synth.add_argument("--start", default="2025-01-01T00:00:00",
+                       help="время первого снапшота")
+    synth.add_argument("--seed", type=int, default=0)
+    synth.set_defaults(func=run_synth)
+
+    bench = commands.add_parser(
+        "bench", help="замерить стадии аналитики и сравнить с baseline"
+    )
+    bench.add_argument("--sizes", default="150,1500",
+                       help="размеры через запятую: видео в категории на снапшот")
+    bench.add_argument("--snapshots", type=int, default=12)
+    bench.add_argument("--repeat", type=int, default=3,
+                       help="сколько прогонов на стадию (берём лучший)")
+    bench.add_argument("--seed", type=int, default=0)
+    bench.add_argument("--work-dir",
+                       default=os.path.join(tempfile.gettempdir(), "yt_radar_bench"),
+                       help="куда генерировать синтетические снапшоты")
+    bench.add_argument("--out", help="куда записать результаты (JSON)")
+    bench.add_argument("--baseline", default=DEFAULT_BENCH_BASELINE,
+                       help="сохранённые результаты для сравнения")
+    bench.add_argument("--tolerance", type=float, default=0.25,
+                       help="во сколько медленнее (доля) считать регрессией")
+    bench.add_argument("--update-baseline", action="store_true",
+                       help="записать результаты как новый baseline")
+    bench.set_defaults(func=run_bench)
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    summary = args.func(args)
+    json.dump(summary, sys.stdout, ensure_ascii=False, indent=2)
+    sys.stdout.write("\n")
+    # bench с регрессиями — ненулевой код, чтобы ронять проверки
+    return 1 if summary.get("regressions") else 0
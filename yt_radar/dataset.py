@@ -0,0 +1,658 @@
+"""
+SnapshotDataset — отсортированные снапшоты с индексом партиций, и матрица траекторий видео.
+"""
+
+import os
+import sys
+import json
+import shutil
+
+import numpy as np
+import pandas as pd
+import pyarrow.feather as feather
+
+from .tags import TagIndex
+from .text import TextStore
+
+# версия формата сохранённого датасета (SnapshotDataset.save / load)
+DATASET_FORMAT_VERSION = 4
+
+# строковые колонки с небольшим числом разных значений — храним как category
+CATEGORICAL_COLUMNS = (
+    "snapshot_file", "snapshot_date", "snapshot_time",
+    "category_id", "category_name", "category_label", "channel_title",
+)
+# если разных значений больше такой доли строк, category памяти не экономит
+CATEGORICAL_MAX_RATIO = 0.5
+# float64, которые не ужимаем: по age_hours режем свежесть бинарным поиском,
+# и float32 сдвинул бы видео на границе fresh_hours
+FLOAT64_COLUMNS = ("age_hours",)
+
+
+def read_only(*arrays):
+    """
+    Запрещаем запись в numpy-массивы общего датасета: он один на процесс
+    и отдаётся всем сессиям без копий, поэтому случайная запись «на месте»
+    испортила бы данные всем пользователям.
+    """
+    for arr in arrays:
+        arr.flags.writeable = False
+
+
+def derive_snapshot_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Типизированные производные колонки, которые раньше каждая метрика
+    считала заново: views (int64), views_per_hour (float32),
+    published_at_dt (UTC без таймзоны) и age_hours — возраст видео
+    на момент снапшота в часах (NaN, если дата публикации неизвестна).
+    """
+    if df.empty:
+        return df
+    derived = {}
+    if "views" in df.columns:
+        derived["views"] = (
+            pd.to_numeric(df["views"], errors="coerce").fillna(0).astype(np.int64)
+        )
+    if "views_per_hour" in df.columns:
+        derived["views_per_hour"] = (
+            pd.to_numeric(df["views_per_hour"], errors="coerce")
+            .fillna(0.0)
+            .astype(np.float32)
+        )
+    if "published_at" in df.columns:
+        published_at_dt = pd.to_datetime(
+            df["published_at"], errors="coerce", utc=True
+        ).dt.tz_convert(None)
+        derived["published_at_dt"] = published_at_dt
+        derived["age_hours"] = (
+            df["snapshot_ts"] - published_at_dt
+        ).dt.total_seconds() / 3600.0
+    else:
+        derived["age_hours"] = np.full(len(df), np.nan)
+    return df.assign(**derived)
+
+
+def compact_snapshot_columns(df: pd.DataFrame):
+    """
+    Ужимаем типы колонок загруженных снапшотов:
+      - CATEGORICAL_COLUMNS — в category (если разных значений немного);
+      - целые — в самый узкий int, в который влезают значения
+        (views обычно в int32, from_shorts в int8);
+      - float64 (кроме FLOAT64_COLUMNS) — в float32.
+    Суммы по ужатым колонкам pandas и numpy всё равно считают в 64 битах.
+
+    Возвращаем (df, report): report — по колонке на строку, тип и глубокий
+    объём в памяти до и после (dtype_before, mb_before, dtype_after, mb_after).
+    """
+    before = df.memory_usage(deep=True, index=False)
+    compacted = {}
+    for col in df.columns:
+        s = df[col]
+        kind = s.dtype.kind
+        if col in CATEGORICAL_COLUMNS and not isinstance(s.dtype, pd.CategoricalDtype):
+            if s.nunique(dropna=True) <= CATEGORICAL_MAX_RATIO * max(len(s), 1):
+                compacted[col] = s.astype("category")
+        elif kind in "iu" and s.dtype.itemsize > 1:
+            narrow = pd.to_numeric(s, downcast="integer")
+            if narrow.dtype.itemsize < s.dtype.itemsize:
+                compacted[col] = narrow
+        elif kind == "f" and s.dtype.itemsize == 8 and col not in FLOAT64_COLUMNS:
+            compacted[col] = s.astype(np.float32)
+    dtypes_before = df.dtypes
+    if compacted:
+        df = df.assign(**compacted)
+    after = df.memory_usage(deep=True, index=False)
+    report = pd.DataFrame(
+        {
+            "column": df.columns,
+            "dtype_before": [str(dtypes_before[c]) for c in df.columns],
+            "mb_before": (before / 1024 / 1024).to_numpy(),
+            "dtype_after": [str(t) for t in df.dtypes],
+            "mb_after": (after / 1024 / 1024).to_numpy(),
+        }
+    )
+    return df, report
+
+
+class SnapshotDataset:
+    """
+    Загруженные снапшоты, отсортированные по (snapshot_ts, category_id),
+    с индексом партиций.
+
+    Для каждого снапшота и каждой пары (снапшот, категория) помним диапазон
+    строк [start, stop), поэтому выбор партиции — это срез df.iloc без
+    прохода по всей таблице и без копирования.
+
+    Теги строк лежат не в df, а в tags (TagIndex): индекс строки df
+    совпадает с номером строки в tags. Тексты (название, описание,
+    сырые теги) — в text (TextStore), в df от них остаётся text_id;
+    сами тексты подставляет with_text.
+
+    Производные колонки (derive_snapshot_columns) считаются один раз,
+    а внутри каждой партиции строки отсортированы по age_hours —
+    свежие видео любой партиции при любом fresh_hours находятся
+    бинарным поиском (fresh_rows).
+
+    Типы колонок ужимаются (compact_snapshot_columns); что сколько
+    занимало до и после — в memory_compaction.
+
+    presorted=True — df уже в порядке датасета, с производными колонками,
+    category_label и ужатыми типами (например, из SnapshotDataset.load):
+    строим только индекс партиций.
+    """
+
+    def __init__(
+        self,
+        df: pd.DataFrame,
+        tags: TagIndex = None,
+        presorted: bool = False,
+        text: TextStore = None,
+    ):
+        if tags is None:
+            if "all_tags_uniq" in df.columns:
+                tags = TagIndex.from_json(df["all_tags_uniq"])
+            else:
+                tags = TagIndex.empty(len(df))
+        df = df.drop(columns=["all_tags_uniq"], errors="ignore")
+        if text is None:
+            text = TextStore.empty()
+            if "video_id" in df.columns:
+                text, text_ids = text.extend(df)
+                if text.columns:
+                    df = df.drop(columns=text.columns).assign(text_id=text_ids)
+
+        if not df.empty and not presorted:
+            if "age_hours" not in df.columns:
+                df = derive_snapshot_columns(df)
+            df = df.reset_index(drop=True)
+            order = (
+                df.sort_values(
+                    ["snapshot_ts", "category_id", "age_hours"],
+                    kind="stable",
+                    na_position="last",
+                )
+                .index.to_numpy()
+            )
+            df = df.iloc[order].reset_index(drop=True)
+            tags = tags.take(order)
+            # после прошлой сборки колонки могут быть category: fillna
+            # новыми значениями там не работает, поэтому через object
+            if "category_name" in df.columns:
+                df["category_label"] = (
+                    df["category_name"].astype(object).fillna(df["category_id"].astype(object))
+                )
+            else:
+                df["category_label"] = df["category_id"]
+        self.memory_compaction = None
+        if not df.empty and not presorted:
+            df, self.memory_compaction = compact_snapshot_columns(df)
+        self.df = df
+        self.tags = tags
+        self.text = text
+        read_only(tags.vocab, tags.offsets, tags.ids)
+        self._trajectories = None
+        self._velocity_cumsum = None
+        self._category_totals = None
+
+        self.snapshots = []
+        self._ts_ranges = {}
+        self._part_ranges = {}
+        self._cat_ranges = {}
+        if df.empty:
+            return
+
+        ts_values = df["snapshot_ts"].to_numpy()
+        cat_values = df["category_id"].to_numpy()
+        n = len(df)
+
+        boundary = np.ones(n, dtype=bool)
+        boundary[1:] = (ts_values[1:] != ts_values[:-1]) | (
+            cat_values[1:] != cat_values[:-1]
+        )
+        starts = np.flatnonzero(boundary)
+        stops = np.append(starts[1:], n)
+
+        for start, stop in zip(starts.tolist(), stops.tolist()):
+            ts = pd.Timestamp(ts_values[start])
+            cat = cat_values[start]
+            self._part_ranges[(ts, cat)] = (start, stop)
+            self._cat_ranges.setdefault(cat, []).append((start, stop))
+            if ts in self._ts_ranges:
+                self._ts_ranges[ts] = (self._ts_ranges[ts][0], stop)
+            else:
+                self._ts_ranges[ts] = (start, stop)
+                self.snapshots.append(ts)
+
+    def save(self, path: str, meta: dict = None):
+        """
+        Сохраняем датасет целиком в папку path: строки (уже отсортированные,
+        с производными колонками) и тексты — Arrow IPC без сжатия, CSR тегов — .npy,
+        словарь тегов — JSON, meta — в meta.json. Папку подменяем целиком,
+        поэтому читатель никогда не видит её наполовину записанной.
+        """
+        tmp_path = path + ".tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        feather.write_feather(
+            self.df, os.path.join(tmp_path, "rows.arrow"), compression="uncompressed"
+        )
+        np.save(os.path.join(tmp_path, "tag_offsets.npy"), self.tags.offsets)
+        np.save(os.path.join(tmp_path, "tag_ids.npy"), self.tags.ids)
+        with open(os.path.join(tmp_path, "tag_vocab.json"), "w", encoding="utf-8") as f:
+            json.dump(self.tags.vocab.tolist(), f, ensure_ascii=False)
+        feather.write_feather(
+            self.text.table, os.path.join(tmp_path, "text.arrow"), compression="uncompressed"
+        )
+        compaction = (
+            self.memory_compaction.to_dict("records")
+            if self.memory_compaction is not None else None
+        )
+        with open(os.path.join(tmp_path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "version": DATASET_FORMAT_VERSION,
+                    "rows": len(self.df),
+                    "memory_compaction": compaction,
+                    "text_layout": self.text.layout,
+                    **(meta or {}),
+                },
+                f,
+                ensure_ascii=False,
+            )
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def saved_meta(path: str):
+        """
+        meta.json сохранённого датасета или None, если его нет
+        или он в другом формате.
+        """
+        try:
+            with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get("version") != DATASET_FORMAT_VERSION:
+            return None
+        return meta
+
+    @classmethod
+    def load(cls, path: str) -> "SnapshotDataset":
+        """
+        Читаем датасет, сохранённый save: строки и CSR тегов отображаются
+        в память (memory map), сортировка и очистка тегов не повторяются.
+        """
+        rows = feather.read_table(os.path.join(path, "rows.arrow"), memory_map=True)
+        offsets = np.load(os.path.join(path, "tag_offsets.npy"), mmap_mode="r")
+        ids = np.load(os.path.join(path, "tag_ids.npy"), mmap_mode="r")
+        with open(os.path.join(path, "tag_vocab.json"), encoding="utf-8") as f:
+            vocab = np.array(json.load(f), dtype=object)
+        text = feather.read_table(os.path.join(path, "text.arrow"), memory_map=True)
+        meta = cls.saved_meta(path) or {}
+        dataset = cls(
+            rows.to_pandas(),
+            TagIndex(vocab, offsets, ids),
+            presorted=True,
+            text=TextStore(text.to_pandas(), meta.get("text_layout")),
+        )
+        compaction = meta.get("memory_compaction")
+        if compaction:
+            dataset.memory_compaction = pd.DataFrame(compaction)
+        return dataset
+
+    def __len__(self) -> int:
+        return len(self.df)
+
+    def memory_usage(self) -> pd.DataFrame:
+        """
+        Сколько сейчас занимает датасет: по колонке df на строку (глубокий
+        подсчёт, со строками) плюс CSR тегов («tags») и тексты («text»)
+        отдельными строками.
+        """
+        usage = self.df.memory_usage(deep=True, index=False)
+        # строки словаря считаем сами: pandas 2 не умеет глубокий подсчёт
+        # по массиву только для чтения
+        tags_bytes = sum(
+            int(a.nbytes) for a in (self.tags.offsets, self.tags.ids, self.tags.vocab)
+        ) + sum(map(sys.getsizeof, self.tags.vocab.tolist()))
+        return pd.DataFrame(
+            {
+                "column": list(usage.index) + ["tags", "text"],
+                "dtype": [str(t) for t in self.df.dtypes] + ["TagIndex", "TextStore"],
+                "mb": np.append(usage.to_numpy() / 1024 / 1024, [
+                    tags_bytes / 1024 / 1024, self.text.memory_mb(),
+                ]),
+            }
+        )
+
+    @property
+    def category_ids(self) -> set:
+        return set(self._cat_ranges)
+
+    @property
+    def empty(self) -> bool:
+        return self.df.empty
+
+    def row_range(self, snapshot_ts, category_id=None):
+        """
+        Диапазон строк [start, stop) для снапшота (и категории).
+        Если такой партиции нет — пустой диапазон.
+        """
+        ts = pd.Timestamp(snapshot_ts)
+        if category_id is None:
+            return self._ts_ranges.get(ts, (0, 0))
+        return self._part_ranges.get((ts, str(category_id)), (0, 0))
+
+    def rows(self, snapshot_ts=None, category_id=None) -> pd.DataFrame:
+        """
+        Строки одного снапшота и/или одной категории.
+
+        Снапшот или (снапшот, категория) — непрерывный срез без копирования.
+        Категория по всем снапшотам собирается из её диапазонов.
+        """
+        if snapshot_ts is not None:
+            start, stop = self.row_range(snapshot_ts, category_id)
+            return self.df.iloc[start:stop]
+        if category_id is None:
+            return self.df
+
+        ranges = self._cat_ranges.get(str(category_id), [])
+        if not ranges:
+            return self.df.iloc[0:0]
+        positions = np.concatenate([np.arange(a, b) for a, b in ranges])
+        return self.df.iloc[positions]
+
+    def fresh_cutoff(self, snapshot_ts, category_id, fresh_hours: float) -> int:
+        """
+        Конец свежих строк партиции: строки [start, cutoff) моложе fresh_hours.
+        """
+        start, stop = self.row_range(snapshot_ts, category_id)
+        if start == stop:
+            return start
+        age = self.df["age_hours"].to_numpy()[start:stop]
+        return start + int(np.searchsorted(age, fresh_hours, side="right"))
+
+    @property
+    def velocity_cumsum(self) -> np.ndarray:
+        """
+        Префиксные суммы views_per_hour по строкам (с нулём в начале):
+        сумма по строкам [a, b) — cumsum[b] - cumsum[a]. Так как внутри
+        партиции строки идут по возрасту, скорость свежих видео партиции
+        при любом fresh_hours — разность двух префиксов.
+        """
+        if self._velocity_cumsum is None:
+            vph = self.df["views_per_hour"].to_numpy(dtype=np.float64) if len(self.df) else []
+            self._velocity_cumsum = np.concatenate([[0.0], np.cumsum(vph)])
+            read_only(self._velocity_cumsum)
+        return self._velocity_cumsum
+
+    def fresh_stats(self, fresh_hours) -> pd.DataFrame:
+        """
+        Свежие видео каждой партиции (snapshot_ts, category_id) для одного
+        или нескольких порогов fresh_hours: fresh_videos и fresh_velocity.
+
+        На каждую партицию — один searchsorted по всем порогам сразу
+        и разности префиксных сумм, без прохода по строкам.
+        """
+        thresholds = np.atleast_1d(np.asarray(fresh_hours, dtype=np.float64))
+        parts = list(self._part_ranges.items())
+        if not parts:
+            return pd.DataFrame(
+                columns=["snapshot_ts", "category_id", "fresh_hours",
+                         "fresh_videos", "fresh_velocity"]
+            )
+
+        age = self.df["age_hours"].to_numpy()
+        starts = np.array([start for _, (start, _) in parts], dtype=np.int64)
+        cutoffs = np.stack(
+            [
+                start + np.searchsorted(age[start:stop], thresholds, side="right")
+                for _, (start, stop) in parts
+            ]
+        )
+        cum = self.velocity_cumsum
+        n_thr = len(thresholds)
+        return pd.DataFrame(
+            {
+                "snapshot_ts": pd.DatetimeIndex([ts for (ts, _), _ in parts]).repeat(n_thr),
+                "category_id": np.repeat([cat for (_, cat), _ in parts], n_thr),
+                "fresh_hours": np.tile(thresholds, len(parts)),
+                "fresh_videos": (cutoffs - starts[:, None]).ravel(),
+                "fresh_velocity": (cum[cutoffs] - cum[starts][:, None]).ravel(),
+            }
+        )
+
+    def category_totals(self) -> pd.DataFrame:
+        """
+        Не зависящие от fresh_hours метрики по (snapshot_ts, category_id,
+        category_name): volume, velocity_total, videos_cnt. Считаются один раз.
+        """
+        if self._category_totals is None:
+            df = self.df
+            self._category_totals = (
+                pd.DataFrame(
+                    {
+                        "snapshot_ts": df["snapshot_ts"].to_numpy(),
+                        "category_id": df["category_id"].astype(str).to_numpy(),
+                        "category_name": df["category_label"].astype(str).to_numpy(),
+                        "views": df["views"].to_numpy(),
+                        "views_per_hour": df["views_per_hour"].to_numpy(dtype=np.float64),
+                        "video_id": df["video_id"].to_numpy(),
+                    }
+                )
+                .groupby(["snapshot_ts", "category_id", "category_name"], observed=True)
+                .agg(
+                    volume=("views", "sum"),
+                    velocity_total=("views_per_hour", "sum"),
+                    videos_cnt=("video_id", "nunique"),
+                )
+                .reset_index()
+            )
+        return self._category_totals
+
+    def fresh_rows(self, snapshot_ts, category_id, fresh_hours: float) -> pd.DataFrame:
+        """
+        Свежие видео партиции (age_hours <= fresh_hours) — срез без фильтра.
+        """
+        start, _ = self.row_range(snapshot_ts, category_id)
+        return self.df.iloc[start:self.fresh_cutoff(snapshot_ts, category_id, fresh_hours)]
+
+    def with_text(self, rows: pd.DataFrame, columns=None) -> pd.DataFrame:
+        """
+        Строки датасета с текстами из TextStore (columns — какие, None — все)
+        вместо text_id — только для того, что показываем или выгружаем.
+        Текстовые колонки встают на те же места, что в исходных снапшотах.
+        """
+        if "text_id" not in rows.columns:
+            return rows
+        texts = self.text.take(rows["text_id"].to_numpy(), columns)
+        return self.text.restore_layout(rows.drop(columns=["text_id"]).assign(**texts))
+
+    def with_tags(self, rows: pd.DataFrame) -> pd.DataFrame:
+        """
+        Строки датасета с колонкой all_tags_uniq (JSON) — для таблиц и выгрузок.
+        """
+        return rows.assign(all_tags_uniq=self.tags.to_json(rows.index))
+
+    @property
+    def trajectories(self) -> "VideoTrajectories":
+        """
+        Матрица video_id × снапшот (строится при первом обращении).
+        """
+        if self._trajectories is None:
+            self._trajectories = VideoTrajectories(self)
+        return self._trajectories
+
+    def categories_at(self, snapshot_ts) -> list:
+        """
+        id категорий, которые есть в снапшоте, в порядке партиций.
+        """
+        ts = pd.Timestamp(snapshot_ts)
+        return [cat for part_ts, cat in self._part_ranges if part_ts == ts]
+
+    def categories(self, snapshot_ts=None) -> pd.DataFrame:
+        """
+        Пары (category_id, category_label) — во всём датасете или в одном снапшоте,
+        отсортированные по названию.
+        """
+        df = self.rows(snapshot_ts)
+        return (
+            df[["category_id", "category_label"]]
+            .drop_duplicates()
+            .sort_values("category_label")
+        )
+
+
+class VideoTrajectories:
+    """
+    Разреженная матрица video_id × снапшот по SnapshotDataset.
+
+    Наблюдения (видео, снапшот) лежат отсортированными по видео, а внутри
+    видео — по времени: keys = video_code * n_snapshots + snapshot_idx,
+    rows — строка датасета, views — просмотры. Если видео в одном снапшоте
+    попало в несколько категорий, берём первую строку (по category_id).
+
+    Для каждой пары соседних наблюдений одного видео сразу посчитаны
+    прирост просмотров, часы между снапшотами и скорость роста, а вся
+    история видео — непрерывный диапазон, т.е. выборка одной строки матрицы.
+    """
+
+    def __init__(self, dataset: "SnapshotDataset"):
+        df = dataset.df
+        self.snapshots = list(dataset.snapshots)
+        self.n_snapshots = max(len(self.snapshots), 1)
+        self._snap_pos = {ts: i for i, ts in enumerate(self.snapshots)}
+
+        if df.empty:
+            self.video_codes = np.array([], dtype=np.int64)
+            self.video_ids = np.array([], dtype=object)
+            views = np.array([], dtype=np.float64)
+        else:
+            self.video_codes, self.video_ids = pd.factorize(df["video_id"])
+            views = pd.to_numeric(df["views"], errors="coerce").to_numpy(dtype=np.float64)
+        spans = [dataset.row_range(ts) for ts in self.snapshots]
+        row_snap = np.repeat(
+            np.arange(len(self.snapshots)), [stop - start for start, stop in spans]
+        )
+        snap_hours = np.array(
+            [(ts - self.snapshots[0]).total_seconds() / 3600.0 for ts in self.snapshots]
+        )
+
+        # без video_id строку в траектории не учитываем
+        valid = np.flatnonzero(self.video_codes >= 0)
+        keys = self.video_codes[valid].astype(np.int64) * self.n_snapshots + row_snap[valid]
+        self.keys, first = np.unique(keys, return_index=True)
+        self.rows = valid[first]
+        self.video = self.keys // self.n_snapshots
+        self.snap = self.keys % self.n_snapshots
+        self.views = views[self.rows]
+        self.hours = snap_hours[self.snap] if len(snap_hours) else np.array([])
+
+        # диапазон наблюдений каждого видео
+        self.video_offsets = np.searchsorted(
+            self.video, np.arange(len(self.video_ids) + 1)
+        )
+
+        # соседние наблюдения одного видео — один проход по всем парам
+        self.views_delta = self._shifted_delta(self.views, 1)
+        self.hours_between = self._shifted_delta(self.hours, 1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.views_per_hour_between = self.views_delta / self.hours_between
+        read_only(
+            self.keys, self.rows, self.video, self.snap, self.views, self.hours,
+            self.video_offsets, self.views_delta, self.hours_between,
+            self.views_per_hour_between,
+        )
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _shifted_delta(self, values: np.ndarray, lag: int) -> np.ndarray:
+        """
+        values[i] - values[i - lag] для наблюдений одного видео, иначе NaN.
+        """
+        out = np.full(len(values), np.nan)
+        if lag < len(values):
+            same = self.video[lag:] == self.video[:-lag]
+            out[lag:][same] = values[lag:][same] - values[:-lag][same]
+        return out
+
+    def rolling_velocity(self, window: int) -> np.ndarray:
+        """
+        Скорость роста (просмотры в час) за последние window шагов
+        каждого видео; NaN, пока у видео меньше window + 1 наблюдений.
+        """
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self._shifted_delta(self.views, window) / self._shifted_delta(
+                self.hours, window
+            )
+
+    def rows_at(self, video_codes: np.ndarray, snapshot_ts) -> np.ndarray:
+        """
+        Строки датасета с этими видео в снапшоте snapshot_ts (-1 — видео там нет).
+        """
+        video_codes = np.asarray(video_codes, dtype=np.int64)
+        out = np.full(len(video_codes), -1, dtype=np.int64)
+        snap = self._snap_pos.get(pd.Timestamp(snapshot_ts))
+        if snap is None or not len(self.keys):
+            return out
+        wanted = video_codes * self.n_snapshots + snap
+        pos = np.minimum(np.searchsorted(self.keys, wanted), len(self.keys) - 1)
+        found = (self.keys[pos] == wanted) & (video_codes >= 0)
+        out[found] = self.rows[pos[found]]
+        return out
+
+    def trajectory(self, video_id) -> pd.DataFrame:
+        """
+        Вся история одного видео: просмотры по снапшотам и рост между ними.
+        """
+        code = pd.Index(self.video_ids).get_indexer([video_id])[0]
+        if code < 0:
+            return pd.DataFrame()
+        start, stop = self.video_offsets[code], self.video_offsets[code + 1]
+        return pd.DataFrame(
+            {
+                "snapshot_ts": [self.snapshots[i] for i in self.snap[start:stop]],
+                "views": self.views[start:stop],
+                "views_delta": self.views_delta[start:stop],
+                "hours_between_snaps": self.hours_between[start:stop],
+                "views_per_hour_between": self.views_per_hour_between[start:stop],
+                "row": self.rows[start:stop],
+            }
+        )
+
+    def steps(self) -> pd.DataFrame:
+        """
+        Все пары соседних наблюдений всех видео одной таблицей.
+        """
+        has_prev = ~np.isnan(self.hours_between)
+        snaps = np.array(self.snapshots, dtype="datetime64[ns]")
+        idx = np.flatnonzero(has_prev)
+        return pd.DataFrame(
+            {
+                "video_id": self.video_ids[self.video[idx]],
+                "snapshot_ts_prev": snaps[self.snap[idx - 1]],
+                "snapshot_ts": snaps[self.snap[idx]],
+                "views_prev": self.views[idx - 1],
+                "views": self.views[idx],
+                "views_delta": self.views_delta[idx],
+                "hours_between_snaps": self.hours_between[idx],
+                "views_per_hour_between": self.views_per_hour_between[idx],
+            }
+        )
+
+
+def snapshot_rows(data, snapshot_ts, category_id=None) -> pd.DataFrame:
+    """
+    Строки одного снапшота (и, если задано, одной категории).
+
+    Для SnapshotDataset — срез по индексу партиций; для обычного DataFrame —
+    фильтр по колонкам, как раньше.
+    """
+    if not isinstance(data, pd.DataFrame):
+        return data.rows(snapshot_ts, category_id)
+    mask = data["snapshot_ts"] == snapshot_ts
+    if category_id is not None:
+        mask &= data["category_id"] == str(category_id)
+    return data[mask]
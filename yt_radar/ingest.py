@@ -0,0 +1,410 @@
+"""
+Инкрементальная загрузка папки со снапшотами и кэш результатов расчётов.
+"""
+
+import os
+import json
+import hashlib
+import threading
+
+import numpy as np
+import pandas as pd
+
+from .settings import (
+    DEFAULT_FRESH_HOURS,
+    RESULT_CACHE_MAX_ENTRIES,
+    RESULT_CACHE_MAX_MB,
+    TAG_CUBES_MAX,
+    WARM_START,
+)
+from .tags import TAG_RULES_VERSION, TagIndex
+from .store import (
+    STORE_FORMAT_VERSION,
+    SnapshotStore,
+    open_snapshot_store,
+    parse_snapshot_ts_from_name,
+)
+from .dataset import SnapshotDataset, derive_snapshot_columns
+from .text import TextStore
+from .profiling import profiled, stage
+from .metrics import (
+    TagMetricsCube,
+    category_metrics_at,
+    compute_category_metrics_all,
+    compute_growth_between_snapshots,
+)
+
+
+class ResultCache:
+    """
+    LRU-кэш результатов расчётов по ключу из настроек виджетов
+    (снапшоты, категория, fresh_hours, min_videos, ...).
+
+    Записи живут, пока не поменялся датасет: при каждом обновлении
+    данных invalidate() очищает кэш и повышает version. Размер ограничен
+    числом записей и суммарным объёмом таблиц; при переполнении
+    выкидываем те, к которым дольше всего не обращались.
+
+    Результаты общие для всех сессий — менять их на месте нельзя.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = RESULT_CACHE_MAX_ENTRIES,
+        max_mb: float = RESULT_CACHE_MAX_MB,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.nbytes = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _size(value) -> int:
+        if isinstance(value, (pd.DataFrame, pd.Series)):
+            # deep: строки и object-колонки считаем целиком, а не по указателям;
+            # платим за это один раз при записи в кэш
+            return int(np.sum(value.memory_usage(index=True, deep=True)))
+        return 0
+
+    def get(self, key, compute):
+        """
+        Результат для key: из кэша или compute() (и запоминаем).
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                # последний использованный — в конце
+                self._entries[key] = entry
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            version = self.version
+
+        name = key[0] if isinstance(key, tuple) and key else key
+        with stage(f"расчёт (промах кэша): {name}"):
+            value = compute()
+        size = self._size(value)
+        with self._lock:
+            # пока считали, данные могли обновиться — такой результат не кладём
+            if version == self.version and key not in self._entries:
+                self._entries[key] = (value, size)
+                self.nbytes += size
+                while self._entries and (
+                    len(self._entries) > self.max_entries or self.nbytes > self.max_bytes
+                ):
+                    _, old_size = self._entries.pop(next(iter(self._entries)))
+                    self.nbytes -= old_size
+                    self.evictions += 1
+        return value
+
+    def invalidate(self):
+        with self._lock:
+            self._entries = {}
+            self.nbytes = 0
+            self.version += 1
+
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class SnapshotIngestState:
+    """
+    Инкрементальная загрузка одной папки со снапшотами.
+
+    Хранилище (SnapshotStore) отвечает за то, чтобы каждый CSV был разобран
+    и почищен ровно один раз. Здесь держим уже собранный датасет
+    (только колонки columns) и помним, какие версии файлов в нём лежат,
+    поэтому при обновлении дочитываем только новые или изменившиеся файлы.
+
+    Если хранилище на диске, собранный датасет тоже сохраняется рядом
+    (SnapshotDataset.save) вместе с хэшем манифеста. После перезапуска
+    первый refresh просто отображает его в память, если с тех пор
+    ни один файл не поменялся (warm start), иначе собирает как обычно.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        columns=None,
+        store: SnapshotStore = None,
+        warm_start: bool = WARM_START,
+    ):
+        self.directory = directory
+        self.columns = list(columns) if columns is not None else None
+        self.store = store if store is not None else open_snapshot_store(directory)
+        self.warm_start = warm_start
+        self.loaded = {}
+        self.data = pd.DataFrame()
+        self.tags = TagIndex.empty()
+        self.text = TextStore.empty()
+        self.dataset = SnapshotDataset(self.data, self.tags, text=self.text)
+        # растёт при каждой замене датасета (см. current)
+        self.dataset_version = 0
+        self.last_stats = {
+            "added": 0, "changed": 0, "removed": 0, "unchanged": 0, "failed": [],
+            "tag_hits": 0, "tag_misses": 0, "warm_start": False,
+        }
+        self.tag_cubes = {}
+        self.category_tables = {}
+        self.results = ResultCache()
+        self._lock = threading.Lock()
+
+    @profiled("SnapshotIngestState.refresh")
+    def refresh(self) -> dict:
+        """
+        Сверяем папку с хранилищем и догружаем только то, что поменялось.
+        """
+        with self._lock:
+            return self._refresh_locked()
+
+    def _refresh_locked(self) -> dict:
+        stats = self.store.compact()
+        current = {fname: entry["sha1"] for fname, entry in self.store.manifest.items()}
+        stats["warm_start"] = (
+            self.warm_start and not self.loaded and self._load_warm_locked(current)
+        )
+
+        stale = [
+            fname
+            for fname, digest in self.loaded.items()
+            if current.get(fname) != digest
+        ]
+        fresh = sorted(
+            fname for fname, digest in current.items()
+            if self.loaded.get(fname) != digest
+        )
+
+        data, tags, text = self.data, self.tags, self.text
+        if stale and not data.empty:
+            keep = ~data["snapshot_file"].isin(stale).to_numpy()
+            data = data[keep]
+            tags = tags.take(np.flatnonzero(keep))
+            if "text_id" in data.columns:
+                # версии текстов, на которые больше никто не ссылается, выкидываем
+                text, text_ids = text.compact(data["text_id"].to_numpy())
+                data = data.assign(text_id=text_ids)
+        for fname in stale:
+            del self.loaded[fname]
+
+        if fresh:
+            new_rows = derive_snapshot_columns(
+                self.store.read(fresh, columns=self.columns)
+            )
+            if "all_tags_uniq" in new_rows.columns:
+                new_tags = TagIndex.from_json(new_rows.pop("all_tags_uniq"))
+            else:
+                new_tags = TagIndex.empty(len(new_rows))
+            # тексты — в TextStore, в строках остаётся только номер версии
+            text, text_ids = text.extend(new_rows)
+            text_cols = [c for c in text.columns if c in new_rows.columns]
+            if text_cols:
+                new_rows = new_rows.drop(columns=text_cols).assign(text_id=text_ids)
+            parts = [data] if not data.empty else []
+            data = pd.concat(parts + [new_rows], ignore_index=True)
+            tags = TagIndex.concat([tags, new_tags])
+            for fname in fresh:
+                self.loaded[fname] = current[fname]
+        elif stale:
+            data = data.reset_index(drop=True)
+
+        if stale or fresh:
+            self.dataset = SnapshotDataset(data, tags, text=text)
+            self.dataset_version += 1
+            data, tags = self.dataset.df, self.dataset.tags
+        self.data, self.tags, self.text = data, tags, text
+        self.last_stats = stats
+
+        if stale or fresh:
+            # таблицы по категориям пересчитываются целиком и дёшево
+            self.category_tables = {}
+            self.results.invalidate()
+            # уже построенные кубы дотягиваем только по изменившимся снапшотам;
+            # их могут читать другие сессии, поэтому обновляем копии
+            versions = self._snapshot_versions()
+            cubes = {}
+            for fresh_hours, cube in self.tag_cubes.items():
+                cube = cube.copy()
+                cube.update(self.dataset, versions)
+                cubes[fresh_hours] = cube
+            self.tag_cubes = cubes
+            if self.warm_start:
+                self._save_warm_locked(current)
+        return stats
+
+    def _warm_path(self):
+        """
+        Папка сохранённого датасета для этого набора колонок
+        (None — хранилище только в памяти).
+        """
+        if self.store.store_dir is None:
+            return None
+        key = hashlib.sha1(json.dumps(self.columns).encode("utf-8")).hexdigest()[:12]
+        return os.path.join(self.store.store_dir, f"dataset_{key}")
+
+    def _manifest_key(self, current: dict) -> str:
+        """
+        Хэш всего, от чего зависит собранный датасет: версии файлов,
+        колонки, формат хранилища и правила очистки тегов.
+        """
+        payload = json.dumps(
+            [sorted(current.items()), self.columns, STORE_FORMAT_VERSION, TAG_RULES_VERSION],
+            ensure_ascii=False,
+        )
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    def _load_warm_locked(self, current: dict) -> bool:
+        path = self._warm_path()
+        if path is None or not current:
+            return False
+        meta = SnapshotDataset.saved_meta(path)
+        if meta is None or meta.get("manifest") != self._manifest_key(current):
+            return False
+        try:
+            dataset = SnapshotDataset.load(path)
+        except (OSError, ValueError) as e:
+            print(f"Не удалось прочитать сохранённый датасет {path}: {e}")
+            return False
+        self.dataset = dataset
+        self.dataset_version += 1
+        self.data, self.tags, self.text = dataset.df, dataset.tags, dataset.text
+        self.loaded = dict(current)
+        return True
+
+    def _save_warm_locked(self, current: dict):
+        path = self._warm_path()
+        if path is None:
+            return
+        try:
+            self.dataset.save(path, meta={"manifest": self._manifest_key(current)})
+        except OSError as e:
+            print(f"Не удалось сохранить датасет {path}: {e}")
+
+    def _snapshot_versions(self) -> dict:
+        """
+        Снапшот → хэши его файлов: по ним куб понимает, что пересчитывать.
+        """
+        versions = {}
+        for fname, digest in sorted(self.loaded.items()):
+            ts = pd.Timestamp(parse_snapshot_ts_from_name(fname))
+            versions[ts] = versions.get(ts, ()) + (digest,)
+        return versions
+
+    def category_metrics(self, fresh_hours: float = DEFAULT_FRESH_HOURS) -> pd.DataFrame:
+        """
+        Метрики по категориям для всех снапшотов (compute_category_metrics_all),
+        одна таблица на fresh_hours до следующего изменения датасета.
+        """
+        fresh_hours = float(fresh_hours)
+        with self._lock:
+            if fresh_hours not in self.category_tables:
+                self.category_tables[fresh_hours] = compute_category_metrics_all(
+                    self.dataset, fresh_hours
+                )
+            return self.category_tables[fresh_hours]
+
+    def tag_metrics_cube(self, fresh_hours: float = DEFAULT_FRESH_HOURS) -> "TagMetricsCube":
+        """
+        Куб метрик по тегам для fresh_hours: строится при первом запросе,
+        дальше обновляется вместе с датасетом.
+        """
+        fresh_hours = float(fresh_hours)
+        with self._lock:
+            cube = self.tag_cubes.pop(fresh_hours, None)
+            if cube is None and self.tag_cubes:
+                # все кубы в актуальном состоянии: берём любой и меняем
+                # только свежие колонки
+                other = next(reversed(self.tag_cubes.values()))
+                cube = other.with_fresh_hours(self.dataset, fresh_hours)
+            elif cube is None:
+                cube = TagMetricsCube(fresh_hours)
+                cube.update(self.dataset, self._snapshot_versions())
+            # последний запрошенный — в конце; самые старые выкидываем
+            self.tag_cubes[fresh_hours] = cube
+            while len(self.tag_cubes) > TAG_CUBES_MAX:
+                del self.tag_cubes[next(iter(self.tag_cubes))]
+            return cube
+
+    def tag_metrics(
+        self,
+        snapshot_ts,
+        category_id=None,
+        fresh_hours: float = DEFAULT_FRESH_HOURS,
+        min_videos_per_tag: int = 1,
+    ) -> pd.DataFrame:
+        """
+        Метрики по тегам одного снапшота (и категории) — через кэш результатов.
+        """
+        key = (
+            "tag_metrics", pd.Timestamp(snapshot_ts), category_id,
+            float(fresh_hours), int(min_videos_per_tag),
+        )
+        return self.results.get(
+            key,
+            lambda: self.tag_metrics_cube(fresh_hours).metrics(
+                snapshot_ts, category_id, min_videos_per_tag
+            ),
+        )
+
+    def tag_history(
+        self,
+        pattern: str,
+        exact: bool = False,
+        category_id=None,
+        fresh_hours: float = DEFAULT_FRESH_HOURS,
+        min_videos_per_tag: int = 1,
+    ) -> pd.DataFrame:
+        """
+        История по снапшотам для тегов, подходящих под pattern, — через кэш.
+        """
+        key = (
+            "tag_history", pattern, bool(exact), category_id,
+            float(fresh_hours), int(min_videos_per_tag),
+        )
+
+        def compute():
+            cube = self.tag_metrics_cube(fresh_hours)
+            return cube.history(cube.search(pattern, exact), category_id, min_videos_per_tag)
+
+        return self.results.get(key, compute)
+
+    def category_metrics_at(
+        self, snapshot_ts, fresh_hours: float = DEFAULT_FRESH_HOURS
+    ) -> pd.DataFrame:
+        """
+        Метрики по категориям одного снапшота — через кэш результатов.
+        """
+        key = ("category_metrics", pd.Timestamp(snapshot_ts), float(fresh_hours))
+        return self.results.get(
+            key,
+            lambda: category_metrics_at(self.category_metrics(fresh_hours), snapshot_ts),
+        )
+
+    def current(self):
+        """
+        (датасет, его версия) одной парой. Кто берёт по строкам результата
+        теги или траектории, должен брать их из этого же датасета:
+        другая сессия может успеть обновить состояние между двумя чтениями.
+        """
+        with self._lock:
+            return self.dataset, self.dataset_version
+
+    def growth(self, ts1, ts2, current=None) -> pd.DataFrame:
+        """
+        Рост видео между двумя снапшотами — через кэш результатов.
+        current — пара из current() (по умолчанию — текущий датасет);
+        индекс результата — строки именно этого датасета.
+        """
+        dataset, version = current if current is not None else self.current()
+        key = ("growth", version, pd.Timestamp(ts1), pd.Timestamp(ts2))
+        return self.results.get(
+            key, lambda: compute_growth_between_snapshots(dataset, ts1, ts2)
+        )
@@ -0,0 +1,686 @@
+"""
+Метрики по категориям, тегам и росту видео между снапшотами.
+"""
+
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from .settings import DEFAULT_FRESH_HOURS
+from .profiling import profiled
+from .tags import TagIndex, TagSearchIndex
+from .dataset import SnapshotDataset, derive_snapshot_columns, snapshot_rows
+
+
+def _video_row_pairs(video_codes: np.ndarray, rows_t1: np.ndarray, rows_t2: np.ndarray):
+    """
+    Все пары (строка t1, строка t2) одного видео в порядке inner merge:
+    по строкам t1, внутри — по строкам t2. Строки без видео (код -1) не в паре.
+    """
+    codes1 = video_codes[rows_t1]
+    codes2 = video_codes[rows_t2]
+    order2 = np.argsort(codes2, kind="stable")
+    sorted2 = codes2[order2]
+    start = np.searchsorted(sorted2, codes1, side="left")
+    stop = np.searchsorted(sorted2, codes1, side="right")
+    counts = np.where(codes1 >= 0, stop - start, 0)
+    left = np.repeat(np.arange(len(codes1)), counts)
+    # номер пары внутри своей строки t1
+    within = np.arange(len(left)) - np.repeat(np.cumsum(counts) - counts, counts)
+    right = order2[np.repeat(start, counts) + within]
+    return rows_t1[left], rows_t2[right]
+
+
+@profiled()
+def compute_growth_between_snapshots(
+    df: pd.DataFrame,
+    ts1: datetime,
+    ts2: datetime,
+) -> pd.DataFrame:
+    """
+    Сравнение двух снапшотов по video_id.
+    df — DataFrame со всеми снапшотами или SnapshotDataset.
+
+    Индекс результата — индекс строк позднего снапшота, поэтому для
+    SnapshotDataset по нему можно брать теги из dataset.tags.
+
+    Для SnapshotDataset пары строк собираются по кодам видео
+    (dataset.trajectories.video_codes) без merge, но так же, как merge
+    по video_id: видео из нескольких категорий даёт все пары своих строк
+    раннего и позднего снапшота.
+    """
+    df1 = snapshot_rows(df, ts1)
+    df2 = snapshot_rows(df, ts2)
+
+    if df1.empty or df2.empty:
+        return pd.DataFrame()
+
+    if not isinstance(df, pd.DataFrame):
+        rows_t1, rows_t2 = _video_row_pairs(
+            df.trajectories.video_codes, df1.index.to_numpy(), df2.index.to_numpy()
+        )
+        df1 = df.with_tags(df.with_text(df.df.iloc[rows_t1], ["title"]))
+        df2 = df.with_tags(df.with_text(df.df.iloc[rows_t2], ["title"]))
+
+    base_cols = [
+        "video_id",
+        "title",
+        "channel_title",
+        "category_id",
+        "category_name",
+        "views",
+        "views_per_hour",
+        "from_shorts",
+        "duration_sec",
+        "all_tags_uniq",
+        "published_at",
+    ]
+
+    df1 = df1.reindex(columns=base_cols).rename(
+        columns={c: f"{c}_t1" for c in base_cols if c != "video_id"}
+    )
+    df2 = df2.reindex(columns=base_cols).rename(
+        columns={c: f"{c}_t2" for c in base_cols if c != "video_id"}
+    )
+    if not isinstance(df, pd.DataFrame):
+        # строки уже сопоставлены: df1 и df2 идут парами
+        merged = pd.concat(
+            [
+                df1.reset_index(drop=True),
+                df2.drop(columns=["video_id"]).reset_index(drop=True),
+            ],
+            axis=1,
+        )
+        merged.index = df2.index
+    else:
+        df2["_row_t2"] = df2.index
+        merged = df1.merge(df2, on="video_id", how="inner")
+        merged.index = pd.Index(merged.pop("_row_t2").to_numpy())
+    if merged.empty:
+        return merged
+
+    hours_diff = (ts2 - ts1).total_seconds() / 3600.0
+    if hours_diff <= 0:
+        hours_diff = 1e-6
+
+    merged["hours_between_snaps"] = hours_diff
+    merged["views_delta"] = merged["views_t2"] - merged["views_t1"]
+    merged["views_per_hour_between"] = merged["views_delta"] / hours_diff
+
+    merged = merged.sort_values("views_per_hour_between", ascending=False)
+    return merged
+
+
+@profiled()
+def compute_category_metrics_all(
+    df: pd.DataFrame,
+    fresh_hours: float = DEFAULT_FRESH_HOURS,
+) -> pd.DataFrame:
+    """
+    Метрики по категориям сразу для всех снапшотов: одна строка на
+    (snapshot_ts, category_id), доли считаются внутри своего снапшота.
+    df — DataFrame со снапшотами или SnapshotDataset.
+
+    Всё считается одним groupby по (snapshot_ts, category_id, category_name),
+    без цикла по группам. Для SnapshotDataset не зависящая от fresh_hours
+    часть берётся из dataset.category_totals(), а свежие видео —
+    из префиксных сумм (dataset.fresh_stats), так что смена fresh_hours
+    ничего не пересчитывает по строкам.
+    """
+    data = df if isinstance(df, pd.DataFrame) else df.df
+    if data.empty:
+        return pd.DataFrame()
+
+    if not isinstance(df, pd.DataFrame):
+        totals = df.category_totals()
+        # у партиции одно название категории — свежие метрики партиции
+        # однозначно ложатся на строку таблицы
+        if not totals.duplicated(["snapshot_ts", "category_id"]).any():
+            fresh = df.fresh_stats(fresh_hours).drop(columns=["fresh_hours"])
+            cat_df = totals.merge(fresh, on=["snapshot_ts", "category_id"], how="left")
+            cat_df = cat_df[
+                [
+                    "snapshot_ts", "category_id", "category_name", "volume",
+                    "velocity_total", "fresh_velocity", "videos_cnt", "fresh_videos",
+                ]
+            ]
+            return finish_category_metrics(cat_df)
+
+    if "age_hours" not in data.columns:
+        data = derive_snapshot_columns(data)
+
+    views = data["views"].to_numpy()
+    velocity = data["views_per_hour"].to_numpy(dtype=np.float64)
+    is_fresh = (data["age_hours"] <= fresh_hours).to_numpy()
+
+    cat_ids = data["category_id"].astype(str)
+    if "category_name" in data.columns:
+        cat_labels = data["category_name"].astype(object).fillna(cat_ids)
+    else:
+        cat_labels = cat_ids
+
+    work = pd.DataFrame(
+        {
+            "snapshot_ts": data["snapshot_ts"].to_numpy(),
+            "category_id": cat_ids.to_numpy(),
+            "category_name": cat_labels.to_numpy(),
+            "views": views,
+            "views_per_hour": velocity,
+            "fresh_velocity": np.where(is_fresh, velocity, 0.0),
+            "video_id": data["video_id"].to_numpy(),
+            "is_fresh": is_fresh,
+        }
+    )
+    cat_df = (
+        work.groupby(["snapshot_ts", "category_id", "category_name"], observed=True)
+        .agg(
+            volume=("views", "sum"),
+            velocity_total=("views_per_hour", "sum"),
+            fresh_velocity=("fresh_velocity", "sum"),
+            videos_cnt=("video_id", "nunique"),
+            fresh_videos=("is_fresh", "sum"),
+        )
+        .reset_index()
+    )
+    return finish_category_metrics(cat_df)
+
+
+def finish_category_metrics(cat_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    freshness и доли категорий внутри снапшота поверх сырых сумм
+    (volume, velocity_total, fresh_velocity, videos_cnt, fresh_videos).
+    """
+    if cat_df.empty:
+        return cat_df
+
+    cat_df = cat_df.copy()
+    cat_df["fresh_videos"] = cat_df["fresh_videos"].astype(int)
+    cat_df["freshness"] = np.where(
+        cat_df["videos_cnt"] > 0,
+        cat_df["fresh_videos"] / cat_df["videos_cnt"].clip(lower=1),
+        0.0,
+    )
+
+    totals = (
+        cat_df.groupby("snapshot_ts", observed=True)[["volume", "velocity_total", "fresh_velocity"]]
+        .transform("sum")
+        .replace(0, 1e-6)
+    )
+    cat_df["volume_share"] = cat_df["volume"] / totals["volume"]
+    cat_df["velocity_share"] = cat_df["velocity_total"] / totals["velocity_total"]
+    cat_df["fresh_velocity_share"] = cat_df["fresh_velocity"] / totals["fresh_velocity"]
+
+    return cat_df
+
+
+def category_metrics_at(cat_all: pd.DataFrame, snapshot_ts) -> pd.DataFrame:
+    """
+    Строки одного снапшота из compute_category_metrics_all — в том виде,
+    в каком их отдаёт compute_category_metrics_for_snapshot.
+    """
+    if cat_all.empty:
+        return pd.DataFrame()
+    rows = cat_all[cat_all["snapshot_ts"] == pd.Timestamp(snapshot_ts)]
+    if rows.empty:
+        return pd.DataFrame()
+    return rows.drop(columns=["snapshot_ts"]).reset_index(drop=True)
+
+
+@profiled()
+def compute_category_metrics_for_snapshot(
+    df: pd.DataFrame,
+    snapshot_ts: datetime,
+    fresh_hours: float = DEFAULT_FRESH_HOURS,
+) -> pd.DataFrame:
+    """
+    Метрики по категориям для одного снапшота.
+    df — DataFrame со всеми снапшотами или SnapshotDataset.
+    """
+    df2 = snapshot_rows(df, snapshot_ts)
+    if df2.empty:
+        return pd.DataFrame()
+    return category_metrics_at(
+        compute_category_metrics_all(df2, fresh_hours), snapshot_ts
+    )
+
+
+def aggregate_tag_metrics(
+    df_slice: pd.DataFrame,
+    fresh_hours: float = DEFAULT_FRESH_HOURS,
+    tag_index: TagIndex = None,
+) -> pd.DataFrame:
+    """
+    Сырые агрегаты по тегам для среза: volume, velocity_total, velocity,
+    videos_cnt, fresh_videos. Строки отсортированы по тегу.
+
+    tag_index — теги датасета, из которого взят срез (SnapshotDataset.tags);
+    без него теги берутся из колонки all_tags_uniq.
+
+    Считаем без прохода по строкам: пары (видео, тег) разворачиваются
+    из CSR-индекса, суммы по тегам — np.bincount по id тега.
+    """
+    if df_slice.empty:
+        return pd.DataFrame()
+    if "age_hours" not in df_slice.columns:
+        df_slice = derive_snapshot_columns(df_slice)
+    n = len(df_slice)
+
+    views = df_slice["views"].to_numpy()
+    velocity = df_slice["views_per_hour"].to_numpy(dtype=np.float64)
+    is_fresh = df_slice["age_hours"].to_numpy() <= fresh_hours
+
+    if tag_index is not None:
+        # теги из общего словаря датасета
+        owner, tag_ids = tag_index.explode(df_slice.index.to_numpy())
+        vocab = tag_index.vocab
+    elif "all_tags_uniq" in df_slice.columns:
+        # теги только в JSON-колонке: строим словарь по срезу
+        slice_tags = TagIndex.from_json(df_slice["all_tags_uniq"])
+        owner, tag_ids = slice_tags.explode(np.arange(n))
+        vocab = slice_tags.vocab
+    else:
+        return pd.DataFrame()
+    if len(tag_ids) == 0:
+        return pd.DataFrame()
+
+    # сжимаем id до тегов, которые есть в срезе (порядок id = порядок vocab)
+    used, tag_codes = np.unique(tag_ids, return_inverse=True)
+    n_tags = len(used)
+
+    def per_tag(weights):
+        return np.bincount(tag_codes, weights=weights, minlength=n_tags)
+
+    pair_fresh = is_fresh[owner]
+    pair_vel = velocity[owner]
+    volume = per_tag(views[owner])
+    if views.dtype.kind in "iu":
+        volume = np.rint(volume).astype(np.int64)
+
+    # уникальные видео на тег: уникальные пары (тег, видео)
+    video_codes, video_uniques = pd.factorize(df_slice["video_id"].to_numpy()[owner])
+    n_videos = max(len(video_uniques) + 1, 1)
+    pairs = np.unique(tag_codes.astype(np.int64) * n_videos + (video_codes + 1))
+    videos_cnt = np.bincount(
+        pairs[pairs % n_videos != 0] // n_videos, minlength=n_tags
+    ).astype(np.int64)
+
+    tag_agg = pd.DataFrame(
+        {
+            "tag": vocab[used],
+            "volume": volume,
+            "velocity_total": per_tag(pair_vel),
+            "velocity": per_tag(np.where(pair_fresh, pair_vel, 0.0)),
+            "videos_cnt": videos_cnt,
+            "fresh_videos": np.bincount(tag_codes[pair_fresh], minlength=n_tags).astype(np.int64),
+        }
+    )
+    return tag_agg
+
+
+def classify_tag_metrics(
+    tag_agg: pd.DataFrame,
+    min_videos_per_tag: int = 1,
+) -> pd.DataFrame:
+    """
+    Из сырых агрегатов (aggregate_tag_metrics) получаем итоговые метрики:
+    freshness, отсечка по числу видео и статус тега.
+    Перцентили для статусов считаются по тегам, прошедшим отсечку.
+    """
+    if tag_agg.empty:
+        return tag_agg
+
+    tag_agg = tag_agg.copy()
+    tag_agg["freshness"] = tag_agg["fresh_videos"] / tag_agg["videos_cnt"]
+
+    tag_agg = tag_agg[tag_agg["videos_cnt"] >= min_videos_per_tag].copy()
+    if tag_agg.empty:
+        return tag_agg
+
+    # перцентили и медианы для статусов
+    p75_velocity = float(tag_agg["velocity"].quantile(0.75))
+    p90_velocity = float(tag_agg["velocity"].quantile(0.90))
+    p75_volume = float(tag_agg["volume"].quantile(0.75))
+    median_volume = float(tag_agg["volume"].median())
+    median_velocity = float(tag_agg["velocity"].median())
+
+    lower_mature_vel = 0.8 * p75_velocity
+    upper_mature_vel = 1.2 * p75_velocity
+
+    tag_agg["status"] = "Other"
+
+    # Trending: очень высокая скорость, много свежих
+    trending_mask = (tag_agg["velocity"] >= p90_velocity) & (
+        tag_agg["freshness"] > 0.5
+    )
+    tag_agg.loc[trending_mask, "status"] = "Trending"
+
+    # Emerging: скорость выше 75 перцентиля, но объём ещё не огромный
+    emerging_mask = (
+        (tag_agg["status"] == "Other")
+        & (tag_agg["velocity"] >= p75_velocity)
+        & (tag_agg["volume"] < median_volume)
+        & (tag_agg["freshness"] > 0.5)
+    )
+    tag_agg.loc[emerging_mask, "status"] = "Emerging"
+
+    # Declining: был большой объём, но скорость и свежесть низкие
+    declining_mask = (
+        (tag_agg["status"] == "Other")
+        & (tag_agg["volume"] >= p75_volume)
+        & (tag_agg["velocity"] < median_velocity)
+        & (tag_agg["freshness"] < 0.3)
+    )
+    tag_agg.loc[declining_mask, "status"] = "Declining"
+
+    # Mature: устойчиво большая тема с нормальной скоростью
+    mature_mask = (
+        (tag_agg["status"] == "Other")
+        & (tag_agg["volume"] >= p75_volume)
+        & (tag_agg["velocity"] >= lower_mature_vel)
+        & (tag_agg["velocity"] <= upper_mature_vel)
+    )
+    tag_agg.loc[mature_mask, "status"] = "Mature"
+
+    # Frozen: и объём не очень, и скорости/свежести нет
+    frozen_mask = (
+        (tag_agg["status"] == "Other")
+        & (tag_agg["volume"] < median_volume)
+        & (tag_agg["velocity"] < median_velocity)
+    )
+    tag_agg.loc[frozen_mask, "status"] = "Frozen"
+
+    return tag_agg
+
+
+@profiled()
+def compute_tag_metrics_for_df_slice(
+    df_slice: pd.DataFrame,
+    fresh_hours: float = DEFAULT_FRESH_HOURS,
+    min_videos_per_tag: int = 1,
+    tag_index: TagIndex = None,
+) -> pd.DataFrame:
+    """
+    Метрики по тегам для одного снапшота и одной категории.
+
+    tag_index — теги датасета, из которого взят срез (SnapshotDataset.tags);
+    без него теги берутся из колонки all_tags_uniq.
+    """
+    tag_agg = aggregate_tag_metrics(df_slice, fresh_hours, tag_index)
+    return classify_tag_metrics(tag_agg, min_videos_per_tag)
+
+
+# ключ «все категории» в кубе метрик по тегам (id категорий — числа в строке)
+ALL_CATEGORIES = "all"
+
+
+class TagMetricsCube:
+    """
+    Материализованные агрегаты по тегам: (snapshot_ts, category_id, tag) →
+    volume, velocity_total, velocity, videos_cnt, fresh_videos при одном
+    fresh_hours, плюс свёртка по всем категориям (category_id = ALL_CATEGORIES).
+
+    Считается по снапшотам: при обновлении пересчитываются только
+    новые и изменившиеся снапшоты. Таблица отсортирована по
+    (category_id, snapshot_ts, tag), так что срез по категории
+    или по (снапшот, категория) — это диапазон строк.
+
+    Куб, который уже читают другие потоки, не меняется: update вызывается
+    на копии (copy), а потом подменяется ссылка на куб.
+    """
+
+    columns = (
+        "snapshot_ts", "category_id", "tag", "tag_id",
+        "volume", "velocity_total", "velocity", "videos_cnt", "fresh_videos",
+    )
+
+    def __init__(self, fresh_hours: float = DEFAULT_FRESH_HOURS):
+        self.fresh_hours = fresh_hours
+        self.table = pd.DataFrame(columns=list(self.columns))
+        self.vocab = np.array([], dtype=object)
+        self._search = None
+        self._parts = {}
+        self._versions = {}
+        self._cat_ranges = {}
+        self._part_ranges = {}
+
+    def copy(self) -> "TagMetricsCube":
+        """
+        Копия для обновления: части и таблица общие (они не меняются),
+        словари состояния — свои.
+        """
+        cube = TagMetricsCube(self.fresh_hours)
+        cube.table, cube.vocab, cube._search = self.table, self.vocab, self._search
+        cube._parts = dict(self._parts)
+        cube._versions = dict(self._versions)
+        cube._cat_ranges = dict(self._cat_ranges)
+        cube._part_ranges = dict(self._part_ranges)
+        return cube
+
+    def _build_part(self, dataset: "SnapshotDataset", ts) -> pd.DataFrame:
+        frames = []
+        for cat in dataset.categories_at(ts) + [ALL_CATEGORIES]:
+            rows = dataset.rows(ts, None if cat == ALL_CATEGORIES else cat)
+            agg = aggregate_tag_metrics(rows, self.fresh_hours, dataset.tags)
+            if agg.empty:
+                continue
+            agg.insert(0, "category_id", cat)
+            agg.insert(0, "snapshot_ts", ts)
+            frames.append(agg)
+        if not frames:
+            return None
+        return pd.concat(frames, ignore_index=True)
+
+    @profiled("TagMetricsCube.update")
+    def update(self, dataset: "SnapshotDataset", versions: dict) -> int:
+        """
+        Доводим куб до состояния датасета.
+        versions — снапшот → версия его данных (например, хэши файлов);
+        пересчитываются снапшоты, у которых версия поменялась.
+        Возвращаем число пересчитанных снапшотов.
+        """
+        rebuilt = 0
+        for ts in [ts for ts in self._versions if ts not in versions]:
+            del self._versions[ts]
+            self._parts.pop(ts, None)
+            rebuilt += 1
+        for ts, version in versions.items():
+            if self._versions.get(ts) == version:
+                continue
+            part = self._build_part(dataset, ts)
+            if part is None:
+                self._parts.pop(ts, None)
+            else:
+                self._parts[ts] = part
+            self._versions[ts] = version
+            rebuilt += 1
+        if rebuilt:
+            self._reindex()
+        return rebuilt
+
+    @profiled("TagMetricsCube.with_fresh_hours")
+    def with_fresh_hours(self, dataset: "SnapshotDataset", fresh_hours: float) -> "TagMetricsCube":
+        """
+        Куб для другого fresh_hours по тому же датасету.
+
+        volume, velocity_total и videos_cnt от fresh_hours не зависят
+        и копируются; velocity и fresh_videos считаются только по свежим
+        строкам партиций — от начала партиции до fresh_cutoff (строки
+        отсортированы по возрасту), а теги этих строк — один срез CSR.
+        """
+        cube = TagMetricsCube(fresh_hours)
+        table = self.table
+        vph = dataset.df["views_per_hour"].to_numpy(dtype=np.float64)
+        # id тегов куба в словаре датасета; внутри (снапшот, категория)
+        # строки куба идут по тегу, т.е. по возрастанию этих id
+        dataset_ids = dataset.tags.tag_ids(self.vocab)[table["tag_id"].to_numpy()]
+        velocity = np.zeros(len(table))
+        fresh_videos = np.zeros(len(table), dtype=np.int64)
+
+        for (ts, cat), (start, stop) in self._part_ranges.items():
+            cats = dataset.categories_at(ts) if cat == ALL_CATEGORIES else [cat]
+            pieces = [
+                dataset.tags.span(
+                    dataset.row_range(ts, c)[0], dataset.fresh_cutoff(ts, c, fresh_hours)
+                )
+                for c in cats
+            ]
+            rows = np.concatenate([p[0] for p in pieces])
+            ids = np.concatenate([p[1] for p in pieces])
+            pos = np.searchsorted(dataset_ids[start:stop], ids)
+            velocity[start:stop] = np.bincount(pos, weights=vph[rows], minlength=stop - start)
+            fresh_videos[start:stop] = np.bincount(pos, minlength=stop - start)
+
+        cube.table = table.assign(velocity=velocity, fresh_videos=fresh_videos)
+        cube.vocab = self.vocab
+        cube._versions = dict(self._versions)
+        cube._cat_ranges = dict(self._cat_ranges)
+        cube._part_ranges = dict(self._part_ranges)
+        cube._parts = {
+            ts: part.drop(columns=["tag_id"]).reset_index(drop=True)
+            for ts, part in cube.table.groupby("snapshot_ts", sort=False, observed=True)
+        }
+        return cube
+
+    def _reindex(self):
+        if not self._parts:
+            self.table = pd.DataFrame(columns=list(self.columns))
+            self.vocab = np.array([], dtype=object)
+            self._cat_ranges, self._part_ranges = {}, {}
+            self._search = None
+            return
+        table = pd.concat(
+            [self._parts[ts] for ts in sorted(self._parts)], ignore_index=True
+        )
+        # id тега — позиция в словаре куба (по алфавиту)
+        tag_codes, vocab = pd.factorize(table["tag"], sort=True)
+        table.insert(3, "tag_id", tag_codes.astype(np.int32))
+        # внутри снапшота строки уже идут по категории и тегу
+        order = table.sort_values("category_id", kind="stable").index.to_numpy()
+        table = table.iloc[order].reset_index(drop=True)
+
+        ts_values = table["snapshot_ts"].to_numpy()
+        cat_values = table["category_id"].to_numpy()
+        n = len(table)
+        boundary = np.ones(n, dtype=bool)
+        boundary[1:] = (ts_values[1:] != ts_values[:-1]) | (
+            cat_values[1:] != cat_values[:-1]
+        )
+        starts = np.flatnonzero(boundary)
+        stops = np.append(starts[1:], n)
+
+        cat_ranges, part_ranges = {}, {}
+        for start, stop in zip(starts.tolist(), stops.tolist()):
+            ts = pd.Timestamp(ts_values[start])
+            cat = cat_values[start]
+            part_ranges[(ts, cat)] = (start, stop)
+            first = cat_ranges.get(cat, (start, stop))[0]
+            cat_ranges[cat] = (first, stop)
+        self.table, self.vocab = table, np.asarray(vocab, dtype=object)
+        self._cat_ranges, self._part_ranges = cat_ranges, part_ranges
+        self._search = None
+
+    def search(self, pattern: str, exact: bool = False) -> np.ndarray:
+        """
+        id тегов куба, совпадающих с pattern (см. TagSearchIndex.search).
+        Индекс строится при первом поиске после обновления куба.
+        """
+        if self._search is None:
+            self._search = TagSearchIndex(self.vocab)
+        return self._search.search(pattern, exact=exact)
+
+    def raw(self, snapshot_ts, category_id=None) -> pd.DataFrame:
+        """
+        Сырые агрегаты по тегам для снапшота и категории (None — все категории).
+        """
+        cat = ALL_CATEGORIES if category_id is None else str(category_id)
+        start, stop = self._part_ranges.get((pd.Timestamp(snapshot_ts), cat), (0, 0))
+        return self.table.iloc[start:stop]
+
+    def metrics(self, snapshot_ts, category_id=None, min_videos_per_tag: int = 1) -> pd.DataFrame:
+        """
+        То же, что compute_tag_metrics_for_df_slice для этого среза, но из куба.
+        """
+        tag_agg = self.raw(snapshot_ts, category_id)
+        if tag_agg.empty:
+            return pd.DataFrame()
+        tag_agg = tag_agg.drop(
+            columns=["snapshot_ts", "category_id", "tag_id"]
+        ).reset_index(drop=True)
+        return classify_tag_metrics(tag_agg, min_videos_per_tag)
+
+    def history(self, tag_ids, category_id=None, min_videos_per_tag: int = 1) -> pd.DataFrame:
+        """
+        Агрегаты тегов tag_ids по всем снапшотам одной категории
+        (None — все категории) с freshness; строки по снапшоту и тегу.
+        """
+        cat = ALL_CATEGORIES if category_id is None else str(category_id)
+        start, stop = self._cat_ranges.get(cat, (0, 0))
+        rows = self.table.iloc[start:stop]
+        rows = rows[
+            np.isin(rows["tag_id"].to_numpy(), tag_ids)
+            & (rows["videos_cnt"] >= min_videos_per_tag).to_numpy()
+        ].copy()
+        rows["freshness"] = rows["fresh_videos"] / rows["videos_cnt"]
+        return rows.reset_index(drop=True)
+
+
+@profiled()
+def explode_tags_for_growth(
+    df_growth: pd.DataFrame,
+    tag_index: TagIndex = None,
+    weighting: str = "full",
+) -> pd.DataFrame:
+    """
+    Берём таблицу с ростом видео между снапшотами и смотрим,
+    какие теги набрали больше всего дополнительных просмотров.
+
+    tag_index — теги датасета (индекс df_growth — строки позднего снапшота);
+    без него теги берутся из колонки all_tags_uniq_t2.
+
+    weighting — как засчитывать прирост видео его тегам:
+      - "full": каждому тегу весь views_delta видео;
+      - "split": views_delta делится поровну между тегами видео.
+
+    Колонки: tag, views_delta (сумма), videos_cnt (сколько видео с тегом),
+    views_delta_mean (средний засчитанный прирост на видео).
+    Пары (видео, тег) берутся из CSR-индекса, суммы — np.bincount.
+    """
+    if weighting not in ("full", "split"):
+        raise ValueError(f"Неизвестный weighting: {weighting!r}")
+    if df_growth.empty:
+        return pd.DataFrame()
+
+    if tag_index is not None:
+        owner, tag_ids = tag_index.explode(df_growth.index.to_numpy())
+        vocab = tag_index.vocab
+    elif "all_tags_uniq_t2" in df_growth.columns:
+        growth_tags = TagIndex.from_json(df_growth["all_tags_uniq_t2"])
+        owner, tag_ids = growth_tags.explode(np.arange(len(df_growth)))
+        vocab = growth_tags.vocab
+    else:
+        return pd.DataFrame()
+    if len(tag_ids) == 0:
+        return pd.DataFrame()
+
+    delta = df_growth["views_delta"].to_numpy()
+    weights = delta[owner].astype(np.float64)
+    if weighting == "split":
+        tags_per_video = np.bincount(owner, minlength=len(df_growth))
+        weights = weights / tags_per_video[owner]
+
+    used, tag_codes = np.unique(tag_ids, return_inverse=True)
+    views_delta = np.bincount(tag_codes, weights=weights, minlength=len(used))
+    if weighting == "full" and delta.dtype.kind in "iu":
+        views_delta = np.rint(views_delta).astype(np.int64)
+    videos_cnt = np.bincount(tag_codes, minlength=len(used)).astype(np.int64)
+
+    agg = pd.DataFrame(
+        {
+            "tag": vocab[used],
+            "views_delta": views_delta,
+            "videos_cnt": videos_cnt,
+            "views_delta_mean": views_delta / videos_cnt,
+        }
+    )
+    return agg.sort_values("views_delta", ascending=False)
@@ -0,0 +1,211 @@
+"""
+Замеры стадий одного перезапуска (rerun) приложения или пакетного задания.
+
+Включаются явно: start_rerun() делает профайлер активным в текущем потоке,
+stage() и @profiled отмечают стадии (вложенные стадии — с отступом),
+finish_rerun() возвращает разбивку. Пока профайлер не запущен, stage()
+ничего не делает, поэтому отметки можно оставлять в коде движка.
+
+Каждая стадия и итог перезапуска пишутся в лог yt_radar.profile
+одной JSON-строкой. С cprofile=True весь перезапуск идёт под cProfile,
+и самый медленный за время жизни процесса сохраняется в PROFILE_DIR.
+"""
+
+import cProfile
+import functools
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+import pandas as pd
+
+from .settings import PROFILE_DIR
+
+logger = logging.getLogger("yt_radar.profile")
+
+_local = threading.local()
+_slowest_lock = threading.Lock()
+_slowest = {"seconds": 0.0, "label": None, "path": None}
+_rerun_ids = iter(range(1, 1 << 62))
+
+
+def configure_logging():
+    """
+    Без настроенного логирования INFO-строки теряются: вешаем свой
+    обработчик на stderr, если его ещё нет.
+    """
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(name)s %(message)s"))
+        logger.addHandler(handler)
+        logger.propagate = False
+    logger.setLevel(logging.INFO)
+
+
+class RerunProfiler:
+    """
+    Стадии одного перезапуска: имя, глубина вложенности, начало и длительность.
+    """
+
+    def __init__(self, label: str, cprofile: bool = False):
+        self.rerun_id = next(_rerun_ids)
+        self.label = label
+        self.started_at = datetime.now()
+        self.records = []
+        self._depth = 0
+        self._t0 = time.perf_counter()
+        self._profile = None
+        if cprofile:
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                # другой профайлер уже включён (Python 3.12+) — без cProfile
+                profile = None
+            self._profile = profile
+
+    @contextmanager
+    def stage(self, name: str):
+        record = {
+            "stage": name,
+            "depth": self._depth,
+            "start_ms": (time.perf_counter() - self._t0) * 1000.0,
+            "ms": None,
+        }
+        self.records.append(record)
+        self._depth += 1
+        t = time.perf_counter()
+        try:
+            yield record
+        finally:
+            self._depth -= 1
+            record["ms"] = (time.perf_counter() - t) * 1000.0
+            logger.info(json.dumps({
+                "event": "stage",
+                "rerun": self.rerun_id,
+                "label": self.label,
+                "stage": name,
+                "depth": record["depth"],
+                "ms": round(record["ms"], 2),
+            }, ensure_ascii=False))
+
+    def stop_cprofile(self):
+        if self._profile is not None:
+            self._profile.disable()
+
+    def finish(self) -> dict:
+        """
+        Итог перезапуска: общее время и таблица стадий (stage, depth,
+        start_ms, ms, share — доля от общего времени).
+        """
+        total_ms = (time.perf_counter() - self._t0) * 1000.0
+        self.stop_cprofile()
+        stages = pd.DataFrame(self.records, columns=["stage", "depth", "start_ms", "ms"])
+        # стадии, прерванные исключением или st.stop(), считаем до конца
+        stages["ms"] = stages["ms"].fillna(total_ms - stages["start_ms"])
+        stages["share"] = stages["ms"] / total_ms if total_ms else 0.0
+        summary = {
+            "rerun": self.rerun_id,
+            "label": self.label,
+            "started_at": self.started_at,
+            "total_ms": total_ms,
+            "stages": stages,
+            "cprofile_path": self._dump_if_slowest(total_ms),
+        }
+        top_level = stages[stages["depth"] == 0]
+        logger.info(json.dumps({
+            "event": "rerun",
+            "rerun": self.rerun_id,
+            "label": self.label,
+            "total_ms": round(total_ms, 2),
+            "stages": dict(zip(top_level["stage"], top_level["ms"].round(2))),
+        }, ensure_ascii=False))
+        return summary
+
+    def _dump_if_slowest(self, total_ms: float):
+        if self._profile is None:
+            return None
+        seconds = total_ms / 1000.0
+        with _slowest_lock:
+            if seconds <= _slowest["seconds"]:
+                return None
+            directory = PROFILE_DIR or os.path.join(tempfile.gettempdir(), "yt_radar_profile")
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, "slowest_rerun.prof")
+            self._profile.dump_stats(path)
+            _slowest.update(seconds=seconds, label=self.label, path=path)
+        return path
+
+
+def start_rerun(label: str, cprofile: bool = False) -> RerunProfiler:
+    """
+    Начинаем замер перезапуска в текущем потоке. Незавершённый
+    предыдущий (например, после st.stop()) молча выбрасываем.
+    """
+    discard_rerun()
+    profiler = RerunProfiler(label, cprofile=cprofile)
+    _local.profiler = profiler
+    return profiler
+
+
+def active_profiler():
+    return getattr(_local, "profiler", None)
+
+
+def finish_rerun():
+    """
+    Завершаем замер текущего потока; None, если он не был запущен.
+    """
+    profiler = active_profiler()
+    if profiler is None:
+        return None
+    _local.profiler = None
+    return profiler.finish()
+
+
+def discard_rerun():
+    profiler = active_profiler()
+    if profiler is not None:
+        profiler.stop_cprofile()
+        _local.profiler = None
+
+
+def stage(name: str):
+    """
+    Отметка стадии: with stage("..."): ... Без активного профайлера — пустышка.
+    """
+    profiler = active_profiler()
+    if profiler is None:
+        return nullcontext()
+    return profiler.stage(name)
+
+
+def profiled(name: str = None):
+    """
+    Декоратор: вызов функции — стадия с её именем (или name).
+    """
+    def decorate(func):
+        stage_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            profiler = active_profiler()
+            if profiler is None:
+                return func(*args, **kwargs)
+            with profiler.stage(stage_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def slowest_rerun() -> dict:
+    """
+    Самый медленный перезапуск под cProfile за время жизни процесса.
+    """
+    with _slowest_lock:
+        return dict(_slowest)
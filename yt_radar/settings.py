@@ -0,0 +1,45 @@
+"""
+Настройки движка: папки, число воркеров, размеры кэшей.
+Всё, что зависит от окружения, задаётся переменными YT_RADAR_*.
+"""
+
+import os
+
+
+DEFAULT_SNAP_DIR = os.getenv(
+    "YT_RADAR_DATA_DIR",
+    "snapshots_raw",  # папка внутри проекта, рядом с app.py
+)
+# куда складывать колоночное хранилище обработанных снапшотов;
+# по умолчанию — в скрытую папку рядом с CSV
+STORE_DIR = os.getenv("YT_RADAR_STORE_DIR")
+STORE_DIRNAME = ".yt_radar_store"
+# сколько процессов разбирают CSV при загрузке в пакетных заданиях
+# (0 — по числу ядер, 1 — без пула); приложение разбирает их в одном процессе
+INGEST_WORKERS = int(os.getenv("YT_RADAR_INGEST_WORKERS", "0"))
+
+# сколько часов считаем видео "свежим" по умолчанию
+DEFAULT_FRESH_HOURS = 72.0
+
+# сохранять собранный датасет рядом с хранилищем и поднимать его
+# при перезапуске, если файлы не менялись (0 — выключить)
+WARM_START = os.getenv("YT_RADAR_WARM_START", "1") != "0"
+
+# сколько наборов сырых тегов строки (с готовым all_tags_uniq) помнит
+# кэш очищенных тегов в памяти
+TAG_SETS_CACHE_MAX = int(os.getenv("YT_RADAR_TAG_SETS_CACHE", "20000"))
+
+# сколько кубов метрик по тегам (разные fresh_hours) держим в памяти
+TAG_CUBES_MAX = 4
+
+# кэш результатов расчётов для виджетов: не больше стольких записей
+# и примерно стольких мегабайт (самые давно не нужные выкидываем)
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("YT_RADAR_RESULT_CACHE_ENTRIES", "128"))
+RESULT_CACHE_MAX_MB = float(os.getenv("YT_RADAR_RESULT_CACHE_MB", "256"))
+
+# замеры стадий каждого перезапуска приложения (лог yt_radar.profile
+# и таблица в боковой панели); можно включить и переключателем в панели
+PROFILE = os.getenv("YT_RADAR_PROFILE", "0") != "0"
+# куда сохранять cProfile самого медленного перезапуска
+# (по умолчанию — yt_radar_profile во временной папке)
+PROFILE_DIR = os.getenv("YT_RADAR_PROFILE_DIR")
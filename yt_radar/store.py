@@ -0,0 +1,416 @@
+"""
+Чтение CSV-снапшотов и колоночное хранилище уже разобранных файлов.
+"""
+
+import os
+import re
+import json
+import hashlib
+import itertools
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from .settings import INGEST_WORKERS, STORE_DIR, STORE_DIRNAME
+from .tags import TAG_RULES_VERSION, TagCleanCache, build_all_tags_uniq
+
+
+FNAME_RE = re.compile(r"ytcat_(?P<cat>\d+)_(?P<date>\d{8})_(?P<time>\d{6})\.csv")
+
+# версия формата колоночного хранилища: при изменении формата или
+# логики обработки файлов хранилище пересобирается целиком
+STORE_FORMAT_VERSION = 1
+
+# колонки, которые хранилище отдаёт всегда, какие бы колонки ни просили
+STORE_KEY_COLUMNS = ("snapshot_file", "snapshot_ts", "category_id")
+
+# колонки, которых хватает всем страницам приложения
+# (без description и сырых колонок с тегами)
+SNAPSHOT_COLUMNS = (
+    "video_id",
+    "title",
+    "channel_title",
+    "category_name",
+    "views",
+    "views_per_hour",
+    "from_shorts",
+    "duration_sec",
+    "published_at",
+    "all_tags_uniq",
+)
+
+
+def parse_snapshot_ts_from_name(filename: str):
+    """
+    Имя файла вида ytcat_{catid}_{YYYYMMDD}_{HHMMSS}.csv
+    Превращаем дату+время в datetime.
+    """
+    m = FNAME_RE.match(filename)
+    if not m:
+        return None
+    date_str = m.group("date")
+    time_str = m.group("time")
+    dt = datetime.strptime(date_str + time_str, "%Y%m%d%H%M%S")
+    return dt
+
+
+def read_snapshot_file(fpath: str, tag_cache: TagCleanCache = None):
+    """
+    Читаем один файл ytcat_*.csv и сразу доводим его до вида,
+    в котором он лежит в хранилище: snapshot_ts, category_id, all_tags_uniq.
+
+    Возвращаем None, если имя файла не похоже на снапшот или файл не читается.
+    """
+    fname = os.path.basename(fpath)
+    snap_ts = parse_snapshot_ts_from_name(fname)
+    if snap_ts is None:
+        return None
+
+    try:
+        df = pd.read_csv(fpath)
+    except Exception as e:
+        print(f"Не удалось прочитать {fpath}: {e}")
+        return None
+
+    df["snapshot_file"] = fname
+    df["snapshot_ts"] = pd.Timestamp(snap_ts)
+
+    if "category_id" not in df.columns:
+        m = FNAME_RE.match(fname)
+        if m:
+            df["category_id"] = m.group("cat")
+
+    if "category_id" in df.columns:
+        df["category_id"] = df["category_id"].astype(str)
+        if "category_name" not in df.columns:
+            df["category_name"] = df["category_id"]
+
+    # собрать и почистить теги
+    return build_all_tags_uniq(df, tag_cache)
+
+
+def resolve_ingest_workers(workers, n_files: int) -> int:
+    """
+    Сколько процессов реально запускать для разбора n_files файлов.
+    workers=None — берём INGEST_WORKERS, а если он 0 — число ядер.
+    """
+    if workers is None:
+        workers = INGEST_WORKERS or os.cpu_count() or 1
+    return max(1, min(int(workers), n_files))
+
+
+def _read_snapshot_file_in_worker(fpath: str, known_tags: dict = None):
+    """
+    read_snapshot_file внутри воркера пула. known_tags — копия словаря
+    кэша очищенных тегов; вместе с таблицей отдаём выученные воркером
+    теги и счётчики кэша, чтобы их не потерять.
+    """
+    if known_tags is None:
+        return read_snapshot_file(fpath), {}, 0, 0
+    cache = TagCleanCache()
+    cache.tags = known_tags
+    df = read_snapshot_file(fpath, cache)
+    return df, cache.take_new(), cache.hits, cache.misses
+
+
+def _pool_context():
+    """
+    Контекст для пула воркеров. fork не берём: приложение многопоточное
+    (Streamlit), и дочерний процесс может унаследовать чужую захваченную
+    блокировку. forkserver форкает чистый процесс, в котором уже
+    импортирован yt_radar; где его нет — spawn.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        ctx = multiprocessing.get_context("forkserver")
+        ctx.set_forkserver_preload([__name__])
+        return ctx
+    return multiprocessing.get_context("spawn")
+
+
+def parse_snapshot_files(fpaths, workers=None, tag_cache: TagCleanCache = None) -> list:
+    """
+    Разбираем несколько файлов ytcat_*.csv.
+
+    При нескольких воркерах каждый файл целиком (CSV, snapshot_ts, category_id,
+    очистка тегов) обрабатывается в отдельном процессе. Результаты возвращаются
+    в том же порядке, что и fpaths, поэтому итог совпадает с последовательным
+    разбором. tag_cache воркеры получают копией, а новые теги из них
+    вливаются обратно.
+    """
+    fpaths = list(fpaths)
+    workers = resolve_ingest_workers(workers, len(fpaths))
+    if workers <= 1:
+        return [read_snapshot_file(fpath, tag_cache) for fpath in fpaths]
+
+    known_tags = tag_cache.tags if tag_cache is not None else None
+    with ProcessPoolExecutor(max_workers=workers, mp_context=_pool_context()) as pool:
+        results = list(
+            pool.map(
+                _read_snapshot_file_in_worker,
+                fpaths,
+                itertools.repeat(known_tags),
+                chunksize=max(1, len(fpaths) // (workers * 4)),
+            )
+        )
+
+    frames = []
+    for df, learned, hits, misses in results:
+        if tag_cache is not None:
+            tag_cache.merge(learned, hits, misses)
+        frames.append(df)
+    return frames
+
+
+def file_content_hash(raw: bytes) -> str:
+    """
+    Хэш содержимого файла — по нему понимаем, что файл реально поменялся,
+    а не просто был перезаписан тем же самым.
+    """
+    return hashlib.sha1(raw).hexdigest()
+
+
+def scan_snapshot_files(directory: str) -> dict:
+    """
+    Текущее состояние папки: имя файла → (size, mtime) для всех ytcat_*.csv.
+    """
+    if not os.path.isdir(directory):
+        raise FileNotFoundError(f"Папка '{directory}' не найдена")
+
+    files = {}
+    for fname in os.listdir(directory):
+        if not fname.endswith(".csv"):
+            continue
+        if parse_snapshot_ts_from_name(fname) is None:
+            continue
+        st_res = os.stat(os.path.join(directory, fname))
+        files[fname] = (st_res.st_size, st_res.st_mtime_ns)
+    return files
+
+
+class SnapshotStore:
+    """
+    Колоночное хранилище обработанных снапшотов.
+
+    Каждый ytcat_*.csv один раз превращается в типизированный parquet-файл
+    с уже посчитанной колонкой all_tags_uniq. Манифест (имя → size, mtime, sha1)
+    лежит рядом, поэтому после перезапуска CSV повторно не парсятся,
+    а читать можно только нужные колонки.
+
+    Если store_dir не задан, обработанные файлы держим в памяти.
+    workers — сколько процессов разбирают CSV (None — см. INGEST_WORKERS).
+    """
+
+    def __init__(self, directory: str, store_dir: str = None, workers=None):
+        self.directory = directory
+        self.store_dir = store_dir
+        self.workers = workers
+        self.manifest = {}
+        self._frames = {}
+        self._lock = threading.Lock()
+        self.tag_cache = TagCleanCache()
+
+        if self.store_dir is not None:
+            os.makedirs(self.store_dir, exist_ok=True)
+            self.manifest = self._load_manifest()
+            self.tag_cache = TagCleanCache(os.path.join(self.store_dir, "tag_cache.json"))
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.store_dir, "manifest.json")
+
+    def _load_manifest(self) -> dict:
+        try:
+            with open(self.manifest_path, encoding="utf-8") as f:
+                payload = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if payload.get("version") != STORE_FORMAT_VERSION:
+            return {}
+        # очищенные теги в parquet посчитаны по старым правилам
+        if payload.get("tag_rules") != TAG_RULES_VERSION:
+            return {}
+        files = payload.get("files", {})
+        # parquet могли удалить руками — такие записи забываем
+        return {
+            fname: entry
+            for fname, entry in files.items()
+            if os.path.exists(self._part_path(fname))
+        }
+
+    def _save_manifest(self):
+        payload = {
+            "version": STORE_FORMAT_VERSION,
+            "tag_rules": TAG_RULES_VERSION,
+            "files": self.manifest,
+        }
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _part_path(self, fname: str) -> str:
+        return os.path.join(self.store_dir, os.path.splitext(fname)[0] + ".parquet")
+
+    def _write_part(self, fname: str, df: pd.DataFrame):
+        if self.store_dir is None:
+            self._frames[fname] = df
+            return
+        path = self._part_path(fname)
+        tmp_path = path + ".tmp"
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+
+    def _drop_part(self, fname: str):
+        self._frames.pop(fname, None)
+        if self.store_dir is not None:
+            try:
+                os.remove(self._part_path(fname))
+            except FileNotFoundError:
+                pass
+
+    def _forget(self, fname: str) -> bool:
+        """
+        Убираем файл из хранилища и манифеста; True — если он там был.
+        """
+        if fname not in self.manifest:
+            return False
+        self._drop_part(fname)
+        del self.manifest[fname]
+        return True
+
+    def compact(self) -> dict:
+        """
+        Переводим новые и изменившиеся CSV в хранилище, удаляем пропавшие.
+        Возвращаем статистику: сколько файлов добавлено, изменено, удалено,
+        сколько сырых тегов нашлось в кэше очистки (tag_hits / tag_misses)
+        и какие файлы не удалось прочитать (failed). Старые строки такого
+        файла из хранилища убираются: лучше без файла, чем с устаревшим.
+        """
+        with self._lock:
+            return self._compact_locked()
+
+    def _compact_locked(self) -> dict:
+        files = scan_snapshot_files(self.directory)
+        stats = {"added": 0, "changed": 0, "removed": 0, "unchanged": 0, "failed": []}
+        dirty = False
+        to_parse = []
+        hits, misses = self.tag_cache.hits, self.tag_cache.misses
+
+        for fname in sorted(files):
+            size, mtime = files[fname]
+            entry = self.manifest.get(fname)
+            if entry is not None and entry["size"] == size and entry["mtime"] == mtime:
+                stats["unchanged"] += 1
+                continue
+
+            fpath = os.path.join(self.directory, fname)
+            try:
+                with open(fpath, "rb") as f:
+                    digest = file_content_hash(f.read())
+            except OSError as e:
+                print(f"Не удалось прочитать {fpath}: {e}")
+                stats["failed"].append(fname)
+                dirty = self._forget(fname) or dirty
+                continue
+            dirty = True
+
+            if entry is not None and entry["sha1"] == digest:
+                # файл перезаписали тем же содержимым — хранилище не трогаем
+                entry["size"], entry["mtime"] = size, mtime
+                stats["unchanged"] += 1
+                continue
+
+            to_parse.append((fname, size, mtime, digest))
+
+        parsed = parse_snapshot_files(
+            [os.path.join(self.directory, item[0]) for item in to_parse],
+            workers=self.workers,
+            tag_cache=self.tag_cache,
+        )
+        stats["tag_hits"] = self.tag_cache.hits - hits
+        stats["tag_misses"] = self.tag_cache.misses - misses
+        for (fname, size, mtime, digest), df in zip(to_parse, parsed):
+            if df is None:
+                stats["failed"].append(fname)
+                self._forget(fname)
+                continue
+
+            stats["changed" if fname in self.manifest else "added"] += 1
+            self._write_part(fname, df)
+            self.manifest[fname] = {
+                "size": size,
+                "mtime": mtime,
+                "sha1": digest,
+                "rows": int(len(df)),
+            }
+
+        for fname in [f for f in self.manifest if f not in files]:
+            self._forget(fname)
+            stats["removed"] += 1
+            dirty = True
+
+        if dirty and self.store_dir is not None:
+            self._save_manifest()
+        try:
+            self.tag_cache.save()
+        except OSError as e:
+            print(f"Не удалось сохранить кэш тегов: {e}")
+        return stats
+
+    def read(self, fnames, columns=None) -> pd.DataFrame:
+        """
+        Читаем обработанные строки указанных файлов.
+        columns — какие колонки нужны (None — все); служебные
+        snapshot_file / snapshot_ts / category_id читаются всегда.
+        """
+        if columns is not None:
+            columns = list(dict.fromkeys(list(STORE_KEY_COLUMNS) + list(columns)))
+
+        dfs = []
+        for fname in fnames:
+            if self.store_dir is None:
+                df = self._frames[fname]
+                if columns is not None:
+                    df = df[[c for c in columns if c in df.columns]]
+            else:
+                path = self._part_path(fname)
+                if columns is not None:
+                    present = set(pq.read_schema(path).names)
+                    df = pd.read_parquet(
+                        path, columns=[c for c in columns if c in present]
+                    )
+                else:
+                    df = pd.read_parquet(path)
+            dfs.append(df)
+
+        if not dfs:
+            return pd.DataFrame()
+        full = pd.concat(dfs, ignore_index=True)
+        full["snapshot_date"] = full["snapshot_ts"].dt.date
+        full["snapshot_time"] = full["snapshot_ts"].dt.time
+        return full
+
+
+def default_store_dir(directory: str) -> str:
+    """
+    Куда класть колоночное хранилище для папки со снапшотами.
+    """
+    if STORE_DIR:
+        return os.path.join(STORE_DIR, hashlib.sha1(directory.encode()).hexdigest()[:12])
+    return os.path.join(directory, STORE_DIRNAME)
+
+
+def open_snapshot_store(directory: str, workers=None) -> SnapshotStore:
+    """
+    Открываем хранилище на диске; если писать некуда — держим его в памяти.
+    workers — как в SnapshotStore.
+    """
+    try:
+        return SnapshotStore(directory, default_store_dir(directory), workers=workers)
+    except OSError as e:
+        print(f"Хранилище для '{directory}' недоступно, работаем в памяти: {e}")
+        return SnapshotStore(directory, workers=workers)
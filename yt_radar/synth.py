@@ -0,0 +1,291 @@
+"""
+Генератор синтетических снапшотов для нагрузочных проверок.
+
+Пишет файлы ytcat_{cat}_{YYYYMMDD}_{HHMMSS}.csv с той же схемой колонок,
+что и настоящий сборщик, чтобы загрузку, очистку тегов и радар можно было
+прогнать на объёмах в 10–1000 раз больше реальных:
+
+- теги берутся из словаря с распределением Ципфа (у каждой категории
+  своя «голова», плюс общая для всех), кириллица и латиница вперемешку,
+  с регистром, # и мусорными тегами — чтобы работала очистка;
+- видео живут в трендах несколько снапшотов подряд, просмотры растут
+  с возрастом ролика;
+- доля shorts и длительности похожи на реальные данные.
+"""
+
+import os
+import json
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+# категории и названия — как в реальных выгрузках
+SYNTH_CATEGORIES = {
+    1: "Film & Animation",
+    2: "Autos & Vehicles",
+    10: "Music",
+    15: "Pets & Animals",
+    17: "Sports",
+    20: "Gaming",
+    22: "People & Blogs",
+    23: "Comedy",
+    24: "Entertainment",
+    25: "News & Politics",
+    26: "Howto & Style",
+    28: "Science & Technology",
+}
+
+# порядок колонок настоящего CSV
+SNAPSHOT_CSV_COLUMNS = [
+    "video_id",
+    "title",
+    "description",
+    "channel_title",
+    "tags_api_raw",
+    "views",
+    "views_per_hour",
+    "from_shorts",
+    "duration_sec",
+    "published_at",
+    "category_id",
+    "using_fallback",
+    "category_name",
+    "hashtags_extracted",
+    "tags_common",
+    "tags_only_api",
+    "tags_only_hash",
+]
+
+# самые частые теги словаря: часть из них — стоп-теги, которые
+# очистка должна выкидывать
+HEAD_TAGS = [
+    "shorts", "#shorts", "youtube", "funny", "music", "музыка", "minecraft",
+    "майнкрафт", "приколы", "юмор", "game", "games", "тренды", "new", "viral",
+    "рек", "рекомендации", "fyp", "edit", "football", "футбол", "news", "новости",
+]
+
+LATIN_SYLLABLES = [
+    "ka", "mi", "ro", "ta", "ne", "lo", "vi", "sa", "po", "de", "ri", "mu",
+    "ga", "le", "zo", "bi", "na", "to", "shi", "ven", "mar", "kin", "tor", "lex",
+]
+CYRILLIC_SYLLABLES = [
+    "ка", "ми", "ро", "та", "не", "ло", "ви", "са", "по", "де", "ри", "му",
+    "га", "ле", "зо", "би", "на", "то", "ши", "вен", "мар", "кин", "тор", "лекс",
+]
+
+VIDEO_ID_ALPHABET = np.array(
+    list("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_")
+)
+
+
+def make_tag_vocab(size: int, rng: np.random.Generator, cyrillic_share: float = 0.6) -> list:
+    """
+    Словарь из size тегов: сначала HEAD_TAGS, дальше слова из слогов
+    (1–3 слова в теге), кириллица с долей cyrillic_share.
+    """
+    vocab = list(HEAD_TAGS[:size])
+    seen = set(vocab)
+    while len(vocab) < size:
+        syllables = CYRILLIC_SYLLABLES if rng.random() < cyrillic_share else LATIN_SYLLABLES
+        n_words = rng.choice([1, 1, 1, 2, 2, 3])
+        words = [
+            "".join(rng.choice(syllables, size=rng.integers(2, 5)))
+            for _ in range(n_words)
+        ]
+        tag = " ".join(words)
+        if tag not in seen:
+            seen.add(tag)
+            vocab.append(tag)
+    return vocab
+
+
+def zipf_cdf(size: int, exponent: float) -> np.ndarray:
+    """
+    Накопленные вероятности рангов 1..size при p(rank) ~ rank^-exponent.
+    """
+    weights = np.arange(1, size + 1, dtype=np.float64) ** -exponent
+    cdf = np.cumsum(weights)
+    return cdf / cdf[-1]
+
+
+class _CategoryStream:
+    """
+    Тренды одной категории: какие видео сейчас в выдаче и их параметры.
+    """
+
+    def __init__(self, cat_id: int, vocab_size: int, rng: np.random.Generator):
+        self.cat_id = cat_id
+        # своя «голова» словаря у категории: перестановка рангов
+        self.rank_to_tag = rng.permutation(vocab_size)
+        self.videos = []
+
+
+def _random_video_ids(n: int, rng: np.random.Generator) -> list:
+    codes = rng.integers(0, len(VIDEO_ID_ALPHABET), size=(n, 11))
+    return ["".join(row) for row in VIDEO_ID_ALPHABET[codes]]
+
+
+def _draw_tags(count: int, stream: _CategoryStream, cdf: np.ndarray,
+               local_share: float, rng: np.random.Generator) -> np.ndarray:
+    ranks = np.searchsorted(cdf, rng.random(count))
+    local = rng.random(count) < local_share
+    return np.where(local, stream.rank_to_tag[ranks], ranks)
+
+
+def _decorate_api_tag(tag: str, rng: np.random.Generator) -> str:
+    """
+    Сырые теги из API бывают с заглавными буквами, # и пробелами по краям.
+    """
+    roll = rng.random()
+    if roll < 0.15:
+        return tag.title()
+    if roll < 0.2:
+        return "#" + tag
+    if roll < 0.23:
+        return f" {tag} "
+    return tag
+
+
+def _new_video(stream: _CategoryStream, now: datetime, vocab: list, cdf: np.ndarray,
+               shorts_share: float, local_share: float, channels: list,
+               rng: np.random.Generator) -> dict:
+    is_short = rng.random() < shorts_share
+    if is_short:
+        duration = int(np.clip(rng.lognormal(3.4, 0.6), 10, 180))
+    else:
+        duration = int(np.clip(rng.lognormal(6.2, 1.3), 61, 43000))
+    # в тренд попадают ролики возрастом от нескольких часов до недель
+    age_hours = 3.0 + rng.exponential(110.0)
+    published = now - timedelta(hours=float(age_hours))
+
+    n_api = 0 if rng.random() < 0.6 else int(np.clip(rng.lognormal(2.6, 0.6), 1, 100))
+    n_hash = 0 if rng.random() < 0.45 else int(np.clip(rng.lognormal(1.2, 0.8), 1, 300))
+    api = [vocab[i] for i in dict.fromkeys(_draw_tags(n_api, stream, cdf, local_share, rng))]
+    hashtags = [
+        vocab[i].replace(" ", "")
+        for i in dict.fromkeys(_draw_tags(n_hash, stream, cdf, local_share, rng))
+    ]
+    if is_short and "shorts" not in hashtags and rng.random() < 0.5:
+        hashtags.append("shorts")
+    # часть хэштегов совпадает с тегами API — отсюда tags_common
+    if api and hashtags and rng.random() < 0.3:
+        hashtags.append(api[0].replace(" ", ""))
+    hashtags = list(dict.fromkeys(hashtags))
+
+    title_words = [vocab[i] for i in _draw_tags(rng.integers(2, 6), stream, cdf, local_share, rng)]
+    title = " ".join(title_words).capitalize()
+    if hashtags and rng.random() < 0.4:
+        title += " " + " ".join("#" + h for h in hashtags[:3])
+    description = None
+    if rng.random() >= 0.43:
+        description = title
+        if hashtags:
+            description += "\n\n" + " ".join("#" + h for h in hashtags)
+
+    return {
+        "video_id": _random_video_ids(1, rng)[0],
+        "title": title,
+        "description": description,
+        "channel_title": channels[rng.integers(len(channels))],
+        "api": [_decorate_api_tag(t, rng) for t in api],
+        "hashtags": hashtags,
+        "from_shorts": int(is_short),
+        "duration_sec": duration,
+        "published": published,
+        # просмотры растут как rate * age^growth
+        "rate": float(rng.lognormal(8.5, 1.5)),
+        "growth": float(rng.uniform(0.6, 1.0)),
+    }
+
+
+def _video_row(video: dict, now: datetime, cat_id: int) -> dict:
+    age_hours = max((now - video["published"]).total_seconds() / 3600.0, 1.0)
+    views = int(video["rate"] * age_hours ** video["growth"])
+    api_clean = {t.strip().lstrip("#").lower() for t in video["api"]}
+    hashtags = set(video["hashtags"])
+    common = api_clean & hashtags
+    return {
+        "video_id": video["video_id"],
+        "title": video["title"],
+        "description": video["description"],
+        "channel_title": video["channel_title"],
+        "tags_api_raw": json.dumps(video["api"], ensure_ascii=False),
+        "views": views,
+        "views_per_hour": views / age_hours,
+        "from_shorts": video["from_shorts"],
+        "duration_sec": video["duration_sec"],
+        "published_at": video["published"].strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "category_id": cat_id,
+        "using_fallback": 0,
+        "category_name": SYNTH_CATEGORIES[cat_id],
+        "hashtags_extracted": json.dumps(video["hashtags"], ensure_ascii=False),
+        "tags_common": json.dumps(sorted(common), ensure_ascii=False),
+        "tags_only_api": json.dumps(sorted(api_clean - common), ensure_ascii=False),
+        "tags_only_hash": json.dumps(sorted(hashtags - common), ensure_ascii=False),
+    }
+
+
+def generate_snapshots(
+    out_dir: str,
+    snapshots: int = 24,
+    interval_hours: float = 1.0,
+    categories: int = len(SYNTH_CATEGORIES),
+    videos_per_category: int = 150,
+    vocab_size: int = 20000,
+    zipf_exponent: float = 1.1,
+    persistence: float = 0.85,
+    shorts_share: float = 0.68,
+    start: str = "2025-01-01T00:00:00",
+    seed: int = 0,
+) -> dict:
+    """
+    Пишем snapshots × categories файлов ytcat_*.csv в out_dir.
+
+    persistence — вероятность, что видео останется в трендах
+    к следующему снапшоту (остальные места занимают новые ролики).
+    Возвращаем сводку: сколько файлов и строк, объём на диске, время.
+    """
+    t0 = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    os.makedirs(out_dir, exist_ok=True)
+
+    vocab = make_tag_vocab(vocab_size, rng)
+    cdf = zipf_cdf(len(vocab), zipf_exponent)
+    channels = [f"Channel {i}" for i in range(max(50, videos_per_category * 4))]
+    cat_ids = list(SYNTH_CATEGORIES)[:categories]
+    streams = [_CategoryStream(cat, len(vocab), rng) for cat in cat_ids]
+
+    now = datetime.fromisoformat(start)
+    files = rows = size = 0
+    for _ in range(snapshots):
+        stamp = now.strftime("%Y%m%d_%H%M%S")
+        for stream in streams:
+            keep = rng.random(len(stream.videos)) < persistence
+            stream.videos = [v for v, k in zip(stream.videos, keep) if k]
+            while len(stream.videos) < videos_per_category:
+                stream.videos.append(
+                    _new_video(stream, now, vocab, cdf, shorts_share, 0.5, channels, rng)
+                )
+            df = pd.DataFrame(
+                [_video_row(v, now, stream.cat_id) for v in stream.videos],
+                columns=SNAPSHOT_CSV_COLUMNS,
+            )
+            # в трендах ролики идут по убыванию скорости
+            df = df.sort_values("views_per_hour", ascending=False)
+            path = os.path.join(out_dir, f"ytcat_{stream.cat_id}_{stamp}.csv")
+            df.to_csv(path, index=False)
+            files += 1
+            rows += len(df)
+            size += os.path.getsize(path)
+        now += timedelta(hours=interval_hours)
+
+    return {
+        "out_dir": os.path.abspath(out_dir),
+        "files": files,
+        "rows": rows,
+        "mb": round(size / 1024 / 1024, 1),
+        "vocab_size": len(vocab),
+        "seconds": round(time.perf_counter() - t0, 2),
+    }
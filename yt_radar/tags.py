@@ -0,0 +1,666 @@
+"""
+Очистка тегов, кэш очищенных тегов и индексы тегов (CSR и триграммный поиск).
+"""
+
+import os
+import re
+import itertools
+import json
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from .settings import TAG_SETS_CACHE_MAX
+
+
+TAG_COLS = [
+    "tags_api_raw",
+    "hashtags_extracted",
+    "tags_common",
+    "tags_only_api",
+    "tags_only_hash",
+]
+
+STOP_TAGS = {
+    # общие англ.
+    "short", "shorts", "youtubeshorts",
+    "viral", "trend", "trending",
+    "fyp", "foryou", "reels",
+    "subscribe", "subscribenow", "sub",
+    "like", "likes", "likethis",
+    "follow", "followme",
+    "new", "news", "newvideo", "video", "videos",
+    "live", "stream",
+    "channel", "official", "tv",
+
+    # русские служебные
+    "шорт", "шортс", "шортсы",
+    "тренд", "тренды", "втренде",
+    "подписка", "подпишись", "подписаться",
+    "лайк", "лайки", "ставьлайк",
+    "рекомендации", "рекомендацииютуба",
+    "новое", "новинка", "новинкавидео", "видео",
+    "стрим", "прямойэфир",
+    "канал", "официальный",
+}
+
+EXTRA_STOP_SUBSTR = (
+    "official", "офишл", "офишлканал",
+    "channel", "канал",
+)
+
+# служебные символы, которые срезаем по краям тега
+TAG_EDGE_CHARS = "#@!*_•.- "
+
+# ревизия правил clean_tag / clean_tags: увеличить при любом изменении логики
+# очистки (стоп-списки учитываются в TAG_RULES_VERSION сами)
+TAG_CLEAN_RULES_REV = 1
+
+# для пакетной очистки: все стоп-подстроки одним регэкспом
+# и всё, что не «буква или цифра» в смысле str.isalnum
+EXTRA_STOP_RE = re.compile("|".join(re.escape(sub) for sub in EXTRA_STOP_SUBSTR))
+
+NON_ALNUM_RE = re.compile(r"[\W_]+")
+
+# символы, которые json.dumps экранирует даже при ensure_ascii=False
+JSON_ESCAPE_RE = re.compile(r'["\\\x00-\x1f]')
+
+
+def tag_rules_version() -> str:
+    """
+    Отпечаток текущих правил очистки тегов: ревизия логики и стоп-списки.
+    """
+    return hashlib.sha1(
+        json.dumps(
+            [TAG_CLEAN_RULES_REV, sorted(STOP_TAGS), list(EXTRA_STOP_SUBSTR), TAG_EDGE_CHARS],
+            ensure_ascii=False,
+        ).encode("utf-8")
+    ).hexdigest()[:16]
+
+
+# по отпечатку сбрасываются кэш очищенных тегов и хранилище,
+# если поменялись стоп-списки или сама логика
+TAG_RULES_VERSION = tag_rules_version()
+
+
+def clean_tag(raw_tag: str):
+    """
+    Чистим один тег.
+
+    Возвращаем:
+      - нормализованный тег (str), если он годится как тема;
+      - None, если это мусор, который не хотим видеть как тему.
+    """
+    if not isinstance(raw_tag, str):
+        return None
+
+    tag = raw_tag.strip().lower()
+
+    # убираем служебные символы по краям
+    while tag and tag[0] in TAG_EDGE_CHARS:
+        tag = tag[1:]
+    while tag and tag[-1] in TAG_EDGE_CHARS:
+        tag = tag[:-1]
+
+    if not tag:
+        return None
+
+    # очень короткий тег не берём
+    if len(tag) < 2:
+        return None
+
+    # чисто цифры не берём
+    if tag.isdigit():
+        return None
+
+    # если почти одни неалфанум, тоже не берём
+    alnum_count = sum(ch.isalnum() for ch in tag)
+    if alnum_count == 0:
+        return None
+    if alnum_count / len(tag) < 0.4:
+        return None
+
+    # стоп-слова
+    if tag in STOP_TAGS:
+        return None
+
+    # стоп-подстроки
+    for sub in EXTRA_STOP_SUBSTR:
+        if sub in tag:
+            return None
+
+    return tag
+
+
+def parse_tag_json(s):
+    """
+    Аккуратно парсим строку с тегами.
+    """
+    if not isinstance(s, str) or not s.strip():
+        return []
+    try:
+        val = json.loads(s)
+        if isinstance(val, list):
+            return [str(x).strip().lower() for x in val if str(x).strip()]
+        return [str(val).strip().lower()]
+    except Exception:
+        return [s.strip().lower()]
+
+
+def _count_alnum(tag: str) -> int:
+    # обычно в теге кроме букв и цифр только пробелы
+    words = tag.replace(" ", "")
+    if words.isalnum():
+        return len(words)
+    return len(NON_ALNUM_RE.sub("", tag))
+
+
+def clean_tags(raw_tags) -> pd.Series:
+    """
+    Пакетная версия clean_tag: чистим сразу весь набор тегов.
+
+    Правила те же, что в clean_tag, но проверки идут по всему набору:
+    регистр меняем сразу у склеенного текста всех тегов, EXTRA_STOP_SUBSTR
+    ищем одним проходом регэкспа по нему же, STOP_TAGS — поиском по
+    множеству. Возвращаем Series той же длины: очищенный тег или None.
+    """
+    raw = list(raw_tags)
+    try:
+        lowered = "\n".join(raw).lower().split("\n")
+    except TypeError:
+        lowered = None
+    if lowered is not None and len(lowered) == len(raw):
+        tags = [t.strip().strip(TAG_EDGE_CHARS) for t in lowered]
+    else:
+        # не строки или перевод строки внутри тега — по одному
+        tags = [
+            t.strip().lower().strip(TAG_EDGE_CHARS) if isinstance(t, str) else ""
+            for t in raw
+        ]
+    n = len(tags)
+    out = np.full(n, None, dtype=object)
+    if n == 0:
+        return pd.Series(out, dtype=object)
+
+    length = np.fromiter(map(len, tags), dtype=np.int64, count=n)
+    alnum_count = np.fromiter(
+        (len(t) if t.isalnum() else _count_alnum(t) for t in tags), dtype=np.int64, count=n
+    )
+
+    # стоп-подстроки: ищем по всем тегам разом, совпадение относим к тегу
+    # по его позиции в склеенном тексте
+    blob = "\n".join(tags)
+    ends = np.cumsum(length + 1) - 1
+    hits = np.fromiter(
+        (m.start() for m in EXTRA_STOP_RE.finditer(blob)), dtype=np.int64
+    )
+    has_stop_sub = np.zeros(n, dtype=bool)
+    has_stop_sub[np.searchsorted(ends, hits)] = True
+
+    # alnum_count / len >= 0.4 в целых числах
+    good = (length >= 2) & (alnum_count > 0) & (alnum_count * 5 >= length * 2) & ~has_stop_sub
+    kept = [
+        i for i in np.flatnonzero(good).tolist()
+        if not tags[i].isdigit() and tags[i] not in STOP_TAGS
+    ]
+    if kept:
+        out[kept] = [tags[i] for i in kept]
+    return pd.Series(out, dtype=object)
+
+
+def parse_tag_json_many(values) -> list:
+    """
+    Разбираем много JSON-строк с тегами сразу.
+
+    Обычно все строки — корректные JSON-списки, тогда они разбираются
+    одним вызовом json.loads, а элементы остаются как есть (их всё равно
+    нормализует clean_tags). Если хоть одна строка не разбирается —
+    каждую разбираем отдельно через parse_tag_json.
+    """
+    values = list(values)
+    try:
+        parsed = json.loads("[" + ",".join(values) + "]")
+    except (TypeError, ValueError):
+        parsed = None
+    # лишний или потерянный элемент даёт другую длину, строка
+    # не со списком — элемент не-список
+    if parsed is not None and len(parsed) == len(values) and set(map(type, parsed)) <= {list}:
+        return parsed
+    return [parse_tag_json(s) for s in values]
+
+
+class JsonStrings(dict):
+    """
+    Тег → json.dumps(тег, ensure_ascii=False); кодируем при первом обращении.
+    Строкам без кавычек, обратных слэшей и управляющих символов
+    достаточно добавить кавычки — json.dumps зовём только для остальных.
+    """
+
+    def __missing__(self, tag):
+        if JSON_ESCAPE_RE.search(tag):
+            value = json.dumps(tag, ensure_ascii=False)
+        else:
+            value = '"' + tag + '"'
+        self[tag] = value
+        return value
+
+
+class TagCleanCache:
+    """
+    Кэш «сырой тег → очищенный тег» (None — тег отброшен).
+
+    Одни и те же теги встречаются почти в каждом снапшоте, поэтому
+    clean_tags зовём только для тегов, которых ещё не видели. Кэш лежит
+    в хранилище рядом с манифестом и привязан к TAG_RULES_VERSION:
+    если поменялись стоп-списки или правила, старый кэш просто не читается.
+
+    Без path кэш живёт только в памяти процесса.
+
+    Кроме тегов, в памяти (не на диске) помним готовый all_tags_uniq для
+    наборов значений TAG_COLS: видео из прошлого снапшота приходит с теми же
+    сырыми тегами. Наборов не больше TAG_SETS_CACHE_MAX, при переполнении
+    забываем самые старые.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path
+        self.tags = {}
+        self.tag_sets = {}
+        self.json_strings = JsonStrings()
+        self.hits = 0
+        self.misses = 0
+        self._new = {}
+        if self.path is not None:
+            self.tags = self._load()
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                payload = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if payload.get("version") != TAG_RULES_VERSION:
+            return {}
+        return payload.get("tags", {})
+
+    def save(self):
+        """
+        Сохраняем кэш, если с прошлого сохранения появились новые теги.
+        """
+        if self.path is None or not self._new:
+            self._new = {}
+            return
+        payload = {"version": TAG_RULES_VERSION, "tags": self.tags}
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+        self._new = {}
+
+    def learn(self, raw_tags) -> dict:
+        """
+        Дочищаем теги, которых ещё нет в кэше (raw_tags — без повторов),
+        и возвращаем сам словарь «сырой тег → очищенный тег».
+        """
+        raw = list(raw_tags)
+        known = self.tags
+        todo = [t for t in raw if t not in known]
+        if todo:
+            learned = dict(zip(todo, clean_tags(todo).tolist()))
+            known.update(learned)
+            self._new.update(learned)
+        self.hits += len(raw) - len(todo)
+        self.misses += len(todo)
+        return known
+
+    def clean(self, raw_tags) -> np.ndarray:
+        """
+        То же, что clean_tags(raw_tags), но через кэш.
+        """
+        raw = list(raw_tags)
+        known = self.learn(raw)
+        out = np.empty(len(raw), dtype=object)
+        out[:] = [known[t] for t in raw]
+        return out
+
+    def remember_tag_sets(self, found: dict):
+        self.tag_sets.update(found)
+        overflow = len(self.tag_sets) - TAG_SETS_CACHE_MAX
+        if overflow > 0:
+            for key in list(itertools.islice(self.tag_sets, overflow)):
+                del self.tag_sets[key]
+
+    def take_new(self) -> dict:
+        """
+        Новые теги, выученные этим экземпляром (для передачи из воркера).
+        """
+        learned, self._new = self._new, {}
+        return learned
+
+    def merge(self, learned: dict, hits: int = 0, misses: int = 0):
+        """
+        Вливаем теги и счётчики, собранные в другом процессе.
+        """
+        self.tags.update(learned)
+        self._new.update(learned)
+        self.hits += hits
+        self.misses += misses
+
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+def _tag_sets_json(keys, tag_cache: TagCleanCache = None) -> dict:
+    """
+    all_tags_uniq для различных наборов значений TAG_COLS: набор (кортеж
+    сырых значений колонок, None — пусто) → JSON-строка.
+
+    Каждая различная JSON-строка колонки разбирается и каждый уникальный
+    сырой тег чистится и кодируется в JSON ровно один раз, дальше —
+    только поиск по словарям.
+    """
+    keys = list(keys)
+    if not keys:
+        return {}
+
+    col_parsed = []
+    for values in zip(*keys):
+        uniques = [v for v in dict.fromkeys(values) if v is not None]
+        col_parsed.append(dict(zip(uniques, parse_tag_json_many(uniques))))
+
+    def raw_tags():
+        return itertools.chain.from_iterable(
+            itertools.chain.from_iterable(parsed.values() for parsed in col_parsed)
+        )
+
+    try:
+        raw_uniques = list(dict.fromkeys(raw_tags()))
+    except TypeError:
+        raw_uniques = None
+    if raw_uniques is None or not all(isinstance(t, str) for t in raw_uniques):
+        # в JSON попались не строки — как parse_tag_json, берём str(x)
+        col_parsed = [
+            {v: [t if isinstance(t, str) else str(t) for t in tags] for v, tags in parsed.items()}
+            for parsed in col_parsed
+        ]
+        raw_uniques = list(dict.fromkeys(raw_tags()))
+    if tag_cache is not None:
+        clean_of = tag_cache.learn(raw_uniques)
+        encoded = tag_cache.json_strings
+    else:
+        clean_of = dict(zip(raw_uniques, clean_tags(raw_uniques).tolist()))
+        encoded = JsonStrings()
+
+    out = {}
+    for key in keys:
+        tags = set()
+        for value, parsed in zip(key, col_parsed):
+            if value is not None:
+                tags.update(map(clean_of.__getitem__, parsed[value]))
+        tags.discard(None)
+        out[key] = "[" + ", ".join(map(encoded.__getitem__, sorted(tags))) + "]"
+    return out
+
+
+def build_all_tags_uniq(df: pd.DataFrame, tag_cache: TagCleanCache = None) -> pd.DataFrame:
+    """
+    Собираем все теги и хэштеги в одну колонку all_tags_uniq (JSON-строка),
+    сразу с очисткой.
+
+    Видео держится в трендах много снапшотов подряд, поэтому различных
+    наборов значений TAG_COLS в строках заметно меньше, чем строк:
+    JSON собираем один раз на набор. С tag_cache наборы, которые уже
+    встречались в прошлых вызовах, берутся готовыми, а уже знакомые
+    теги не чистятся заново.
+    """
+    cols = [col for col in TAG_COLS if col in df.columns]
+    df = df.copy(deep=False)
+    if not cols:
+        df["all_tags_uniq"] = np.full(len(df), "[]", dtype=object)
+        return df
+
+    keys = list(zip(*(df[col].to_numpy(dtype=object, na_value=None).tolist() for col in cols)))
+    distinct = dict.fromkeys(keys)
+    if tag_cache is None:
+        found = _tag_sets_json(distinct)
+    else:
+        known = tag_cache.tag_sets
+        found = {key: known[key] for key in distinct if key in known}
+        found.update(_tag_sets_json([key for key in distinct if key not in found], tag_cache))
+        tag_cache.remember_tag_sets(found)
+
+    all_tags = np.empty(len(df), dtype=object)
+    all_tags[:] = list(map(found.__getitem__, keys))
+    df["all_tags_uniq"] = all_tags
+    return df
+
+
+class TagIndex:
+    """
+    Общий словарь тегов и теги каждой строки датасета в CSR-виде.
+
+    vocab — все очищенные теги, отсортированные по алфавиту; id тега — его
+    позиция в vocab (int32), поэтому порядок id совпадает с порядком строк.
+    Теги строки i лежат в ids[offsets[i]:offsets[i + 1]].
+    """
+
+    def __init__(self, vocab: np.ndarray, offsets: np.ndarray, ids: np.ndarray):
+        self.vocab = vocab
+        self.offsets = offsets
+        self.ids = ids
+        self._lookup = None
+
+    @classmethod
+    def empty(cls, n_rows: int = 0) -> "TagIndex":
+        return cls(
+            np.array([], dtype=object),
+            np.zeros(n_rows + 1, dtype=np.int64),
+            np.array([], dtype=np.int32),
+        )
+
+    @classmethod
+    def from_json(cls, values) -> "TagIndex":
+        """
+        Строим индекс по колонке all_tags_uniq (JSON-строки) — один раз при загрузке.
+        """
+        lists = [parse_tag_json(s) for s in values]
+        lengths = np.fromiter(map(len, lists), dtype=np.int64, count=len(lists))
+        offsets = np.zeros(len(lists) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+
+        flat = pd.Series([t for tags in lists for t in tags], dtype=object)
+        codes, uniques = pd.factorize(flat, sort=True)
+        return cls(
+            np.asarray(uniques, dtype=object),
+            offsets,
+            codes.astype(np.int32),
+        )
+
+    @classmethod
+    def concat(cls, parts) -> "TagIndex":
+        """
+        Склеиваем индексы нескольких кусков датасета (строки идут подряд)
+        в один, со сведённым общим словарём.
+        """
+        parts = list(parts)
+        if not parts:
+            return cls.empty()
+
+        vocab = parts[0].vocab
+        for part in parts[1:]:
+            if len(part.vocab):
+                vocab = np.union1d(vocab, part.vocab).astype(object)
+
+        offsets = [np.zeros(1, dtype=np.int64)]
+        ids = []
+        shift = 0
+        for part in parts:
+            remap = np.searchsorted(vocab, part.vocab).astype(np.int32)
+            ids.append(remap[part.ids])
+            offsets.append(part.offsets[1:] + shift)
+            shift += part.offsets[-1]
+        return cls(vocab, np.concatenate(offsets), np.concatenate(ids))
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def lengths(self, positions=None) -> np.ndarray:
+        if positions is None:
+            return np.diff(self.offsets)
+        positions = np.asarray(positions, dtype=np.int64)
+        return self.offsets[positions + 1] - self.offsets[positions]
+
+    def explode(self, positions):
+        """
+        Теги для набора строк одним махом.
+
+        Возвращаем (owner, tag_ids): tag_ids[k] — id тега, owner[k] — номер
+        строки внутри positions, которой этот тег принадлежит.
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        starts = self.offsets[positions]
+        lengths = self.offsets[positions + 1] - starts
+        owner = np.repeat(np.arange(len(positions)), lengths)
+        first = np.cumsum(lengths) - lengths
+        flat = np.repeat(starts - first, lengths) + np.arange(int(lengths.sum()))
+        return owner, self.ids[flat]
+
+    def span(self, start: int, stop: int):
+        """
+        Теги непрерывного диапазона строк [start, stop) — срез CSR без копирования.
+        Возвращаем (rows, tag_ids): rows[k] — номер строки тега tag_ids[k].
+        """
+        lo, hi = self.offsets[start], self.offsets[stop]
+        rows = np.repeat(
+            np.arange(start, stop), np.diff(self.offsets[start:stop + 1])
+        )
+        return rows, self.ids[lo:hi]
+
+    def take(self, positions) -> "TagIndex":
+        """
+        Индекс для подмножества или перестановки строк (словарь тот же).
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        lengths = self.lengths(positions)
+        offsets = np.zeros(len(positions) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        _, tag_ids = self.explode(positions)
+        return TagIndex(self.vocab, offsets, tag_ids)
+
+    def tag_id(self, tag: str):
+        """
+        id тега или None, если такого тега нет.
+        """
+        return self._tag_lookup().get(tag)
+
+    def tag_ids(self, tags) -> np.ndarray:
+        """
+        id для набора тегов (-1 — такого тега нет).
+        """
+        lookup = self._tag_lookup()
+        tags = np.asarray(tags, dtype=object)
+        return np.fromiter((lookup.get(t, -1) for t in tags), dtype=np.int64, count=len(tags))
+
+    def _tag_lookup(self) -> dict:
+        if self._lookup is None:
+            self._lookup = {t: i for i, t in enumerate(self.vocab)}
+        return self._lookup
+
+    def to_json(self, positions) -> list:
+        """
+        Теги строк обратно в JSON-строки all_tags_uniq — только для показа.
+        """
+        vocab = self.vocab
+        return [
+            json.dumps(
+                [vocab[i] for i in self.ids[self.offsets[p]:self.offsets[p + 1]]],
+                ensure_ascii=False,
+            )
+            for p in np.asarray(positions, dtype=np.int64)
+        ]
+
+
+class TagSearchIndex:
+    """
+    Триграммный индекс по словарю тегов для поиска по подстроке.
+
+    Для каждой триграммы храним отсортированный список id тегов, в которых
+    она встречается (CSR: _gram_offsets / _gram_ids). Запрос длиной от трёх
+    символов — пересечение списков его триграмм и проверка кандидатов;
+    запрос из одного-двух символов — объединение списков триграмм,
+    которые его содержат, плюс теги короче трёх символов.
+    Поиск без учёта регистра, подстрока — обычный текст, не регэксп.
+    """
+
+    def __init__(self, vocab):
+        self.vocab = [str(t).lower() for t in vocab]
+        self._exact = None
+        self._short_ids = np.array(
+            [i for i, tag in enumerate(self.vocab) if len(tag) < 3], dtype=np.int32
+        )
+
+        keys, owners = [], []
+        for i, tag in enumerate(self.vocab):
+            grams = {tag[j:j + 3] for j in range(len(tag) - 2)}
+            keys.extend(grams)
+            owners.extend([i] * len(grams))
+
+        codes, grams = pd.factorize(pd.Series(keys, dtype=object))
+        # стабильная сортировка: id внутри триграммы остаются по возрастанию
+        order = np.argsort(codes, kind="stable")
+        self._gram_ids = np.asarray(owners, dtype=np.int32)[order]
+        self._gram_offsets = np.zeros(len(grams) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(codes, minlength=len(grams)), out=self._gram_offsets[1:])
+        self._grams = {g: k for k, g in enumerate(grams)}
+
+    def __len__(self) -> int:
+        return len(self.vocab)
+
+    def _postings(self, gram: str) -> np.ndarray:
+        k = self._grams.get(gram)
+        if k is None:
+            return np.array([], dtype=np.int32)
+        return self._gram_ids[self._gram_offsets[k]:self._gram_offsets[k + 1]]
+
+    def search(self, pattern: str, exact: bool = False) -> np.ndarray:
+        """
+        id тегов (по возрастанию), которые совпадают с pattern целиком
+        (exact=True) или содержат его как подстроку.
+        """
+        pattern = pattern.strip().lower()
+        if exact:
+            if self._exact is None:
+                self._exact = {}
+                for i, tag in enumerate(self.vocab):
+                    self._exact.setdefault(tag, []).append(i)
+            return np.array(self._exact.get(pattern, []), dtype=np.int32)
+
+        if not pattern:
+            return np.arange(len(self.vocab), dtype=np.int32)
+        if len(pattern) < 3:
+            # триграмма содержит запрос — значит, и тег его содержит
+            parts = [
+                self._postings(gram) for gram in self._grams if pattern in gram
+            ]
+            parts.append(
+                np.array(
+                    [i for i in self._short_ids if pattern in self.vocab[i]],
+                    dtype=np.int32,
+                )
+            )
+            return np.unique(np.concatenate(parts)).astype(np.int32)
+
+        # кандидаты — теги со всеми триграммами запроса, начиная с самой редкой
+        postings = sorted(
+            (self._postings(pattern[j:j + 3]) for j in range(len(pattern) - 2)),
+            key=len,
+        )
+        candidates = postings[0]
+        for ids in postings[1:]:
+            if not len(candidates):
+                break
+            candidates = np.intersect1d(candidates, ids, assume_unique=True)
+        vocab = self.vocab
+        return np.array([i for i in candidates if pattern in vocab[i]], dtype=np.int32)
@@ -0,0 +1,158 @@
+"""
+TextStore — тексты видео (название, описание, сырые теги) отдельно от строк снапшотов.
+"""
+
+import numpy as np
+import pandas as pd
+
+# текстовые колонки снапшота, которые уезжают из строк в TextStore
+TEXT_COLUMNS = (
+    "title",
+    "description",
+    "tags_api_raw",
+    "hashtags_extracted",
+    "tags_common",
+    "tags_only_api",
+    "tags_only_hash",
+)
+
+
+class TextStore:
+    """
+    Тексты видео без повторов между снапшотами.
+
+    Видео висит в трендах много снапшотов подряд, и его название, описание
+    и сырые теги в каждом из них одни и те же. Здесь храним одну строку
+    на версию текста видео: (video_id, content_hash) → текстовые колонки.
+    content_hash — хэш всех текстовых колонок, поэтому правка названия
+    или описания даёт новую версию, а не перезаписывает старую.
+
+    Строки снапшотов держат только номер версии (text_id, int32),
+    а тексты берутся по номерам (take) только для того, что показываем.
+    layout — порядок колонок строк, из которых брали тексты: по нему
+    тексты возвращаются на свои места (restore_layout).
+    Объект не меняется: extend и compact возвращают новый TextStore.
+    """
+
+    def __init__(self, table: pd.DataFrame, layout=None):
+        self.table = table.reset_index(drop=True)
+        self.layout = list(layout) if layout is not None else []
+        self._keys = None
+
+    @classmethod
+    def empty(cls) -> "TextStore":
+        return cls(
+            pd.DataFrame(
+                {
+                    "video_id": pd.Series([], dtype=object),
+                    "content_hash": np.array([], dtype=np.uint64),
+                }
+            )
+        )
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+    @property
+    def columns(self) -> list:
+        return [c for c in self.table.columns if c in TEXT_COLUMNS]
+
+    def _key_index(self) -> pd.MultiIndex:
+        if self._keys is None:
+            self._keys = pd.MultiIndex.from_arrays(
+                [self.table["video_id"].to_numpy(), self.table["content_hash"].to_numpy()]
+            )
+        return self._keys
+
+    def extend(self, rows: pd.DataFrame):
+        """
+        Добавляем тексты строк rows (нужна колонка video_id).
+        Возвращаем (новый TextStore, text_id для каждой строки rows):
+        уже известные версии переиспользуются, новые дописываются в конец.
+        Колонки, которых нет у одной из сторон, заполняются пропусками.
+        """
+        cols = [c for c in TEXT_COLUMNS if c in rows.columns]
+        if not cols or rows.empty:
+            return self, np.full(len(rows), -1, dtype=np.int32)
+        all_cols = [c for c in TEXT_COLUMNS if c in cols or c in self.columns]
+        layout = self.layout + [c for c in rows.columns if c not in self.layout]
+
+        hashes = pd.util.hash_pandas_object(rows[cols], index=False).to_numpy()
+        video_ids = rows["video_id"].to_numpy(dtype=object)
+        keys = pd.MultiIndex.from_arrays([video_ids, hashes])
+
+        ids = self._key_index().get_indexer(keys) if len(self.table) else np.full(len(rows), -1)
+        ids = ids.astype(np.int64)
+        new = np.flatnonzero(ids < 0)
+        table = self.table
+        if len(new):
+            codes, uniques = pd.factorize(keys[new])
+            first = np.unique(codes, return_index=True)[1]
+            added = rows.iloc[new[first]][["video_id"] + cols].assign(
+                content_hash=hashes[new[first]]
+            )
+            ids[new] = len(self.table) + codes
+            parts = [self.table] if len(self.table) else []
+            table = pd.concat(parts + [added], ignore_index=True)
+        store = TextStore(table[["video_id", "content_hash"] + all_cols], layout)
+        return store, ids.astype(np.int32)
+
+    def compact(self, text_ids):
+        """
+        Оставляем только версии, на которые ещё ссылаются строки
+        (после удаления файлов). Возвращаем (TextStore, новые text_id).
+        """
+        text_ids = np.asarray(text_ids)
+        used, remapped = np.unique(text_ids, return_inverse=True)
+        valid = used >= 0
+        if valid.all() and len(used) == len(self.table):
+            return self, text_ids
+        store = TextStore(self.table.iloc[used[valid]], self.layout)
+        new_ids = np.where(valid, np.cumsum(valid) - 1, -1)[remapped]
+        return store, new_ids.astype(np.int32)
+
+    def take(self, text_ids, columns=None) -> dict:
+        """
+        Тексты по номерам версий: колонка → массив значений
+        (None там, где text_id = -1).
+        """
+        text_ids = np.asarray(text_ids)
+        missing = text_ids < 0
+        safe = np.where(missing, 0, text_ids)
+        out = {}
+        for col in columns or self.columns:
+            if col not in self.table.columns:
+                continue
+            values = self.table[col].to_numpy(dtype=object)
+            if len(values):
+                taken = values[safe]
+                taken[missing] = None
+            else:
+                taken = np.full(len(text_ids), None, dtype=object)
+            out[col] = taken
+        return out
+
+    def restore_layout(self, frame: pd.DataFrame) -> pd.DataFrame:
+        """
+        Колонки frame в исходном порядке строк (layout);
+        колонок, которых в layout нет, — в конце, в их текущем порядке.
+        """
+        known = [c for c in self.layout if c in frame.columns]
+        if not known:
+            return frame
+        placed = set(known)
+        order = known + [c for c in frame.columns if c not in placed]
+        if order == list(frame.columns):
+            return frame
+        return frame[order]
+
+    def edits(self) -> pd.DataFrame:
+        """
+        Видео, у которых текст менялся между снапшотами: video_id и число версий.
+        """
+        versions = self.table["video_id"].value_counts()
+        versions = versions[versions > 1]
+        return versions.rename("versions").rename_axis("video_id").reset_index()
+
+    def memory_mb(self) -> float:
+        return self.table.memory_usage(deep=True, index=False).sum() / 1024 / 1024